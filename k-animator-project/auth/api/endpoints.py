@@ -3,7 +3,9 @@ from fastapi import APIRouter, Depends, HTTPException, status, Response, Cookie,
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Optional
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 import redis
+import logging
 from jose import jwt, JWTError
 
 from shared.db import database
@@ -12,8 +14,12 @@ from auth.db import crud as auth_crud
 from auth.schemas import schemas
 from auth.schemas.schemas import UserUpdatepassword
 from auth.core import security
+from auth.core import signing_keys
+from auth.core.bloom import user_bloom
 from shared.dependencies import get_user_id_from_gateway
-from auth.db.redis_re import get_redis_refresh
+from shared import user_cache
+from shared import admission
+from auth.db.redis_re import get_redis_refresh, store_refresh_token, rotate_refresh_token
 
 auth_router = APIRouter(
     tags=["인증 (공개)"]
@@ -26,15 +32,60 @@ auth_router = APIRouter(
                   summary="사용자 생성 (회원가입)",
                   description="새로운 사용자를 생성합니다. `ID`와 `email`은 고유해야 합니다.")
 def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = shared_crud.get_user(db, username=user.username)
-    if db_user:
+    # username / email 중복을 쿼리 한 번으로 확인 (bcrypt 해시 전에 걸러냄)
+    username_taken, email_taken = shared_crud.find_user_conflicts(db, username=user.username, email=user.email)
+    if username_taken:
         raise HTTPException(status_code=400, detail="사용자 이름이 이미 존재합니다.")
-    
-    db_email = shared_crud.get_email(db, email=user.email)
-    if db_email:
+    if email_taken:
         raise HTTPException(status_code=400, detail="이메일이 이미 존재합니다.")
 
-    return auth_crud.create_user(db=db, user=user) 
+    # 확인과 저장 사이에 같은 값으로 가입한 경우는 unique 제약으로 막음
+    try:
+        db_user = auth_crud.create_user(db=db, user=user)
+    except IntegrityError:
+        db.rollback()
+        username_taken, _ = shared_crud.find_user_conflicts(db, username=user.username, email=None)
+        detail = "사용자 이름이 이미 존재합니다." if username_taken else "이메일이 이미 존재합니다."
+        raise HTTPException(status_code=400, detail=detail)
+
+    user_bloom.add(db_user.username, db_user.email)
+    return db_user
+
+# 공개 API 엔드포인트: 아이디 / 이메일 사용 가능 여부 (회원가입 화면 실시간 확인용)
+@auth_router.get("/availability",
+                 dependencies=[Depends(admission.limit("availability", by_ip=True))],  # 아이디 / 이메일 대량 조회 방지
+                 summary="아이디 / 이메일 사용 가능 여부",
+                 description="Bloom filter 에 없으면 DB 조회 없이 사용 가능으로 응답하고, 있을 수도 있으면 DB 로 확인합니다. 안내용이며 최종 중복 확인은 회원가입 시 이루어집니다.")
+def check_availability(
+    username: Optional[str] = None,
+    email: Optional[str] = None,
+    db: Session = Depends(database.get_db)
+):
+    if not username and not email:
+        raise HTTPException(status_code=400, detail="username 또는 email 이 필요합니다.")
+
+    result = {}
+    to_check = {}
+    for field, value, maybe_taken in (
+        ("username", username, user_bloom.username_maybe_taken),
+        ("email", email, user_bloom.email_maybe_taken),
+    ):
+        if not value:
+            continue
+        if maybe_taken(value) is False:
+            result[field] = {"available": True, "source": "bloom"}
+        else:
+            to_check[field] = value
+
+    if to_check:
+        username_taken, email_taken = shared_crud.find_user_conflicts(
+            db, username=to_check.get("username"), email=to_check.get("email")
+        )
+        if "username" in to_check:
+            result["username"] = {"available": not username_taken, "source": "db"}
+        if "email" in to_check:
+            result["email"] = {"available": not email_taken, "source": "db"}
+    return result
 
 # API 엔드포인트: Access Token 발급
 @auth_router.post("/login",
@@ -61,10 +112,13 @@ def login_for_access_token(
     access_token = security.create_access_token(data=token_data)
     refresh_token = security.create_refresh_token(data=token_data)
 
-    redis_refresh.set(
+    # 재발급 시 DB 조회 없이 새 토큰을 만들 수 있도록 클레임을 함께 저장
+    store_refresh_token(
+        redis_refresh,
         user.id,
         refresh_token,
-        ex=int(security.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60)
+        token_data,
+        int(security.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60)
     )
         
     response.set_cookie(
@@ -87,7 +141,6 @@ def refresh_access_token(
     response: Response,
     request: Request,
     refresh_token: Optional[str] = Cookie(None),
-    db: Session = Depends(database.get_db),
     redis_refresh: redis.Redis = Depends(get_redis_refresh)
 ):
     # --- [상세 디버깅 로그 추가] ---
@@ -105,7 +158,7 @@ def refresh_access_token(
     )
     
     try:
-        payload = jwt.decode(refresh_token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+        payload = jwt.decode(refresh_token, security.get_secret_key(), algorithms=[security.ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             print("--- [DEBUG][실패] 2. 토큰 payload에 'sub' (user_id)가 없습니다.")
@@ -115,35 +168,22 @@ def refresh_access_token(
         print(f"--- [DEBUG][실패] 2. JWT 디코딩 오류 발생: {e}")
         raise credentials_exception
 
-    user = shared_crud.get_id(db, user_id=user_id)
-    if not user:
-        print(f"--- [DEBUG][실패] 3. DB에서 user_id '{user_id}'를 찾을 수 없습니다.")
-        raise credentials_exception
-    print(f"--- [DEBUG][성공] 3. DB에서 사용자 조회 성공: {user.username}")
-    
-    stored_token_from_redis = redis_refresh.get(user_id)
-    if not stored_token_from_redis:
-        print(f"--- [DEBUG][실패] 4. Redis에서 user_id '{user_id}'에 대한 토큰을 찾을 수 없습니다.")
-        raise credentials_exception
-    
-    print(f"--- [DEBUG][성공] 4. Redis에서 토큰 조회 성공: ...{stored_token_from_redis[-10:]}")
-
-    if stored_token_from_redis != refresh_token:
-        print("--- [DEBUG][실패] 5. 쿠키의 토큰과 Redis의 토큰이 일치하지 않습니다.")
-        print(f"    - 쿠키 토큰: ...{refresh_token[-10:]}")
-        print(f"    - Redis 토큰: ...{stored_token_from_redis[-10:]}")
-        raise credentials_exception
-    print("--- [DEBUG][성공] 5. 쿠키 토큰과 Redis 토큰 일치 확인.")
-
-    new_token_data = {"sub": user.id}
-    new_access_token = security.create_access_token(data=new_token_data)
-    new_refresh_token = security.create_refresh_token(data=new_token_data)
-
-    redis_refresh.set(
-        user.id,
+    # Redis 에서 토큰 비교 + 새 토큰으로 교체를 한 번에 (동시 재발급 시 하나만 성공)
+    new_refresh_token = security.create_refresh_token(data={"sub": user_id})
+    claims = rotate_refresh_token(
+        redis_refresh,
+        user_id,
+        refresh_token,
         new_refresh_token,
-        ex=int(security.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60)
+        int(security.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60)
     )
+    if claims is None:
+        logging.warning("[REFRESH] 저장된 Refresh Token 이 없거나 쿠키의 토큰과 일치하지 않음 (이미 사용되었거나 만료됨)")
+        raise credentials_exception
+    logging.info("[REFRESH] Refresh Token 교체 완료")
+
+    # 저장된 클레임으로 Access Token 발급 (예전 형식으로 저장된 토큰은 클레임이 없으므로 sub 만 사용)
+    new_access_token = security.create_access_token(data={**claims, "sub": user_id})
 
     response.set_cookie(
         key="refresh_token",
@@ -158,6 +198,14 @@ def refresh_access_token(
 
     return {"access_token": new_access_token, "refresh_token": new_refresh_token, "token_type": "bearer"}
 
+# 공개 API 엔드포인트: Access Token 검증용 공개키 (게이트웨이 / 각 서비스가 auth 호출 없이 직접 검증)
+@auth_router.get("/.well-known/jwks.json",
+                 summary="JWKS (Access Token 공개키)",
+                 description="Access Token(ES256) 서명 검증에 쓰는 공개키 목록입니다. 키 교체 중에는 이전 키도 함께 포함됩니다.")
+def get_jwks(response: Response):
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return signing_keys.jwks()
+
 users_router = APIRouter(
     tags=["사용자 (인증필요)"]
 )
@@ -187,7 +235,7 @@ def logout(
                   summary="내 정보 보기",
                   description="현재 로그인된 사용자의 프로필 정보를 조회합니다.")
 def read_users_me(user_id: str = Depends(get_user_id_from_gateway), db: Session = Depends(database.get_db)):
-    user = shared_crud.get_id(db, user_id=user_id)
+    user = user_cache.get_user(user_id, lambda: shared_crud.get_id(db, user_id=user_id))
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -0,0 +1,118 @@
+# auth/core/bloom.py
+# 회원가입 화면의 아이디 / 이메일 실시간 중복 확인용 Bloom filter.
+# users 테이블에서 미리 채워 두고(warm), Bloom filter 에 없으면 "확실히 사용 가능" 으로 DB 조회 없이 응답합니다.
+# 있을 수도 있다고 나오면(오탐 포함) DB 로 확인합니다.
+#
+# - 삭제는 반영하지 않으므로 탈퇴한 아이디는 DB 확인 경로로 빠질 뿐 결과는 정확함
+# - 다른 replica 에서 가입한 사용자는 다음 재구성(USER_BLOOM_REFRESH_S)까지 모를 수 있으므로,
+#   이 결과는 화면 안내용이고 실제 중복은 회원가입 시 DB unique 제약으로 막음
+
+import os
+import math
+import time
+import hashlib
+import logging
+import threading
+
+from sqlalchemy import select
+
+from shared.db import database, models
+
+logger = logging.getLogger(__name__)
+
+USER_BLOOM_ENABLED = os.getenv("USER_BLOOM_ENABLED", "1") == "1"
+USER_BLOOM_CAPACITY = int(os.getenv("USER_BLOOM_CAPACITY", "1000000"))
+USER_BLOOM_ERROR_RATE = float(os.getenv("USER_BLOOM_ERROR_RATE", "0.001"))
+USER_BLOOM_REFRESH_S = float(os.getenv("USER_BLOOM_REFRESH_S", "300"))
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class UserBloom:
+    """username / email 두 개의 Bloom filter. ready 가 아니면 모든 조회가 DB 로 갑니다."""
+
+    def __init__(self):
+        self.usernames = None
+        self.emails = None
+        self.ready = False
+        self._pending = []   # 재구성 중에 가입한 사용자 (새 filter 에 다시 넣음)
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """users 테이블 전체로 새 filter 를 만든 뒤 교체합니다. (만드는 동안 들어온 가입도 반영)"""
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        usernames = BloomFilter(USER_BLOOM_CAPACITY, USER_BLOOM_ERROR_RATE)
+        emails = BloomFilter(USER_BLOOM_CAPACITY, USER_BLOOM_ERROR_RATE)
+        count = 0
+        with database.SessionLocal() as db:
+            rows = db.execute(
+                select(models.User.username, models.User.email).execution_options(yield_per=10000)
+            )
+            for username, email in rows:
+                if username:
+                    usernames.add(username)
+                if email:
+                    emails.add(email)
+                count += 1
+        with self._lock:
+            for username, email in self._pending:
+                usernames.add(username)
+                emails.add(email)
+            self._pending = []
+            self.usernames, self.emails, self.ready = usernames, emails, True
+        if count > USER_BLOOM_CAPACITY:
+            logger.warning(f"사용자 수({count})가 USER_BLOOM_CAPACITY({USER_BLOOM_CAPACITY})를 넘어 오탐률이 높아짐")
+        logger.info(f"사용자 Bloom filter 구성 완료 - {count}명, {len(usernames.bits) * 2 / 1024 / 1024:.1f}MB, "
+                    f"{(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def add(self, username: str, email: str):
+        """이 서버에서 가입한 사용자를 바로 반영합니다."""
+        with self._lock:
+            if self.ready:
+                self.usernames.add(username)
+                self.emails.add(email)
+            self._pending.append((username, email))
+
+    def username_maybe_taken(self, username: str) -> bool | None:
+        """False: 확실히 사용 가능 / True: 사용 중일 수 있음 / None: filter 준비 전"""
+        return (username in self.usernames) if self.ready else None
+
+    def email_maybe_taken(self, email: str) -> bool | None:
+        return (email in self.emails) if self.ready else None
+
+    def run_forever(self):
+        while True:
+            try:
+                self.warm()
+            except Exception as e:
+                logger.error(f"사용자 Bloom filter 구성 실패: {e}")
+            time.sleep(USER_BLOOM_REFRESH_S)
+
+
+user_bloom = UserBloom()
+
+
+def start():
+    """서버 시작 시 백그라운드 스레드에서 filter 를 채우고 USER_BLOOM_REFRESH_S 마다 다시 만듭니다."""
+    if USER_BLOOM_ENABLED:
+        threading.Thread(target=user_bloom.run_forever, daemon=True, name="user-bloom").start()
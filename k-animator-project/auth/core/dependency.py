@@ -1,10 +1,9 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import APIKeyHeader
-from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 
-from shared.db import crud, database, models
-from core import security
+from shared import jwt_verifier
+from shared import keyvault
+from auth.core import security
 
 def decode_token(token: str):
     credentials_exception = HTTPException(
@@ -17,8 +16,24 @@ def decode_token(token: str):
         raise credentials_exception
     token = token.split(" ")[1]
     try:
-        payload = jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+        # HS256 토큰 (ACCESS_TOKEN_ALGORITHM=HS256 이거나 ES256 전환 전에 발급된 토큰)
+        if jwt.get_unverified_header(token).get("alg") == security.ALGORITHM:
+            payload = jwt.decode(
+                token,
+                security.get_secret_key(),
+                algorithms=[security.ALGORITHM],
+                audience=jwt_verifier.JWT_AUDIENCE,
+                issuer=jwt_verifier.JWT_ISSUER,
+            )
+            if payload.get("type") != "access":
+                raise credentials_exception
+            return payload
+        # auth 서비스에서는 jwt_verifier 가 자기 서명 키 목록(signing_keys.jwks)을 바로 사용 (auth/main.py)
+        payload = jwt_verifier.verify_access_token(token)
         return payload
-    except JWTError:
+    except (JWTError, jwt_verifier.InvalidToken):
         raise credentials_exception
+    except (keyvault.SecretUnavailable, jwt_verifier.KeysUnavailable):
+        # 검증 키를 가져오지 못한 경우는 토큰 문제가 아니므로 401 대신 503
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="토큰 검증 키를 가져올 수 없습니다.")
     
@@ -0,0 +1,133 @@
+# auth/core/hashing.py
+# bcrypt 해시/검증을 요청 처리 스레드가 아닌 전용 프로세스 풀에서 실행합니다.
+# 로그인이 몰려도 bcrypt 가 쓰는 CPU 는 HASH_POOL_SIZE 개 프로세스로 제한되고,
+# 풀에 들어가 있는 작업이 HASH_QUEUE_DEPTH 를 넘으면 기다리지 않고 바로 503 으로 응답합니다. (다른 API 의 스레드 고갈 방지)
+#
+# 비용(BCRYPT_ROUNDS)을 바꾸면 기존 해시는 다음 로그인 때 verify_and_update 로 새 비용으로 다시 해시됩니다.
+
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", "2"))          # bcrypt 전용 프로세스 수 (Pod CPU 보다 작게)
+HASH_QUEUE_DEPTH = int(os.getenv("HASH_QUEUE_DEPTH", "16"))     # 풀이 처리 중인 작업 외에 기다릴 수 있는 작업 수
+HASH_TIMEOUT_S = float(os.getenv("HASH_TIMEOUT_S", "10"))
+HASH_POOL_ENABLED = os.getenv("HASH_POOL_ENABLED", "1") == "1"  # 0 이면 기존처럼 호출한 스레드에서 바로 실행
+
+# min/max 를 BCRYPT_ROUNDS 로 고정해, 다른 비용으로 만든 해시는 needs_update 가 True 가 되도록 함
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_POOL_SIZE + HASH_QUEUE_DEPTH)
+
+
+# --- 풀 프로세스에서 실행되는 함수 (pickle 가능하도록 모듈 최상위에 둠) ---
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def _warmup() -> None:
+    return None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # uvicorn 의 스레드 상태를 복사하지 않도록 fork 대신 spawn 사용
+                _pool = ProcessPoolExecutor(max_workers=HASH_POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+                logging.info(f"[HASH] bcrypt 프로세스 풀 생성 - workers: {HASH_POOL_SIZE}, queue: {HASH_QUEUE_DEPTH}, rounds: {BCRYPT_ROUNDS}")
+    return _pool
+
+
+def start() -> None:
+    """서버 시작 시 호출해 첫 로그인 요청이 프로세스 생성 시간을 기다리지 않도록 풀을 미리 띄웁니다."""
+    if HASH_POOL_ENABLED:
+        for future in [get_pool().submit(_warmup) for _ in range(HASH_POOL_SIZE)]:
+            future.result()
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    """워커 프로세스가 죽어(OOM 등) 깨진 풀을 버립니다. 다음 요청에서 get_pool() 이 새로 만듭니다."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+            broken.shutdown(wait=False, cancel_futures=True)
+            logging.error("[HASH] bcrypt 프로세스 풀이 깨져 다시 생성함")
+
+
+def _run(fn, *args):
+    if not HASH_POOL_ENABLED:
+        return fn(*args)
+    if not _slots.acquire(blocking=False):
+        logging.warning(f"[HASH] 대기열 초과로 요청 거절 - {fn.__name__}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해 주세요.",
+            headers={"Retry-After": "1"},
+        )
+    pool = get_pool()
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _slots.release()
+        _reset_pool(pool)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="잠시 후 다시 시도해 주세요.", headers={"Retry-After": "1"})
+    except BaseException:
+        _slots.release()
+        raise
+    # 슬롯은 작업이 실제로 끝나거나 취소될 때 반납 (시간 초과 후에도 풀에서 돌고 있는 작업을 대기열 수에 포함)
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=HASH_TIMEOUT_S)
+    except FutureTimeoutError:
+        future.cancel()  # 아직 풀에서 시작하지 않았으면 취소
+        logging.error(f"[HASH] {fn.__name__} 시간 초과 ({HASH_TIMEOUT_S}s)")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="요청 처리 시간이 초과되었습니다.")
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="잠시 후 다시 시도해 주세요.", headers={"Retry-After": "1"})
+
+
+def hash_password(password: str) -> str:
+    return _run(_hash, password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _run(_verify, plain_password, hashed_password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """(일치 여부, 새 해시) 를 반환합니다. 새 해시는 기존 해시의 비용이 BCRYPT_ROUNDS 와 다를 때만 있습니다."""
+    return _run(_verify_and_update, plain_password, hashed_password)
@@ -6,46 +6,47 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 from fastapi.security import APIKeyHeader
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-from azure.keyvault.secrets import SecretClient
-from azure.identity import DefaultAzureCredential
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from shared import keyvault
+from auth.core import hashing
+from auth.core import signing_keys
 
+# bcrypt 는 auth.core.hashing 의 전용 프로세스 풀에서 실행
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password) # 평문 비밀번호와 해시된 비밀번호 비교 (로그인)
+    return hashing.verify_password(plain_password, hashed_password) # 평문 비밀번호와 해시된 비밀번호 비교 (로그인)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password) # 비밀번호 해시화 (회원가입)
+    return hashing.hash_password(password) # 비밀번호 해시화 (회원가입)
 
+# Refresh Token 서명키는 처음 사용할 때 shared/keyvault 에서 가져옵니다.
 SECRET_KEY = None
 
-try:
-    key_vault_name = os.getenv("KEY_VAULT_NAME")
-    secret_name = os.getenv("JWT_SECRET_NAME")
-
-    if not key_vault_name or not secret_name:
-        raise ValueError("KEY_VAULT_NAME 및 JWT_SECRET_NAME 환경 변수가 설정되지 않았음.")
-
-    kv_uri = f"https://{key_vault_name}.vault.azure.net"
-
-    credential = DefaultAzureCredential() # Azure AD 인증
-
-    client = SecretClient(vault_url=kv_uri, credential=credential)
-    retrieved_secret = client.get_secret(secret_name)
-
-    SECRET_KEY = retrieved_secret.value
-    SECRET_KEY = base64.b64decode(SECRET_KEY)
-    logger.info("Azure Key Vault 에서 JWT를 성공적으로 검색함.")
-
-except Exception as e:     #로컬용
-    logger.warning(f"Azure Key Vault에서 JWT검색하는 동안 오류 발생: {e}. 로컬 환경 변수를 사용")
-
-ALGORITHM = "HS256"
+def get_secret_key() -> bytes:
+    global SECRET_KEY
+    if SECRET_KEY is None:
+        try:
+            SECRET_KEY = base64.b64decode(keyvault.get("JWT_SECRET_NAME"))
+            logger.info("Azure Key Vault 에서 JWT를 성공적으로 검색함.")
+        except keyvault.SecretUnavailable as e:
+            logger.warning(f"Azure Key Vault에서 JWT검색하는 동안 오류 발생: {e}")
+            raise
+    return SECRET_KEY
+
+ALGORITHM = "HS256"   # Refresh Token (auth 서비스만 검증하므로 대칭키 유지)
+
+# Access Token 서명 알고리즘: HS256(기존, API 게이트웨이가 대칭키로 검증) | ES256(signing_keys, JWKS 공개키로 검증)
+# 전환 순서 (게이트웨이가 JWKS 를 쓰기 전에 ES256 으로 바꾸면 모든 요청이 401 이 되므로 반드시 이 순서로):
+#   1. ACCESS_TOKEN_ALGORITHM=HS256 (기본값) 으로 배포 - JWKS(/api/auth/.well-known/jwks.json) 만 먼저 공개
+#      (jwt-signing-keys 시크릿이 아직 초기값 "[]" 이면 빈 JWKS. 2단계 전에 키 목록을 새 버전으로 추가하고 재배포)
+#   2. API 게이트웨이 validate-jwt 에 JWKS URL 을 추가해 HS256 / ES256 둘 다 허용
+#   3. ACCESS_TOKEN_ALGORITHM=ES256 으로 배포 (이전에 발급된 HS256 토큰은 auth 서비스에서도 만료될 때까지 검증됨)
+#   4. Access Token 만료 시간(15분)이 지난 뒤 게이트웨이에서 HS256 제거, 필요하면 AUTH_VERIFY_MODE=local
+ACCESS_TOKEN_ALGORITHM = os.getenv("ACCESS_TOKEN_ALGORITHM", ALGORITHM)
+if ACCESS_TOKEN_ALGORITHM not in (ALGORITHM, signing_keys.ACCESS_TOKEN_ALGORITHM):
+    raise ValueError(f"지원하지 않는 ACCESS_TOKEN_ALGORITHM: {ACCESS_TOKEN_ALGORITHM}")
 ACCESS_TOKEN_EXPIRE_MINUTES = 15 # 15분
 REFRESH_TOKEN_EXPIRE_DAYS = 7   # 7일
 
@@ -62,7 +63,15 @@ def create_access_token(data: dict):
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
 
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    if ACCESS_TOKEN_ALGORITHM == ALGORITHM:
+        return jwt.encode(to_encode, get_secret_key(), algorithm=ALGORITHM)
+
+    encoded_jwt = jwt.encode(
+        to_encode,
+        signing_keys.signing_key(),
+        algorithm=ACCESS_TOKEN_ALGORITHM,
+        headers={"kid": signing_keys.signing_kid()}
+    )
     return encoded_jwt
 
 def create_refresh_token(data: dict):
@@ -77,5 +86,5 @@ def create_refresh_token(data: dict):
     expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode.update({"exp": expire})
 
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, get_secret_key(), algorithm=ALGORITHM)
     return encoded_jwt
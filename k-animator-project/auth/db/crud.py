@@ -2,7 +2,9 @@ from sqlalchemy.orm import Session
 from shared.db import models
 from auth.schemas import schemas
 from auth.core import security
+from auth.core import hashing
 from shared.db import crud
+from shared import user_cache
 
 # 신규 사용자 생성
 def create_user(db: Session, user: schemas.UserCreate):
@@ -28,6 +30,7 @@ def update_user(db: Session, user: models.User, user_update: schemas.UserUpdate)
     db.add(user)
     db.commit()
     db.refresh(user)
+    user_cache.invalidate(user.id)
     return user
 
 # 비번 수정 
@@ -38,12 +41,15 @@ def update_password(db: Session, user: models.User, new_password: str):
     db.add(user)
     db.commit()
     db.refresh(user)
+    user_cache.invalidate(user.id)
     return user
 
 # 회원 탈퇴
 def delete_user(db: Session, user: models.User):
+    user_id = user.id
     db.delete(user)
     db.commit()
+    user_cache.invalidate(user_id)
     return
 
 def authenticate_user(db: Session, username: str, password: str):
@@ -54,6 +60,13 @@ def authenticate_user(db: Session, username: str, password: str):
     user = crud.get_user(db, username)
     if not user:
         return None
-    if not security.verify_password(password, user.hashed_password):
+    verified, new_hash = hashing.verify_and_update(password, user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        # BCRYPT_ROUNDS 가 바뀐 뒤 처음 로그인하면 새 비용으로 다시 저장
+        user.hashed_password = new_hash
+        db.add(user)
+        db.commit()
+        db.refresh(user)
     return user
\ No newline at end of file
@@ -1,39 +1,28 @@
 import os
+import json
 import logging
+import threading
 import redis
-from azure.keyvault.secrets import SecretClient
-from azure.identity import DefaultAzureCredential
+
+from shared import keyvault
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Redis 클라이언트는 처음 사용할 때 만듭니다. (접속 정보는 shared/keyvault 에서 한 번에 조회)
 redis_refresh = None
+_redis_lock = threading.Lock()
 
-try:
-    logger.info("Redis 연결을 위해 key vault에서 시크릿 조회 시작")
-    # Azure Key Vault에서 Redis 비밀번호 및 호스트 이름 검색
-    key_vault_name = os.getenv("KEY_VAULT_NAME")
-    redis_password_secret_name = os.getenv("REDIS_PASSWORD_SECRET_NAME")
-    redis_host_secret_name = os.getenv("REDIS_HOST_SECRET_NAME")
-
-    if not all([key_vault_name, redis_password_secret_name, redis_host_secret_name]):
-        raise ValueError("KEY_VAULT_NAME, REDIS_PASSWORD_SECRET_NAME, REDIS_HOST_SECRET_NAME 환경 변수가 설정되지 않았음.")
-
-    kv_uri = f"https://{key_vault_name}.vault.azure.net"
-
-    # workload identity를 사용하여 Azure Key Vault에 인증
-    credential = DefaultAzureCredential()
-    client = SecretClient(vault_url=kv_uri, credential=credential)
+def _connect_redis_refresh():
+    try:
+        redis_host = keyvault.get("REDIS_HOST_SECRET_NAME")
+        redis_password = keyvault.get("REDIS_PASSWORD_SECRET_NAME")
+    except keyvault.SecretUnavailable as e:
+        logger.error(f"Azure Key Vault 연동 또는 Redis 연결 중 오류 발생: {e}")
+        return None
 
-    # Key Vault에서 Redis 접속 정보 가져오기
-    logger.info(f"'{redis_host_secret_name}' 시크릿 조회 중")
-    redis_host = client.get_secret(redis_host_secret_name).value
-
-    logger.info(f"'{redis_password_secret_name}' 시크릿 조회 중")
-    redis_password = client.get_secret(redis_password_secret_name).value
-
-    # Redis 연결 설정
-    redis_refresh = redis.StrictRedis(
+    # Redis 연결 설정 (실제 연결은 첫 명령 실행 시)
+    client = redis.StrictRedis(
         host=redis_host,
         port=6380,
         password=redis_password,
@@ -42,14 +31,67 @@ try:
         decode_responses=True,
         socket_connect_timeout=5,
     )
-    # Redis 연결 테스트
-    redis_refresh.ping()
-    logger.info("Redis 연결 성공 및 Azure Key Vault에서 Redis 접속 정보 검색 완료")
-
-except Exception as e:
-    logger.error(f"Azure Key Vault 연동 또는 Redis 연결 중 오류 발생: {e}")
+    logger.info("Redis 클라이언트 생성 완료")
+    return client
 
 def get_redis_refresh():
+    global redis_refresh
+    if redis_refresh is None:
+        with _redis_lock:
+            if redis_refresh is None:
+                redis_refresh = _connect_redis_refresh()
     if redis_refresh is None:
         raise Exception("Redis 연결이 설정되지 않았습니다. 서버 로그를 확인.")
-    return redis_refresh
\ No newline at end of file
+    return redis_refresh
+# Refresh Token 저장 형식: user_id → {"token": refresh token, "claims": 새 토큰 발급에 쓰는 사용자 클레임}
+# (예전 형식인 토큰 문자열만 저장된 값도 그대로 검증하며, 이 경우 claims 는 빈 dict)
+
+# KEYS[1]: user_id / ARGV: 제시된 토큰, 새 토큰, TTL(초)
+# 저장된 토큰과 같을 때만 새 토큰으로 바꾸고 claims 를 유지 → {1, claims JSON}
+# 저장된 값이 없으면 {0, ''}, 토큰이 다르면 {-1, ''} (동시 재발급 중 늦게 온 요청 포함)
+ROTATE_REFRESH_LUA = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return {0, ''}
+end
+local token = current
+local claims = {}
+if string.sub(current, 1, 1) == '{' then
+    local ok, stored = pcall(cjson.decode, current)
+    if ok and type(stored) == 'table' and stored['token'] then
+        token = stored['token']
+        claims = stored['claims'] or {}
+    end
+end
+if token ~= ARGV[1] then
+    return {-1, ''}
+end
+local encoded_claims = cjson.encode(claims)
+if encoded_claims == '[]' then
+    encoded_claims = '{}'
+end
+redis.call('SET', KEYS[1], '{"token":' .. cjson.encode(ARGV[2]) .. ',"claims":' .. encoded_claims .. '}', 'EX', ARGV[3])
+return {1, encoded_claims}
+"""
+
+_rotate_scripts = {}
+
+
+def store_refresh_token(r: redis.Redis, user_id: str, token: str, claims: dict, ttl_seconds: int):
+    """로그인 시 Refresh Token 과 클레임을 함께 저장합니다."""
+    r.set(user_id, json.dumps({"token": token, "claims": claims}), ex=ttl_seconds)
+
+
+def rotate_refresh_token(r: redis.Redis, user_id: str, presented_token: str, new_token: str, ttl_seconds: int) -> dict | None:
+    """
+    저장된 토큰이 presented_token 과 같으면 new_token 으로 바꾸고 저장된 클레임을 반환합니다. (Redis 왕복 1회, 원자적)
+    저장된 토큰이 없거나 다르면 None 을 반환합니다.
+    """
+    script = _rotate_scripts.get(id(r))
+    if script is None:
+        script = _rotate_scripts[id(r)] = r.register_script(ROTATE_REFRESH_LUA)
+    status, claims = script(keys=[user_id], args=[presented_token, new_token, ttl_seconds])
+    if int(status) != 1:
+        logger.info(f"Refresh Token 교체 거절 - user_id: {user_id}, 사유: {'저장된 토큰 없음' if int(status) == 0 else '토큰 불일치'}")
+        return None
+    return json.loads(claims)
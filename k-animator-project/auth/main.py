@@ -2,8 +2,16 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from auth.api.endpoints import auth_router, users_router # 'auth' 패키지 경로에서 import
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+from auth.core import hashing
+from auth.core import bloom
+from auth.core import signing_keys
+from shared import jwt_verifier
+from shared import keyvault
 app = FastAPI(title="Auth Service")
 
+# auth 서비스 안에서 Access Token 을 검증할 때는 JWKS 를 HTTP 로 받지 않고 자기 키 목록을 사용
+jwt_verifier.configure(signing_keys.jwks)
+
 
 app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
 
@@ -24,6 +32,24 @@ app.add_middleware(
 
 app.include_router(auth_router, prefix="/api/auth") # 공개용 API
 app.include_router(users_router, prefix="/api/users") # 보호용 API
+
+@app.on_event("startup")
+def prefetch_secrets():
+    # 시크릿을 백그라운드에서 미리 받아 둠 (서버 시작은 기다리지 않고, DB / Redis 는 처음 사용할 때 연결)
+    keyvault.prefetch_in_background()
+
+@app.on_event("startup")
+def start_hash_pool():
+    hashing.start()
+
+@app.on_event("startup")
+def start_user_bloom():
+    bloom.start()
+
+@app.on_event("shutdown")
+def stop_hash_pool():
+    hashing.shutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "Auth service is running"}
\ No newline at end of file
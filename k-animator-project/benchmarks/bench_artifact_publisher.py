@@ -0,0 +1,121 @@
+# benchmarks/bench_artifact_publisher.py
+# generate_image 태스크 전체 경로의 지연 시간을 결과물 저장 방식별로 비교합니다.
+#   sequential : 기존 방식 (PNG 업로드 → PSD 변환 → PSD 업로드 → DB 저장/커밋, 순차)
+#   parallel   : 현재 stage_publish (shared.artifact_publisher 로 동시 업로드 + DB INSERT 동시 실행)
+# 임베딩 / 참조 이미지 / GPT 프롬프트 / 이미지 생성 단계는 외부 API 비용이 들므로 스텁으로 대신하고
+# (--generation-ms 만큼 대기 후 합성 PNG 반환), 태스크 실행 / Blob 업로드 / DB 저장은 실제로 수행합니다.
+# 끝나면 올린 Blob 과 images 행을 지웁니다.
+#
+# 실행: AZURE_STORAGE_ACCOUNT_NAME=... AZURE_STORAGE_ACCOUNT_KEY=... AZURE_CONTAINER_NAME=... \
+#       KEY_VAULT_NAME=... DB_HOST_SECRET_NAME=... DB_PASSWORD_SECRET_NAME=... \
+#       PYTHONPATH=. python benchmarks/bench_artifact_publisher.py --user-id <users.id> --runs 10
+
+import os
+import time
+import argparse
+from io import BytesIO
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+os.environ.setdefault("KOCLIP_PRELOAD", "0")  # 임베딩 단계는 스텁이므로 모델을 올리지 않음
+
+from shared import blob_storage
+from shared import psd_writer
+from shared import image_bytes
+from shared.db import models
+from shared.db.database import SessionLocal
+from modelworker import worker
+
+
+def make_png() -> bytes:
+    # gpt-image-1 결과와 비슷한 크기의 1024x1024 합성 이미지
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:1024, 0:1024]
+    img = np.stack([(x // 4) % 256, (y // 4) % 256, ((x + y) // 8) % 256], axis=-1).astype(np.uint8)
+    img[256:768, 256:768] = rng.integers(0, 256, (512, 512, 3), dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(img).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def legacy_stage_publish(ctx: dict, png_data: bytes) -> dict:
+    """user-011 이전의 저장 단계 (순차 업로드 후 DB 저장)"""
+    task_id, user_id = ctx["tracking_id"], ctx["user_id"]
+    dalle_image = image_bytes.LazyImage(png_data)
+    filename_png = f"user_{user_id}/generated/png/{task_id}.png"
+    filename_psd = f"user_{user_id}/generated/psd/{task_id}.psd"
+    blob_storage.upload_blob(blob_name=filename_png, data=dalle_image.data, overwrite=True, content_type="image/png")
+    blob_storage.upload_blob(blob_name=filename_psd, data=psd_writer.encode_psd(dalle_image.image), overwrite=True)
+    db = SessionLocal()
+    try:
+        db.add(models.Image(task_id=task_id, png_url=filename_png, psd_url=filename_psd, user_id=user_id))
+        db.commit()
+    finally:
+        db.close()
+    return {"status": "SUCCESS", "png_url": blob_storage.generate_sas_url(filename_png),
+            "psd_url": blob_storage.generate_sas_url(filename_psd)}
+
+
+def generation_stubs(png_bytes: bytes, generation_s: float) -> dict:
+    def render(ctx):
+        time.sleep(generation_s)
+        return png_bytes
+    return {
+        "stage_embed": lambda ctx: ctx,
+        "stage_retrieve": lambda ctx: [],
+        "stage_prompt": lambda ctx, images: {**ctx, "dalle_prompt": "bench"},
+        "stage_render": render,
+    }
+
+
+def cleanup(task_ids: list, user_id: str):
+    container = blob_storage.blob_service_client.get_container_client(blob_storage.AZURE_CONTAINER_NAME)
+    for task_id in task_ids:
+        for blob_name in (f"user_{user_id}/generated/png/{task_id}.png", f"user_{user_id}/generated/psd/{task_id}.psd"):
+            try:
+                container.delete_blob(blob_name)
+            except Exception:
+                pass
+    db = SessionLocal()
+    try:
+        db.query(models.Image).filter(models.Image.task_id.in_(task_ids)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", required=True, help="images.user_id 로 쓸 기존 users.id")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--generation-ms", type=float, default=0.0, help="스텁 이미지 생성 단계의 대기 시간")
+    args = parser.parse_args()
+
+    if not blob_storage.blob_service_client:
+        raise SystemExit("Azure Storage 환경변수가 없습니다.")
+
+    png_bytes = make_png()
+    stubs = generation_stubs(png_bytes, args.generation_ms / 1000)
+    task_ids = []
+    print(f"{'path':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    try:
+        for name, publish in [("sequential", legacy_stage_publish), ("parallel", worker.stage_publish)]:
+            times = []
+            with mock.patch.multiple(worker, stage_publish=publish, **stubs):
+                for _ in range(args.runs + 1):
+                    started = time.perf_counter()
+                    result = worker.generate_image.apply(args=[args.user_id, "bench", "bench", "스케치", "한옥"])
+                    times.append(time.perf_counter() - started)
+                    task_ids.append(result.id)
+                    if result.result.get("status") != "SUCCESS":
+                        raise SystemExit(f"{name} 실행 실패: {result.result}")
+            times = np.asarray(times[1:]) * 1000  # 첫 실행은 커넥션 준비 시간이 섞이므로 제외
+            print(f"{name:<12}{times.mean():>10.1f}{np.percentile(times, 50):>10.1f}{np.percentile(times, 95):>10.1f}")
+    finally:
+        cleanup(task_ids, args.user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_async_db.py
+# async 엔드포인트에서 동기 SQLAlchemy 세션을 쓰는 기존 방식과 비동기 세션(asyncpg + 풀)을 비교합니다.
+# 일부 요청에 pg_sleep 으로 DB 지연을 넣고, 동시 요청의 p50 / p99 응답 시간을 측정합니다.
+# (동기 방식은 느린 쿼리 하나가 이벤트 루프를 막아 같은 워커의 다른 요청까지 느려짐)
+#
+# 실행: BENCH_DATABASE_URL=postgresql://user:pw@host/db \
+#       PYTHONPATH=. python benchmarks/bench_async_db.py --requests 400 --concurrency 50 --slow-ratio 0.05 --delay-ms 200
+
+import os
+import time
+import random
+import asyncio
+import argparse
+
+import numpy as np
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+
+def make_app(database_url: str, pool_size: int) -> FastAPI:
+    sync_engine = create_engine(database_url, pool_size=pool_size, max_overflow=0)
+    async_engine = create_async_engine(database_url.replace("postgresql://", "postgresql+asyncpg://", 1),
+                                       pool_size=pool_size, max_overflow=0)
+    app = FastAPI()
+
+    @app.get("/sync")
+    async def sync_endpoint(delay: float = 0.0):
+        # 기존 방식: async def 안에서 동기 쿼리 실행 (이벤트 루프 블로킹)
+        with sync_engine.connect() as conn:
+            conn.execute(text("SELECT pg_sleep(:d)"), {"d": delay})
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_endpoint(delay: float = 0.0):
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT pg_sleep(:d)"), {"d": delay})
+        return {"ok": True}
+
+    app.state.engines = (sync_engine, async_engine)
+    return app
+
+
+async def run(app, path, requests, concurrency, slow_ratio, delay_s):
+    random.seed(0)
+    delays = [delay_s if random.random() < slow_ratio else 0.0 for _ in range(requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get(path)  # 워밍업 (커넥션 준비)
+
+        async def one(delay):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path, params={"delay": delay})
+                response.raise_for_status()
+                if delay == 0.0:
+                    latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(d) for d in delays))
+        wall = time.perf_counter() - started
+    return np.asarray(latencies) * 1000, wall
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--slow-ratio", type=float, default=0.05, help="지연을 넣을 요청 비율")
+    parser.add_argument("--delay-ms", type=float, default=200.0)
+    args = parser.parse_args()
+    if not args.database_url:
+        raise SystemExit("--database-url 또는 BENCH_DATABASE_URL 이 필요합니다.")
+
+    app = make_app(args.database_url, args.pool_size)
+    print(f"빠른 요청 응답 시간 (느린 요청 {args.slow_ratio:.0%}, 지연 {args.delay_ms:.0f} ms, 동시 {args.concurrency})")
+    print(f"{'path':<8}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for path in ["/sync", "/async"]:
+        latencies, wall = await run(app, path, args.requests, args.concurrency, args.slow_ratio, args.delay_ms / 1000)
+        print(f"{path:<8}{np.percentile(latencies, 50):>10.1f}{np.percentile(latencies, 99):>10.1f}{args.requests / wall:>10.1f}")
+
+    sync_engine, async_engine = app.state.engines
+    sync_engine.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
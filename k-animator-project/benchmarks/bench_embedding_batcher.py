@@ -0,0 +1,83 @@
+# benchmarks/bench_embedding_batcher.py
+# KoCLIP 텍스트 임베딩 처리량(embeddings/sec)을 batch window / batch size 별로 측정합니다. (CPU)
+#
+# 실행: PYTHONPATH=. python benchmarks/bench_embedding_batcher.py --requests 256 --clients 16
+
+import argparse
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from transformers import AutoProcessor, AutoModel
+
+from modelworker.embedding_batcher import EmbeddingBatcher
+
+TAGS = ["한옥", "기와집", "경복궁", "장독대", "한복", "부채", "돌담길", "정자", "초가집", "서당"]
+
+
+def load_model(model_id):
+    processor = AutoProcessor.from_pretrained(model_id)
+    model = AutoModel.from_pretrained(model_id).eval().to("cpu")
+
+    def embed_texts(texts):
+        inputs = processor(text=list(texts), return_tensors="pt", truncation=True, padding=True)
+        with torch.no_grad():
+            return model.get_text_features(**inputs).numpy().tolist()
+
+    return embed_texts
+
+
+def make_texts(n):
+    texts = []
+    for _ in range(n):
+        tag = random.choice(TAGS)
+        texts.append(f"{tag}가 포함된 한국 웹툰 이미지를 그려주세요. " + " ".join(random.sample(TAGS, 3)))
+    return texts
+
+
+def run_unbatched(embed_texts, texts, clients):
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        started = time.perf_counter()
+        list(pool.map(lambda t: embed_texts([t])[0], texts))
+        return time.perf_counter() - started
+
+
+def run_batched(embed_texts, texts, clients, window_ms, batch_size):
+    batcher = EmbeddingBatcher(embed_texts, window_ms=window_ms, max_batch_size=batch_size)
+    batcher.embed(texts[0])  # 워밍업 + 스레드 시작
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        started = time.perf_counter()
+        list(pool.map(batcher.embed, texts))
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="koclip/koclip-base-pt")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--windows", default="0,2,5,10,20")
+    parser.add_argument("--batch-sizes", default="1,8,16,32,64")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op 스레드 수 (0이면 기본값)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    embed_texts = load_model(args.model)
+    texts = make_texts(args.requests)
+    embed_texts(texts[:2])  # 워밍업
+
+    elapsed = run_unbatched(embed_texts, texts, args.clients)
+    print(f"{'mode':<10}{'window_ms':>10}{'batch':>8}{'emb/s':>10}")
+    print(f"{'single':<10}{'-':>10}{1:>8}{len(texts) / elapsed:>10.1f}")
+
+    for window_ms in [float(w) for w in args.windows.split(",")]:
+        for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+            elapsed = run_batched(embed_texts, texts, args.clients, window_ms, batch_size)
+            print(f"{'batched':<10}{window_ms:>10.0f}{batch_size:>8}{len(texts) / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
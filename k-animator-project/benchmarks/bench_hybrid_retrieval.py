@@ -0,0 +1,108 @@
+# benchmarks/bench_hybrid_retrieval.py
+# 합성 데이터셋으로 exact (ILIKE 필터 + 정렬) 와 hybrid (HNSW top-k → 태그 필터 → 재정렬) 검색의
+# recall / latency 를 비교합니다. 실제 korea_image_data 가 아니라 별도 테이블을 만들어 사용합니다.
+#
+# 실행: PG_HOST=... PG_PORT=... PG_DBNAME=... PG_USER=... PG_PASSWORD=... \
+#       PYTHONPATH=. python benchmarks/bench_hybrid_retrieval.py --rows 50000 --queries 200
+
+import os
+import time
+import random
+import argparse
+
+import numpy as np
+import psycopg
+from pgvector.psycopg import register_vector
+
+from modelworker.reference_db import _exact_search, _hybrid_search
+
+TABLE = "korea_image_data_bench"
+DIM = 512
+VOCAB = ["한옥", "기와집", "경복궁", "장독대", "한복", "부채", "돌담길", "정자", "초가집", "서당",
+         "시장", "골목", "버스", "학교", "교실", "카페", "편의점", "한강", "지하철", "아파트"]
+
+
+def connect():
+    conn = psycopg.connect(
+        host=os.getenv("PG_HOST"), port=os.getenv("PG_PORT"), dbname=os.getenv("PG_DBNAME"),
+        user=os.getenv("PG_USER"), password=os.getenv("PG_PASSWORD"), autocommit=True,
+    )
+    conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    register_vector(conn)
+    return conn
+
+
+def build_dataset(conn, rows, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIM)).astype(np.float32)
+    conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    conn.execute(f"CREATE TABLE {TABLE} (file_name text, tag text, vec_caption vector({DIM}))")
+    with conn.cursor().copy(f"COPY {TABLE} (file_name, tag, vec_caption) FROM STDIN WITH (FORMAT BINARY)") as copy:
+        copy.set_types(["text", "text", "vector"])
+        for i in range(rows):
+            vec = centers[i % clusters] + rng.normal(scale=0.3, size=DIM).astype(np.float32)
+            tag = " ".join(random.sample(VOCAB, 2))
+            copy.write_row((f"bench_{i}", tag, vec))
+    started = time.perf_counter()
+    conn.execute(f"CREATE INDEX ON {TABLE} USING hnsw (vec_caption vector_l2_ops) WITH (m = 16, ef_construction = 64)")
+    conn.execute(f"ANALYZE {TABLE}")
+    print(f"dataset: {rows} rows, HNSW build {time.perf_counter() - started:.1f}s")
+    return centers
+
+
+def percentile(values, p):
+    return float(np.percentile(np.asarray(values) * 1000, p))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=1)
+    parser.add_argument("--candidates", default="50,100,200,400")
+    parser.add_argument("--ef-search", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="벤치마크 테이블을 삭제하지 않음")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    conn = connect()
+    centers = build_dataset(conn, args.rows, args.clusters, args.seed)
+    conn.execute(f"SET hnsw.ef_search = {args.ef_search}")
+
+    rng = np.random.default_rng(args.seed + 1)
+    queries = []
+    for _ in range(args.queries):
+        vec = centers[rng.integers(len(centers))] + rng.normal(scale=0.3, size=DIM).astype(np.float32)
+        queries.append((random.sample(VOCAB, 1), vec))
+
+    exact_times, truth = [], []
+    for words, vec in queries:
+        started = time.perf_counter()
+        truth.append(_exact_search(conn, TABLE, words, vec, args.limit))
+        exact_times.append(time.perf_counter() - started)
+    print(f"{'mode':<16}{'recall':>8}{'fallback':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'exact':<16}{1.0:>8.3f}{'-':>10}{percentile(exact_times, 50):>10.2f}{percentile(exact_times, 99):>10.2f}")
+
+    for candidates in [int(c) for c in args.candidates.split(",")]:
+        times, hits, fallbacks = [], 0, 0
+        for (words, vec), expected in zip(queries, truth):
+            started = time.perf_counter()
+            found = _hybrid_search(conn, TABLE, words, vec, args.limit, candidates=candidates)
+            if found is None:
+                fallbacks += 1
+                found = _exact_search(conn, TABLE, words, vec, args.limit)
+            times.append(time.perf_counter() - started)
+            hits += len(set(found) & set(expected))
+        recall = hits / max(sum(len(t) for t in truth), 1)
+        label = f"hybrid k={candidates}"
+        print(f"{label:<16}{recall:>8.3f}{fallbacks:>10}{percentile(times, 50):>10.2f}{percentile(times, 99):>10.2f}")
+
+    if not args.keep:
+        conn.execute(f"DROP TABLE {TABLE}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_koclip_backends.py
+# KoCLIP 텍스트 임베딩을 PyTorch fp32 전체 모델과 ONNX 텍스트 인코더(int8)로 비교합니다. (CPU)
+# 백엔드마다 새 프로세스에서 로딩 시간, 배치 크기별 지연 시간, 최대 RSS 를 측정합니다.
+#
+# 실행: PYTHONPATH=. python benchmarks/bench_koclip_backends.py --onnx modelworker/onnx/koclip_text_int8.onnx --runs 50
+
+import os
+import time
+import random
+import argparse
+import resource
+import multiprocessing as mp
+
+import numpy as np
+
+TAGS = ["한옥", "기와집", "경복궁", "장독대", "한복", "부채", "돌담길", "정자", "초가집", "서당"]
+
+
+def make_texts(n):
+    random.seed(0)
+    return [f"{random.choice(TAGS)}가 포함된 한국 웹툰 이미지를 그려주세요. " + " ".join(random.sample(TAGS, 3))
+            for _ in range(n)]
+
+
+def run_backend(backend, onnx_path, batch_sizes, runs, threads, result):
+    import torch
+    torch.set_num_threads(threads)
+    os.environ["KOCLIP_ONNX_THREADS"] = str(threads)
+    from modelworker import koclip
+    koclip.KOCLIP_ONNX_THREADS = threads
+
+    started = time.perf_counter()
+    if backend == "onnx":
+        embed_texts = koclip.load_onnx_text_encoder(onnx_path)
+    else:
+        embed_texts = koclip.load_torch_text_encoder()
+    load_s = time.perf_counter() - started
+
+    latencies = {}
+    for batch_size in batch_sizes:
+        texts = make_texts(batch_size)
+        embed_texts(texts)  # 워밍업
+        times = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            embed_texts(texts)
+            times.append(time.perf_counter() - started)
+        latencies[batch_size] = times
+    result.put({"load_s": load_s, "latencies": latencies,
+                "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--onnx", default=os.getenv("KOCLIP_ONNX_PATH", "modelworker/onnx/koclip_text_int8.onnx"))
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+
+    print(f"{'backend':<8}{'batch':>7}{'p50 ms':>10}{'p95 ms':>10}{'load s':>9}{'RSS MB':>9}")
+    ctx = mp.get_context("spawn")
+    for backend in ["torch", "onnx"]:
+        if backend == "onnx" and not os.path.exists(args.onnx):
+            print(f"{backend:<8}ONNX 파일이 없어 건너뜀 (python -m modelworker.export_koclip_onnx)")
+            continue
+        result = ctx.Queue()
+        proc = ctx.Process(target=run_backend, args=(backend, args.onnx, batch_sizes, args.runs, args.threads, result))
+        proc.start()
+        stats = result.get()
+        proc.join()
+        for batch_size, times in stats["latencies"].items():
+            times = np.asarray(times) * 1000
+            print(f"{backend:<8}{batch_size:>7}{np.percentile(times, 50):>10.1f}{np.percentile(times, 95):>10.1f}"
+                  f"{stats['load_s']:>9.1f}{stats['rss_kb'] / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_password_hashing.py
+# 로그인 폭주 상황에서 bcrypt 를 요청 스레드에서 바로 실행하는 기존 방식(inline)과
+# auth.core.hashing 의 전용 프로세스 풀(크기별)을 비교합니다.
+# FastAPI 의 동기 핸들러처럼 40개 스레드 풀에서 로그인과 가벼운 요청(다른 API)을 함께 처리하고,
+# 로그인 처리량 / 지연과 가벼운 요청의 p50 / p99 지연을 측정합니다.
+#
+# 실행: PYTHONPATH=. python benchmarks/bench_password_hashing.py --logins 200 --pool-sizes 1,2,4 --rounds 12
+
+import time
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+from fastapi import HTTPException
+
+from auth.core import hashing
+
+REQUEST_THREADS = 40  # starlette/anyio 기본 스레드 풀 크기
+
+
+def light_request():
+    # 다른 API 의 가벼운 처리 (JSON 직렬화 정도의 CPU 작업)
+    return sum(i * i for i in range(2000))
+
+
+def run(logins: int, password: str, hashed: str, light_interval_s: float):
+    login_latencies, light_latencies = [], []
+    rejected = 0
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def login():
+        nonlocal rejected
+        started = time.perf_counter()
+        try:
+            assert hashing.verify_password(password, hashed)
+        except HTTPException:
+            with lock:
+                rejected += 1
+            return
+        with lock:
+            login_latencies.append(time.perf_counter() - started)
+
+    def light():
+        started = time.perf_counter()
+        light_request()
+        return started
+
+    with ThreadPoolExecutor(max_workers=REQUEST_THREADS) as executor:
+        def light_loop():
+            while not done.is_set():
+                submitted = time.perf_counter()
+                executor.submit(light).result()
+                light_latencies.append(time.perf_counter() - submitted)
+                time.sleep(light_interval_s)
+
+        prober = threading.Thread(target=light_loop, daemon=True)
+        prober.start()
+        started = time.perf_counter()
+        for future in [executor.submit(login) for _ in range(logins)]:
+            future.result()
+        wall = time.perf_counter() - started
+        done.set()
+        prober.join()
+
+    return np.asarray(login_latencies) * 1000, np.asarray(light_latencies) * 1000, rejected, wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--pool-sizes", default="1,2,4")
+    parser.add_argument("--queue-depth", type=int, default=hashing.HASH_QUEUE_DEPTH)
+    parser.add_argument("--rounds", type=int, default=hashing.BCRYPT_ROUNDS)
+    parser.add_argument("--light-interval-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    password = "bench-password-1234"
+    hashed = hashing.pwd_context.hash(password, rounds=args.rounds)
+    modes = [("inline", None)] + [(f"pool={n}", int(n)) for n in args.pool_sizes.split(",")]
+
+    print(f"로그인 {args.logins}건 동시 요청 (bcrypt rounds {args.rounds}, 요청 스레드 {REQUEST_THREADS}, 대기열 {args.queue_depth})")
+    print(f"{'mode':<10}{'login/s':>10}{'login p50':>11}{'login p99':>11}{'503':>6}{'other p50':>11}{'other p99':>11}")
+    for name, pool_size in modes:
+        if pool_size is None:
+            hashing.HASH_POOL_ENABLED = False
+        else:
+            hashing.HASH_POOL_ENABLED = True
+            hashing._pool = ProcessPoolExecutor(max_workers=pool_size, mp_context=multiprocessing.get_context("spawn"))
+            hashing._slots = threading.BoundedSemaphore(pool_size + args.queue_depth)
+            for future in [hashing._pool.submit(hashing._warmup) for _ in range(pool_size)]:
+                future.result()
+
+        logins, light, rejected, wall = run(args.logins, password, hashed, args.light_interval_ms / 1000)
+        served = len(logins)
+        print(f"{name:<10}{served / wall:>10.1f}{np.percentile(logins, 50):>11.1f}{np.percentile(logins, 99):>11.1f}"
+              f"{rejected:>6}{np.percentile(light, 50):>11.2f}{np.percentile(light, 99):>11.2f}")
+        hashing.shutdown()
+
+
+if __name__ == "__main__":
+    main()
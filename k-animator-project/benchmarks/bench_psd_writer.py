@@ -0,0 +1,135 @@
+# benchmarks/bench_psd_writer.py
+# PNG → PSD 변환을 기존 방식(임시 PNG + ImageMagick convert 프로세스 + 다시 읽기)과
+# shared.psd_writer (메모리 내 RLE 인코딩) 로 비교합니다. 시간과 최대 RSS 를 측정합니다.
+#
+# 측정 전에 psd_tools 로 다시 읽어 픽셀이 원본과 같은지 확인합니다. (RGBA 는 레이어 픽셀 + 투명도, 다르면 종료 코드 1)
+#
+# 실행: PYTHONPATH=. python benchmarks/bench_psd_writer.py [--image sample.png] --runs 10
+
+import os
+import time
+import shutil
+import argparse
+import resource
+import subprocess
+import tempfile
+import multiprocessing as mp
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+from psd_tools import PSDImage
+
+from shared import psd_writer
+
+
+def make_sample(path):
+    # 매끄러운 그라디언트 + 노이즈 영역이 섞인 1024x1024 합성 이미지
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:1024, 0:1024]
+    img = np.stack([(x // 4) % 256, (y // 4) % 256, ((x + y) // 8) % 256], axis=-1).astype(np.uint8)
+    img[256:768, 256:768] = rng.integers(0, 256, (512, 512, 3), dtype=np.uint8)
+    Image.fromarray(img).save(path, format="PNG")
+
+
+def round_trip_error(image: Image.Image) -> int:
+    """encode_psd 결과를 psd_tools 로 다시 읽어 원본과의 최대 픽셀 차이를 반환합니다."""
+    psd = PSDImage.open(BytesIO(psd_writer.encode_psd(image)))
+    if image.mode == "RGBA":
+        # 투명도가 있으면 레이어에 원본 RGBA 가 그대로, 합쳐진 이미지에는 같은 투명도가 있어야 함
+        expected = np.asarray(image).astype(np.int32)
+        layer_image = psd[0].topil() if len(psd) else psd.topil()  # 레이어가 없으면 합쳐진 이미지로 비교
+        layer = np.asarray(layer_image.convert("RGBA")).astype(np.int32)
+        merged_alpha = np.asarray(psd.topil().convert("RGBA")).astype(np.int32)[..., 3]
+        return int(max(np.abs(layer - expected).max(), np.abs(merged_alpha - expected[..., 3]).max()))
+    mode = "L" if image.mode in ("L", "1") else "RGB"
+    expected = np.asarray(image.convert(mode)).astype(np.int32)
+    return int(np.abs(np.asarray(psd.topil().convert(mode)).astype(np.int32) - expected).max())
+
+
+def verify(png_bytes) -> bool:
+    # 입력 이미지와, 반투명 픽셀이 섞인 RGBA / 흑백 합성 이미지로 확인
+    rng = np.random.default_rng(1)
+    rgba = rng.integers(0, 256, (128, 96, 4), dtype=np.uint8)
+    rgba[:64, :, 3] = 255
+    images = [("input", Image.open(BytesIO(png_bytes))),
+              ("rgba", Image.fromarray(rgba, "RGBA")),
+              ("gray", Image.fromarray(rgba[..., 0], "L"))]
+    ok = True
+    for name, image in images:
+        error = round_trip_error(image)
+        print(f"round-trip {name:<6} ({image.mode}): 최대 픽셀 차이 {error}")
+        ok = ok and error == 0
+    return ok
+
+
+def run_subprocess(png_bytes, runs, result):
+    times = []
+    child_rss = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(runs):
+            started = time.perf_counter()
+            image = Image.open(BytesIO(png_bytes))
+            png_path = os.path.join(tmp, f"{i}.png")
+            psd_path = os.path.join(tmp, f"{i}.psd")
+            image.save(png_path, format="PNG")
+            subprocess.run(["convert", png_path, psd_path], check=True)
+            with open(psd_path, "rb") as f:
+                data = f.read()
+            times.append(time.perf_counter() - started)
+        child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    result.put({"times": times, "size": len(data),
+                "self_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "child_rss_kb": child_rss})
+
+
+def run_in_process(png_bytes, runs, result):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        image = Image.open(BytesIO(png_bytes))
+        data = psd_writer.encode_psd(image)
+        times.append(time.perf_counter() - started)
+    result.put({"times": times, "size": len(data),
+                "self_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "child_rss_kb": 0})
+
+
+def measure(target, png_bytes, runs):
+    # 경로마다 새 프로세스에서 실행해 최대 RSS 가 서로 섞이지 않게 함
+    ctx = mp.get_context("spawn")
+    result = ctx.Queue()
+    proc = ctx.Process(target=target, args=(png_bytes, runs, result))
+    proc.start()
+    stats = result.get()
+    proc.join()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image", help="변환할 PNG (없으면 1024x1024 합성 이미지)")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    path = args.image
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), "bench_psd_sample.png")
+        make_sample(path)
+    with open(path, "rb") as f:
+        png_bytes = f.read()
+
+    if not verify(png_bytes):
+        raise SystemExit("psd_writer round-trip 결과가 원본과 다릅니다.")
+
+    print(f"{'path':<12}{'mean ms':>10}{'p95 ms':>10}{'psd KB':>10}{'self RSS MB':>13}{'child RSS MB':>14}")
+    for name, target in [("convert", run_subprocess), ("psd_writer", run_in_process)]:
+        if name == "convert" and shutil.which("convert") is None:
+            print(f"{name:<12}ImageMagick convert 가 없어 건너뜀")
+            continue
+        stats = measure(target, png_bytes, args.runs)
+        times = np.asarray(stats["times"]) * 1000
+        print(f"{name:<12}{times.mean():>10.1f}{np.percentile(times, 95):>10.1f}{stats['size'] / 1024:>10.0f}"
+              f"{stats['self_rss_kb'] / 1024:>13.1f}{stats['child_rss_kb'] / 1024:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
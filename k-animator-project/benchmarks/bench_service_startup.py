@@ -0,0 +1,93 @@
+# benchmarks/bench_service_startup.py
+# 서비스 시작 시 Key Vault 시크릿 조회 시간을 비교합니다.
+#   sequential : 기존 방식 (DB / Redis / JWT 모듈이 각자 Credential 을 만들고 시크릿을 하나씩 조회)
+#   concurrent : shared.keyvault.load() (Credential 1개, 설정된 시크릿 동시 조회)
+#   file-cache : 컨테이너 재시작 상황 (SECRETS_CACHE_PATH 의 캐시 파일 사용, Key Vault 조회 없음)
+# --import-module 을 주면 해당 모듈 import 시간(새 프로세스)도 측정합니다. (DB / Redis / JWT 는 lazy 이므로 Key Vault 를 기다리지 않음)
+#
+# 실행: KEY_VAULT_NAME=... DB_HOST_SECRET_NAME=... DB_PASSWORD_SECRET_NAME=... REDIS_HOST_SECRET_NAME=... \
+#       REDIS_PASSWORD_SECRET_NAME=... JWT_SECRET_NAME=... \
+#       PYTHONPATH=. python benchmarks/bench_service_startup.py --runs 5 --import-module auth.main
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import subprocess
+
+import numpy as np
+from azure.keyvault.secrets import SecretClient
+from azure.identity import DefaultAzureCredential
+
+from shared import keyvault
+
+# 기존 코드에서 모듈별로 조회하던 시크릿
+LEGACY_MODULES = [
+    ("shared/db/database.py", ["DB_HOST_SECRET_NAME", "DB_PASSWORD_SECRET_NAME"]),
+    ("auth/db/redis_re.py", ["REDIS_HOST_SECRET_NAME", "REDIS_PASSWORD_SECRET_NAME"]),
+    ("auth/core/security.py", ["JWT_SECRET_NAME"]),
+]
+
+
+def sequential():
+    vault_url = f"https://{keyvault.KEY_VAULT_NAME}.vault.azure.net"
+    for _, envs in LEGACY_MODULES:
+        client = SecretClient(vault_url=vault_url, credential=DefaultAzureCredential())
+        for env in envs:
+            if os.getenv(env):
+                client.get_secret(os.getenv(env))
+
+
+def reset_keyvault(cache_path=None):
+    keyvault._values, keyvault._loaded_at, keyvault._last_attempt, keyvault._client = {}, 0.0, 0.0, None
+    keyvault.SECRETS_CACHE_PATH = cache_path
+
+
+def concurrent():
+    reset_keyvault()
+    keyvault.load(force=True)
+
+
+def measure(fn, runs: int):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return np.asarray(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-module", default=None, help="import 시간을 잴 모듈 (예: auth.main)")
+    args = parser.parse_args()
+    if not keyvault.KEY_VAULT_NAME:
+        raise SystemExit("KEY_VAULT_NAME 및 *_SECRET_NAME 환경 변수가 필요합니다.")
+    print(f"조회할 시크릿: {keyvault._configured_names()}")
+
+    results = [("sequential", measure(sequential, args.runs)), ("concurrent", measure(concurrent, args.runs))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "keyvault.json")
+        reset_keyvault(cache_path)
+        keyvault.load(force=True)  # 캐시 파일 생성
+
+        def from_file():
+            reset_keyvault(cache_path)
+            keyvault.load()
+        results.append(("file-cache", measure(from_file, args.runs)))
+
+    if args.import_module:
+        def import_module():
+            subprocess.run([sys.executable, "-c", f"import {args.import_module}"], check=True, env=os.environ)
+        results.append((f"import {args.import_module}", measure(import_module, args.runs)))
+
+    print(f"{'mode':<28}{'p50 ms':>10}{'max ms':>10}")
+    for name, timings in results:
+        print(f"{name:<28}{np.percentile(timings, 50):>10.1f}{timings.max():>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
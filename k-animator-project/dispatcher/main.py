@@ -0,0 +1,262 @@
+# dispatcher/main.py
+# shared/fair_queue.py 의 사용자별 가상 큐에서 작업을 꺼내 가중 라운드로빈(DRR)으로 Celery 큐에 내보냅니다.
+# Celery 큐에 이미 쌓인 작업이 FAIR_QUEUE_MAX_BACKLOG 이상이면 내보내지 않고 기다려,
+# 대기열이 브로커(FIFO)가 아니라 사용자별 큐에 머물도록 합니다.
+# 사용자별 대기 시간 / 대기 작업 수는 Prometheus 형식으로 /metrics 에 노출합니다.
+
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import redis
+from celery import Celery
+
+from shared import fair_queue
+
+logging.basicConfig(level=logging.INFO, format="[%(asctime)s: %(levelname)s] %(message)s")
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
+FAIR_QUEUE_MAX_BACKLOG = int(os.getenv("FAIR_QUEUE_MAX_BACKLOG", "4"))  # Celery 큐에 미리 넣어 둘 최대 작업 수 (lane 별)
+FAIR_QUEUE_DEFAULT_WEIGHT = float(os.getenv("FAIR_QUEUE_DEFAULT_WEIGHT", "1"))
+FAIR_QUEUE_POLL_INTERVAL_S = float(os.getenv("FAIR_QUEUE_POLL_INTERVAL_S", "0.2"))
+FAIR_QUEUE_METRICS_PORT = int(os.getenv("FAIR_QUEUE_METRICS_PORT", "9108"))
+FAIR_QUEUE_MAX_RELEASE_ATTEMPTS = int(os.getenv("FAIR_QUEUE_MAX_RELEASE_ATTEMPTS", "5"))  # 전송 실패 시 재시도 횟수, 넘으면 FAILURE 기록
+# /metrics 사용자별 시계열 제한: 마지막 관측 후 TTL 이 지나면 제거, lane 마다 최대 MAX_USERS 명 (lane 합계는 항상 노출)
+FAIR_QUEUE_METRICS_USER_TTL_S = float(os.getenv("FAIR_QUEUE_METRICS_USER_TTL_S", "3600"))
+FAIR_QUEUE_METRICS_MAX_USERS = int(os.getenv("FAIR_QUEUE_METRICS_MAX_USERS", "200"))
+LOCK_KEY = f"{fair_queue.FAIR_QUEUE_PREFIX}dispatcher:lock"
+LOCK_TTL_MS = 10000
+
+celery_app = Celery("dispatcher", broker=CELERY_BROKER_URL)
+celery_app.conf.result_backend = CELERY_BROKER_URL
+
+fq = redis.Redis.from_url(fair_queue.FAIR_QUEUE_REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+broker = redis.Redis.from_url(CELERY_BROKER_URL, socket_timeout=2, socket_connect_timeout=2)
+pop_script = fq.register_script(fair_queue.POP_LUA)
+requeue_script = fq.register_script(fair_queue.REQUEUE_LUA)
+
+# 잠금을 가진 dispatcher 만 내보냄 (여러 replica 가 떠도 순서/가중치가 깨지지 않게)
+REFRESH_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) and 1 or 0
+"""
+refresh_lock = fq.register_script(REFRESH_LOCK_LUA)
+instance_id = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _label(value: str) -> str:
+    """Prometheus 라벨 값 escape (\\, ", 줄바꿈)"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class WaitMetrics:
+    """사용자별 대기 시간 통계 (enqueue → Celery 전송)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = defaultdict(int)
+        self.total_s = defaultdict(float)
+        self.max_s = defaultdict(float)
+        self.last_s = {}
+        self.seen_at = {}
+        self.lane_count = defaultdict(int)
+        self.lane_total_s = defaultdict(float)
+
+    def observe(self, lane: str, identity: str, wait_s: float):
+        key = (lane, identity)
+        with self._lock:
+            self.count[key] += 1
+            self.total_s[key] += wait_s
+            self.max_s[key] = max(self.max_s[key], wait_s)
+            self.last_s[key] = wait_s
+            self.seen_at[key] = time.monotonic()
+            self.lane_count[lane] += 1
+            self.lane_total_s[lane] += wait_s
+
+    def _prune(self):
+        # 오래 관측되지 않은 사용자, lane 별 최대 수를 넘는 사용자(오래된 순)를 제거해 시계열 수를 제한
+        now = time.monotonic()
+        expired = [key for key, seen in self.seen_at.items() if now - seen > FAIR_QUEUE_METRICS_USER_TTL_S]
+        by_lane = defaultdict(list)
+        for key, seen in self.seen_at.items():
+            by_lane[key[0]].append((seen, key))
+        for entries in by_lane.values():
+            if len(entries) > FAIR_QUEUE_METRICS_MAX_USERS:
+                entries.sort()
+                expired.extend(key for _, key in entries[:len(entries) - FAIR_QUEUE_METRICS_MAX_USERS])
+        for key in set(expired):
+            for table in (self.count, self.total_s, self.max_s, self.last_s, self.seen_at):
+                table.pop(key, None)
+
+    def render(self) -> str:
+        lines = [
+            "# TYPE fairq_lane_wait_seconds summary",
+            "# TYPE fairq_wait_seconds summary",
+            "# TYPE fairq_wait_seconds_max gauge",
+            "# TYPE fairq_wait_seconds_last gauge",
+            "# TYPE fairq_backlog gauge",
+            "# TYPE fairq_lane_backlog gauge",
+            "# TYPE fairq_lane_active_users gauge",
+            "# TYPE fairq_redis_up gauge",
+        ]
+        with self._lock:
+            self._prune()
+            for lane, count in self.lane_count.items():
+                lines.append(f'fairq_lane_wait_seconds_count{{lane="{_label(lane)}"}} {count}')
+                lines.append(f'fairq_lane_wait_seconds_sum{{lane="{_label(lane)}"}} {self.lane_total_s[lane]:.3f}')
+            for (lane, identity), count in self.count.items():
+                labels = f'lane="{_label(lane)}",user="{_label(identity)}"'
+                lines.append(f"fairq_wait_seconds_count{{{labels}}} {count}")
+                lines.append(f"fairq_wait_seconds_sum{{{labels}}} {self.total_s[(lane, identity)]:.3f}")
+                lines.append(f"fairq_wait_seconds_max{{{labels}}} {self.max_s[(lane, identity)]:.3f}")
+                lines.append(f"fairq_wait_seconds_last{{{labels}}} {self.last_s[(lane, identity)]:.3f}")
+        try:
+            lines.extend(self._backlog_lines())
+            lines.append("fairq_redis_up 1")
+        except redis.RedisError as e:
+            # Redis 가 잠시 안 되더라도 대기 시간 통계는 계속 수집되도록 나머지만 응답
+            logging.warning(f"[DISPATCH] /metrics 대기 작업 수 조회 실패: {e}")
+            lines.append("fairq_redis_up 0")
+        return "\n".join(lines) + "\n"
+
+    def _backlog_lines(self) -> list:
+        lines = []
+        for lane in fair_queue.LANES:
+            identities = [identity.decode("utf-8") for identity in fq.smembers(fair_queue.active_key(lane))]
+            pipe = fq.pipeline(transaction=False)
+            for identity in identities:
+                pipe.llen(fair_queue.user_key(lane, identity))
+            backlogs = sorted(zip(pipe.execute(), identities), reverse=True)
+            lines.append(f'fairq_lane_backlog{{lane="{_label(lane)}"}} {sum(backlog for backlog, _ in backlogs)}')
+            lines.append(f'fairq_lane_active_users{{lane="{_label(lane)}"}} {len(backlogs)}')
+            # 사용자별 값은 대기 작업이 많은 순으로 최대 FAIR_QUEUE_METRICS_MAX_USERS 명
+            for backlog, identity in backlogs[:FAIR_QUEUE_METRICS_MAX_USERS]:
+                lines.append(f'fairq_backlog{{lane="{_label(lane)}",user="{_label(identity)}"}} {backlog}')
+        return lines
+
+
+metrics = WaitMetrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/metrics", "/health"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = b"ok" if self.path == "/health" else metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def release(lane: str, job: dict):
+    signature = celery_app.signature(job["signature"])
+    signature.apply_async()
+    wait_s = max(time.time() - job["enqueued_at"], 0.0)
+    metrics.observe(lane, job["identity"], wait_s)
+    logging.info(f"[DISPATCH] {lane} → {fair_queue.LANES[lane]} - user: {job['identity']}, task_id: {job['task_id']}, 대기: {wait_s:.1f}s")
+
+
+def handle_release_failure(lane: str, identity: str, job: dict, error: Exception):
+    """
+    이미 사용자 큐에서 꺼낸 작업의 Celery 전송이 실패한 경우: 사용자 큐 맨 앞에 되돌려 다시 시도하고,
+    FAIR_QUEUE_MAX_RELEASE_ATTEMPTS 번 실패하면 결과 백엔드에 FAILURE 를 기록해 클라이언트가 무한히 기다리지 않게 합니다.
+    """
+    job["attempts"] = job.get("attempts", 0) + 1
+    if job["attempts"] < FAIR_QUEUE_MAX_RELEASE_ATTEMPTS:
+        try:
+            requeue_script(
+                keys=[fair_queue.user_key(lane, identity), fair_queue.active_key(lane), fair_queue.ring_key(lane)],
+                args=[json.dumps(job), identity],
+            )
+            logging.info(f"[DISPATCH] 전송 실패 작업 재등록 - {lane}/{identity}, task_id: {job['task_id']}, 시도: {job['attempts']}")
+            return
+        except redis.RedisError as e:
+            logging.error(f"[DISPATCH] 재등록 실패 - {lane}/{identity}, task_id: {job['task_id']}: {e}")
+
+    try:
+        celery_app.backend.mark_as_failure(job["task_id"], RuntimeError(f"작업 전송 실패: {error}"))
+        logging.error(f"[DISPATCH] 작업 실패 처리 - {lane}/{identity}, task_id: {job['task_id']}")
+    except Exception as e:
+        logging.error(f"[DISPATCH] 실패 기록 불가 - task_id: {job['task_id']}: {e}")
+
+
+def dispatch_lane(lane: str, deficits: dict) -> int:
+    """한 lane 에서 Celery 큐 여유만큼 작업을 내보내고, 내보낸 수를 반환합니다."""
+    capacity = FAIR_QUEUE_MAX_BACKLOG - broker.llen(fair_queue.LANES[lane])
+    if capacity <= 0:
+        return 0
+    ring = fair_queue.ring_key(lane)
+    weights = fq.hgetall(fair_queue.FAIR_QUEUE_WEIGHTS_KEY)
+    released = 0
+    rounds = fq.llen(ring)
+
+    while capacity > 0 and rounds > 0:
+        # ring 을 한 칸 회전 (사용자를 빼지 않고 맨 뒤로 보내므로 중간에 죽어도 사용자가 사라지지 않음)
+        identity = fq.lmove(ring, ring, "LEFT", "RIGHT")
+        if identity is None:
+            break
+        rounds -= 1
+        identity = identity.decode("utf-8")
+        weight = max(float(weights.get(identity.encode("utf-8"), FAIR_QUEUE_DEFAULT_WEIGHT)), 0.1)
+        deficits[identity] = deficits.get(identity, 0.0) + weight
+
+        while deficits[identity] >= 1 and capacity > 0:
+            raw_job, drained = pop_script(
+                keys=[fair_queue.user_key(lane, identity), fair_queue.active_key(lane), ring],
+                args=[identity],
+            )
+            if raw_job:
+                job = json.loads(raw_job)
+                try:
+                    release(lane, job)
+                except Exception as e:
+                    logging.error(f"[DISPATCH] 전송 실패 - {lane}/{identity}: {e}", exc_info=True)
+                    handle_release_failure(lane, identity, job, e)
+                    return released  # 브로커 장애일 수 있으므로 이번 회차는 중단하고 잠시 후 다시 시도
+                deficits[identity] -= 1
+                capacity -= 1
+                released += 1
+            if drained:
+                deficits.pop(identity, None)  # 큐가 비면 남은 몫은 이월하지 않음
+                break
+
+        # 한 바퀴를 다 돌았는데 여유가 남으면 다시 처음부터 (가중치가 1 미만인 사용자 몫 누적)
+        if rounds == 0 and capacity > 0:
+            rounds = fq.llen(ring)
+    return released
+
+
+def main():
+    server = ThreadingHTTPServer(("0.0.0.0", FAIR_QUEUE_METRICS_PORT), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    logging.info(f"[DISPATCH] 시작 - lanes: {fair_queue.LANES}, max_backlog: {FAIR_QUEUE_MAX_BACKLOG}, metrics: :{FAIR_QUEUE_METRICS_PORT}")
+
+    deficits = {lane: {} for lane in fair_queue.LANES}
+    while True:
+        try:
+            if not refresh_lock(keys=[LOCK_KEY], args=[instance_id, LOCK_TTL_MS]):
+                time.sleep(1)
+                continue
+            released = sum(dispatch_lane(lane, deficits[lane]) for lane in fair_queue.LANES)
+            if released == 0:
+                time.sleep(FAIR_QUEUE_POLL_INTERVAL_S)
+        except redis.RedisError as e:
+            logging.error(f"[DISPATCH] Redis 오류: {e}")
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
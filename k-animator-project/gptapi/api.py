@@ -1,10 +1,18 @@
-from fastapi import FastAPI, HTTPException, APIRouter
+from fastapi import FastAPI, HTTPException, APIRouter, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from celery import Celery
 from celery.result import AsyncResult
 import os
 import logging
 
+from shared import task_events
+from shared import task_results
+from shared import admission
+from shared import fair_queue
+from shared import idempotency
+
 router = APIRouter(
     tags=["GPT API"]
 )
@@ -16,6 +24,9 @@ class ImagePromptRequest(BaseModel):
     text_prompt: str
     image_url: str | None = None
 
+class TaskResultsRequest(BaseModel):
+    task_ids: list[str]
+
 class LayerSeparationRequest(BaseModel):
     image_url: str
 
@@ -23,9 +34,15 @@ CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")  #배
 celery_app = Celery("worker", broker=CELERY_BROKER_URL)
 celery_app.conf.result_backend = CELERY_BROKER_URL
 
+# 결과 push 설정: SSE 최대 연결 시간 / long-poll 최대 대기 시간(초)
+RESULT_STREAM_TIMEOUT_S = float(os.getenv("RESULT_STREAM_TIMEOUT_S", "600"))
+RESULT_LONG_POLL_MAX_S = float(os.getenv("RESULT_LONG_POLL_MAX_S", "25"))
+
 @router.post("/separate-layers")
 async def separate_layers_task_endpoint(
-    request: LayerSeparationRequest
+    request: LayerSeparationRequest,
+    http_request: Request,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key")
     ):
     if not request.image_url or not request.image_url.strip():
         raise HTTPException(status_code=400, detail="Image URL cannot be empty.")
@@ -33,17 +50,26 @@ async def separate_layers_task_endpoint(
     logger.info(f"[REQUEST] POST /api/gpt/separate-layers")
     logger.info(f"[DATA] image_url: {request.image_url}")
 
-    task = celery_app.send_task(
-        "separate_layers_task",
-        args=[request.image_url],
-        queue='layer_queue'
-    )
-    logging.info(f"[TASK] Celery task 'separate_layers_task' 전송 완료 - task_id: {task.id}")
-    return {"task_id": task.id}
+    # 인증 없는 API 이므로 클라이언트가 보낸 X-User-ID 대신 IP 기준 (X-User-ID 를 바꿔 가며 사용자별 제한 / 공정 큐를 피하지 못하도록)
+    identity = admission.client_ip_identity(http_request)
+
+    # 사용자별 공정 큐에 넣으면 dispatcher 가 사용자 간 라운드로빈으로 layer_queue 에 내보냄
+    # admission 토큰은 새 작업을 실제로 제출할 때만 차감 (중복 요청이 429 를 받지 않도록)
+    async def submit(task_id: str) -> dict:
+        await admission.enforce("separate_layers", identity)
+        signature = celery_app.signature("separate_layers_task", args=[request.image_url], queue='layer_queue')
+        task_id, pending_for_user = await fair_queue.submit("layer", identity, signature, task_id=task_id)
+        logging.info(f"[TASK] Celery task 'separate_layers_task' 대기열 등록 완료 - task_id: {task_id}, 내 대기 작업 수: {pending_for_user}")
+        return {"task_id": task_id, "pending_for_user": pending_for_user}
+
+    # 같은 요청(더블클릭 / 재시도)은 한 번만 제출하고 기존 task_id 를 돌려줌
+    return await idempotency.submit_once("separate_layers", identity, request.model_dump(), idempotency_key, submit)
 
 @router.post("/generate-image")
 async def generate_image_task(
-    request: ImagePromptRequest
+    request: ImagePromptRequest,
+    http_request: Request,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key")
 ):
     if not request.text_prompt or not request.text_prompt.strip():
         raise HTTPException(status_code=400, detail="Text prompt cannot be empty.")
@@ -51,17 +77,49 @@ async def generate_image_task(
     logging.info(f"[REQUEST] POST /api/generate-image")
     logging.info(f"[DATA] prompt: {request.text_prompt}")
     logging.info(f"[DATA] image_url: {request.image_url}")
+    # 인증 없는 API 이므로 클라이언트가 보낸 X-User-ID 대신 IP 기준 (X-User-ID 를 바꿔 가며 사용자별 제한 / 공정 큐를 피하지 못하도록)
+    identity = admission.client_ip_identity(http_request)
 
-    task = celery_app.send_task(
-        "gpt_image",
-        args=[
-            request.text_prompt,    
-            request.image_url
-        ],
-        queue='gpt_queue'
-    )
-    logging.info(f"[TASK] Celery task 전송 완료 - task_id: {task.id}")
-    return {"task_id": task.id}
+    # admission 토큰은 새 작업을 실제로 제출할 때만 차감 (중복 요청이 429 를 받지 않도록)
+    async def submit(task_id: str) -> dict:
+        await admission.enforce("gpt_image", identity)
+        task = celery_app.send_task(
+            "gpt_image",
+            args=[
+                request.text_prompt,    
+                request.image_url
+            ],
+            queue='gpt_queue',
+            task_id=task_id
+        )
+        logging.info(f"[TASK] Celery task 전송 완료 - task_id: {task.id}")
+        return {"task_id": task.id}
+
+    # 같은 요청(더블클릭 / 재시도)은 한 번만 제출하고 기존 task_id 를 돌려줌 (유료 API 중복 호출 방지)
+    return await idempotency.submit_once("gpt_image", identity, request.model_dump(), idempotency_key, submit)
+
+def _present_event(event: dict) -> dict:
+    """워커 이벤트 / 현재 상태를 /result 응답과 같은 형식으로 바꿉니다."""
+    if event["status"] == "SUCCESS":
+        return event.get("result") or {"status": "SUCCESS"}
+    if event["status"] == "FAILURE":
+        return {"status": "FAILURE", "detail": f"Task failed: {event.get('error')}"}
+    response = {"status": event["status"]}
+    if event.get("stage"):
+        response["stage"] = event["stage"]
+    return response
+
+def _current_event(task_id: str) -> dict:
+    result = AsyncResult(task_id, app=celery_app)
+    state = result.state
+    if state == "SUCCESS":
+        return {"status": state, "result": result.result}
+    if state == "FAILURE":
+        return {"status": state, "error": str(result.info)}
+    return {"status": state}
+
+async def _current_event_async(task_id: str) -> dict:
+    return await run_in_threadpool(_current_event, task_id)
 
 @router.get("/result/{task_id}")
 async def get_result(task_id: str):
@@ -82,4 +140,52 @@ async def get_result(task_id: str):
         raise HTTPException(status_code=500, detail=f"Task failed: {result.info}")
         
     else:
-        return {"status": result.state}
\ No newline at end of file
+        return {"status": result.state}
+
+# 여러 결과 한 번에 조회 (갤러리 화면용, Redis MGET 1회)
+@router.post("/results")
+async def get_results(request: TaskResultsRequest):
+    logger.info(f"[REQUEST] POST /api/results - {len(request.task_ids)}건")
+    if len(request.task_ids) > task_results.RESULTS_MAX_TASK_IDS:
+        raise HTTPException(status_code=400, detail=f"task_ids는 최대 {task_results.RESULTS_MAX_TASK_IDS}개까지 조회할 수 있습니다.")
+
+    metas = await run_in_threadpool(task_results.fetch_task_metas, celery_app, request.task_ids)
+    results = {}
+    for task_id, meta in metas.items():
+        if meta["status"] == "SUCCESS":
+            results[task_id] = meta.get("result") or {"status": "SUCCESS"}
+        elif meta["status"] == "FAILURE":
+            results[task_id] = {"status": "FAILURE", "detail": f"Task failed: {meta.get('result')}"}
+        else:
+            results[task_id] = {"status": meta["status"]}
+    return {"results": results}
+
+# 결과 상태 변화를 SSE 로 전달 (PENDING → STARTED → SUCCESS/FAILURE, 폴링 대신 워커 이벤트를 받아 바로 전송)
+@router.get("/result/{task_id}/events")
+async def stream_result(task_id: str):
+    logger.info(f"[REQUEST] GET /api/result/{task_id}/events")
+
+    async def event_stream():
+        events = task_events.hub.events(task_id, lambda: _current_event_async(task_id), RESULT_STREAM_TIMEOUT_S)
+        async for event in events:
+            yield task_events.sse_message(event and {**_present_event(event), "status": event["status"]})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# SSE 를 쓸 수 없는 클라이언트용 long-poll: 종료 상태가 되거나 wait 초가 지나면 그때의 상태를 응답
+@router.get("/result/{task_id}/wait")
+async def wait_result(task_id: str, wait: float = RESULT_LONG_POLL_MAX_S):
+    logger.info(f"[REQUEST] GET /api/result/{task_id}/wait")
+    last_event = {"status": "PENDING"}
+    events = task_events.hub.events(task_id, lambda: _current_event_async(task_id), min(max(wait, 0), RESULT_LONG_POLL_MAX_S))
+    async for event in events:
+        if event is not None:
+            last_event = event
+
+    if last_event["status"] == "FAILURE":
+        raise HTTPException(status_code=500, detail=f"Task failed: {last_event.get('error')}")
+    return _present_event(last_event)
@@ -20,6 +20,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],  # 429 응답의 재시도 시간을 프론트엔드에서 읽을 수 있도록
 )
 #Front Door 및 APIM 헬스체크용 API
 @app.get("/health", include_in_schema=False)
@@ -1,16 +1,17 @@
 from dotenv import load_dotenv
 from celery import Celery
 from celery.signals import after_setup_logger
-from io import BytesIO
-from PIL import Image
 import requests
 import os
-import subprocess
 from openai import AzureOpenAI
 import logging
 import base64
 
 from shared import blob_storage
+from shared import psd_writer
+from shared import image_bytes
+from shared import artifact_publisher
+from shared import task_events
 
 # --- 환경변수 로딩 ---
 load_dotenv()
@@ -26,6 +27,7 @@ AZURE_ACCOUNT_KEY = os.getenv("AZURE_ACCOUNT_KEY")
 AZURE_CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME")
 
 celery_app = Celery('worker', broker='redis://redis:6379/0', backend='redis://redis:6379/0')
+task_events.install_publisher(celery_app)  # 태스크 상태를 Redis pub/sub 으로 발행 (API 의 SSE / long-poll 용)
 
 # --- 로거 설정 ---
 @after_setup_logger.connect
@@ -65,32 +67,23 @@ def generate_image(self, text_prompt: str, image_url: str | None = None) -> dict
         b64_image = response.data[0].b64_json
         logging.info(f"[STEP 2] 이미지 생성 완료 : {b64_image[:30]}...")
 
-        # --- 이하 로직은 동일 ---
-        image_data = base64.b64decode(b64_image)
-        pil_image = Image.open(BytesIO(image_data))
+        # 이미 PNG 이므로 디코딩/재인코딩 없이 원본 바이트를 그대로 업로드 (헤더만 확인)
+        generated_image = image_bytes.LazyImage(base64.b64decode(b64_image))
+        logging.info(f"[STEP 3] PNG 헤더 확인: {generated_image.size}")
 
         filename_png = f"public/generated/png/{task_id}.png"
         filename_psd = f"public/generated/psd/{task_id}.psd"
 
-        png_buffer = BytesIO()
-        pil_image.save(png_buffer, format="PNG")
-        png_buffer.seek(0)
-        blob_storage.upload_blob(blob_name=filename_png, data=png_buffer, overwrite=True)
-        logging.info(f"[STEP 5] PNG Blob 저장 완료: {filename_png}")
-        png_buffer.close()
-
-        temp_png_path = f"/tmp/{task_id}.png"
-        temp_psd_path = f"/tmp/{task_id}.psd"
-        pil_image.save(temp_png_path, format="PNG")
-        
-        subprocess.run(["convert", temp_png_path, temp_psd_path], check=True)
-        
-        with open(temp_psd_path, "rb") as f:
-            blob_storage.upload_blob(blob_name=filename_psd, data=f, overwrite=True)
-        logging.info(f"[STEP 6] PSD Blob 저장 완료: {filename_psd}")
-
-        os.remove(temp_png_path)
-        os.remove(temp_psd_path)
+        # PNG 업로드와 PSD 변환+업로드를 동시에 실행 (PSD 는 메모리에서 RLE 인코딩, 큰 PSD 는 블록 병렬 업로드)
+        publish_timings = {}
+        artifact_publisher.publish(
+            [
+                artifact_publisher.Artifact(filename_png, generated_image.data, content_type="image/png"),
+                artifact_publisher.Artifact(filename_psd, lambda: psd_writer.encode_psd(generated_image.image)),  # 픽셀은 PSD 만들 때만 디코딩
+            ],
+            timings=publish_timings,
+        )
+        logging.info(f"[STEP 5] PNG/PSD Blob 저장 완료: {filename_png}, {filename_psd} {publish_timings}")
 
         png_url = blob_storage.generate_sas_url(filename_png)
         psd_url = blob_storage.generate_sas_url(filename_psd)
@@ -17,6 +17,7 @@ from psd_tools.api.psd_image import PSDImage
 # shared.blob_storage 모듈을 임포트합니다.
 # 이 모듈은 Dockerfile에 의해 /app/shared/ 경로에 복사되어 있어야 합니다.
 from shared import blob_storage
+from shared import task_events
 
 # --- 환경변수 로딩 ---
 load_dotenv()
@@ -27,6 +28,7 @@ CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/0")
 
 celery_app = Celery('layerworker', broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+task_events.install_publisher(celery_app)  # 태스크 상태를 Redis pub/sub 으로 발행 (API 의 SSE / long-poll 용)
 
 # --- 로거 설정 ---
 @after_setup_logger.connect
@@ -1,14 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from celery import Celery, chain
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import logging
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from shared.dependencies import get_user_id_from_gateway # 공유폴더
 from shared.db import database
 from shared.db import crud as shared_crud
+from shared import image_pipeline
+from shared import task_events
+from shared import task_results
+from shared import user_cache
+from shared import admission
+from shared import fair_queue
+from shared import idempotency
 #from auth.db import models
 
 router = APIRouter(
@@ -20,6 +29,13 @@ CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
 celery_app = Celery("modelapi", broker=CELERY_BROKER_URL)
 celery_app.conf.result_backend = CELERY_BROKER_URL
 
+# generate_image 실행 방식: pipeline(단계 체인, 기본) | monolith(단일 태스크)
+GENERATE_IMAGE_MODE = os.getenv("GENERATE_IMAGE_MODE", "pipeline")
+
+# 결과 push 설정: SSE 최대 연결 시간 / long-poll 최대 대기 시간(초)
+RESULT_STREAM_TIMEOUT_S = float(os.getenv("RESULT_STREAM_TIMEOUT_S", "600"))
+RESULT_LONG_POLL_MAX_S = float(os.getenv("RESULT_LONG_POLL_MAX_S", "25"))
+
 # 요청 스키마
 class PromptRequest(BaseModel):
     category: str
@@ -28,6 +44,9 @@ class PromptRequest(BaseModel):
     caption_input: str | None = None
     image_url: str | None = None
 
+class TaskResultsRequest(BaseModel):
+    task_ids: list[str]
+
 class FinalPromptRequest(BaseModel):
     dalle_prompt: str  
 
@@ -42,9 +61,10 @@ class ObjectSeparationInpaintingRequest(BaseModel):
 async def generate_prompt_endpoint(
     request: PromptRequest,
     user_id: str = Depends(get_user_id_from_gateway),
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key")
 ):
-    user = shared_crud.get_id(db, user_id=user_id)
+    user = await user_cache.get_user_async(user_id, lambda: shared_crud.get_id_async(db, user_id=user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -57,23 +77,47 @@ async def generate_prompt_endpoint(
     logging.info(f"[DATA] caption_input: {request.caption_input}")
     logging.info(f"[DATA] image_url: {request.image_url}")
 
-    task = celery_app.send_task(    #redis에 적재
-        "generate_image",
-        args=[
+    # 같은 요청(더블클릭 / 재시도)은 한 번만 제출하고 기존 task_id 를 돌려줌
+    # admission 토큰은 새 작업을 실제로 제출할 때만 차감 (중복 요청이 429 를 받지 않도록)
+    async def submit(task_id: str) -> dict:
+        await admission.enforce("generate_image", user_id)
+        if GENERATE_IMAGE_MODE == "monolith":
+            task = celery_app.send_task(    #redis에 적재
+                "generate_image",
+                args=[
+                    user.id,
+                    user.username,
+                    request.category,
+                    request.layer,
+                    request.tag,    #키워드
+                    request.caption_input,  #장면 설명
+                    request.image_url
+                ],
+                task_id=task_id
+            )
+            logging.info(f"[TASK] Celery task 전송 완료 - task_id: {task.id}")
+            return {"task_id": task.id}
+
+        # 단계 체인: embed → retrieve → prompt → render → publish (단계별 큐로 라우팅)
+        ctx = image_pipeline.new_context(
             user.id,
             user.username,
             request.category,
             request.layer,
             request.tag,    #키워드
             request.caption_input,  #장면 설명
-            request.image_url
-        ]
-    )
-    logging.info(f"[TASK] Celery task 전송 완료 - task_id: {task.id}")
-    return {"task_id": task.id}
+            request.image_url,
+            tracking_id=task_id
+        )
+        image_pipeline.build_chain(celery_app, ctx).apply_async()
+        # 마지막 단계의 task id == tracking_id 이므로 /result/{task_id} 로 체인 전체 결과를 조회
+        logging.info(f"[TASK] Celery 파이프라인 전송 완료 - task_id: {ctx['tracking_id']}")
+        return {"task_id": ctx["tracking_id"]}
+
+    return await idempotency.submit_once("generate_image", user_id, request.model_dump(), idempotency_key, submit)
 
 # New API endpoint for object separation and inpainting
-@router.post("/object-separation-inpainting")
+@router.post("/object-separation-inpainting", dependencies=[Depends(admission.limit("object_separation"))])
 async def object_separation_inpainting_endpoint(
     request: ObjectSeparationInpaintingRequest,
     user_id: str = Depends(get_user_id_from_gateway)
@@ -84,20 +128,20 @@ async def object_separation_inpainting_endpoint(
     logging.info(f"[DATA] inpainting_prompt: {request.inpainting_prompt}")
     logging.info(f"[DATA] inpainting_negative_prompt: {request.inpainting_negative_prompt}")
 
-    # Celery chain: sam2.segment -> inpainting.inpaint
+    # Celery chain: sam2.segment -> inpainting.inpaint (각 GPU 워커의 전용 큐로 전송)
     task_chain = (
-        celery_app.signature('sam2.segment', args=[request.image_path]) |
+        celery_app.signature('sam2.segment', args=[request.image_path], queue=fair_queue.LANES["gpu"]) |
         celery_app.signature('inpainting.inpaint', kwargs={
             'prompt': request.inpainting_prompt,
             'negative_prompt': request.inpainting_negative_prompt
-        })
+        }, queue='inpainting_queue')
     )
     
-    # Apply the chain asynchronously
-    result = task_chain.apply_async()
+    # 사용자별 공정 큐에 넣으면 dispatcher 가 사용자 간 라운드로빈으로 GPU 큐에 내보냄
+    task_id, pending_for_user = await fair_queue.submit("gpu", user_id, task_chain)
 
-    logging.info(f"[TASK] Celery chain 전송 완료 - task_id: {result.id}")
-    return {"task_id": result.id}
+    logging.info(f"[TASK] Celery chain 대기열 등록 완료 - task_id: {task_id}, 내 대기 작업 수: {pending_for_user}")
+    return {"task_id": task_id, "pending_for_user": pending_for_user}
 
 '''
 # 최종 이미지 생성 요청
@@ -116,6 +160,41 @@ async def generate_image_from_prompt(
     logging.info(f"[TASK] celery 'generate_final_image' task 전송 완료 - task_id: {task.id}")
     return {"task_id": task.id}
 '''
+# 결과 응답 형식 (prompt 또는 image 결과 모두 포함)
+def _format_success(result_data) -> dict:
+    result_data = result_data or {}
+    response = {"status": "SUCCESS"}
+
+    if "prompt" in result_data:
+        response["prompt"] = result_data["prompt"]
+    if "png_url" in result_data:
+        response["png_url"] = result_data["png_url"]
+    if "psd_url" in result_data:
+        response["psd_url"] = result_data["psd_url"]
+
+    return response
+
+def _present_event(event: dict) -> dict:
+    """워커 이벤트 / 현재 상태를 /result 응답과 같은 형식으로 바꿉니다."""
+    if event["status"] == "SUCCESS":
+        return _format_success(event.get("result"))
+    if event["status"] == "FAILURE":
+        return {"status": "FAILURE", "detail": "Task failed"}
+    response = {"status": event["status"]}
+    if event.get("stage"):
+        response["stage"] = event["stage"]
+    return response
+
+def _current_event(task_id: str) -> dict:
+    result = celery_app.AsyncResult(task_id)
+    state = result.state
+    if state == "SUCCESS":
+        return {"status": state, "result": result.result}
+    return {"status": state}
+
+async def _current_event_async(task_id: str) -> dict:
+    return await run_in_threadpool(_current_event, task_id)
+
 # 결과 조회 (prompt 또는 image 결과 모두 포함)
 @router.get("/result/{task_id}")
 async def get_result(
@@ -131,18 +210,7 @@ async def get_result(
 
     elif result.state == "SUCCESS":
         logging.info(f"[SUCCESS] 결과 수신 완료: {result.result}")
-        result_data = result.result or {}
-
-        response = {"status": "SUCCESS"}
-
-        if "prompt" in result_data:
-            response["prompt"] = result_data["prompt"]
-        if "png_url" in result_data:
-            response["png_url"] = result_data["png_url"]
-        if "psd_url" in result_data:
-            response["psd_url"] = result_data["psd_url"]
-
-        return response
+        return _format_success(result.result)
 
     elif result.state == "FAILURE":
         logging.info(f"[ERROR] Celery 태스크 실패: {result.result}")
@@ -151,3 +219,59 @@ async def get_result(
     else:
         logging.info(f"[INFO] 기타 상태: {result.state}")
         return {"status": result.state}
+
+# 여러 결과 한 번에 조회 (갤러리 화면용, Redis MGET 1회)
+@router.post("/results")
+async def get_results(
+    request: TaskResultsRequest,
+    user_id: str = Depends(get_user_id_from_gateway)
+):
+    logging.info(f"[REQUEST] POST /api/results - {len(request.task_ids)}건")
+    if len(request.task_ids) > task_results.RESULTS_MAX_TASK_IDS:
+        raise HTTPException(status_code=400, detail=f"task_ids는 최대 {task_results.RESULTS_MAX_TASK_IDS}개까지 조회할 수 있습니다.")
+
+    metas = await run_in_threadpool(task_results.fetch_task_metas, celery_app, request.task_ids)
+    results = {}
+    for task_id, meta in metas.items():
+        if meta["status"] == "SUCCESS":
+            results[task_id] = _format_success(meta.get("result"))
+        else:
+            results[task_id] = {"status": meta["status"]}
+    return {"results": results}
+
+# 결과 상태 변화를 SSE 로 전달 (PENDING → STARTED → SUCCESS/FAILURE, 폴링 대신 워커 이벤트를 받아 바로 전송)
+@router.get("/result/{task_id}/events")
+async def stream_result(
+    task_id: str,
+    user_id: str = Depends(get_user_id_from_gateway)
+):
+    logging.info(f"[REQUEST] GET /api/result/{task_id}/events")
+
+    async def event_stream():
+        events = task_events.hub.events(task_id, lambda: _current_event_async(task_id), RESULT_STREAM_TIMEOUT_S)
+        async for event in events:
+            yield task_events.sse_message(event and _present_event(event))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# SSE 를 쓸 수 없는 클라이언트용 long-poll: 종료 상태가 되거나 wait 초가 지나면 그때의 상태를 응답
+@router.get("/result/{task_id}/wait")
+async def wait_result(
+    task_id: str,
+    wait: float = RESULT_LONG_POLL_MAX_S,
+    user_id: str = Depends(get_user_id_from_gateway)
+):
+    logging.info(f"[REQUEST] GET /api/result/{task_id}/wait")
+    last_event = {"status": "PENDING"}
+    events = task_events.hub.events(task_id, lambda: _current_event_async(task_id), min(max(wait, 0), RESULT_LONG_POLL_MAX_S))
+    async for event in events:
+        if event is not None:
+            last_event = event
+
+    if last_event["status"] == "FAILURE":
+        raise HTTPException(status_code=500, detail="Task failed")
+    return _present_event(last_event)
@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 # modelapi의 라우터를 import 합니다.
 from modelapi.api import router as modelapi_router
+from shared.db import database
+from shared import keyvault
 
 app = FastAPI(title="Model API Service")
 
@@ -20,6 +22,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],  # 429 응답의 재시도 시간을 프론트엔드에서 읽을 수 있도록
 )
 #Front Door 및 APIM 헬스체크용 API
 @app.get("/health", include_in_schema=False)
@@ -28,6 +31,15 @@ def health_check():
 
 app.include_router(modelapi_router, prefix="/api/model")
 
+@app.on_event("startup")
+def prefetch_secrets():
+    # 시크릿을 백그라운드에서 미리 받아 둠 (서버 시작은 기다리지 않고, DB / Redis 는 처음 사용할 때 연결)
+    keyvault.prefetch_in_background()
+
+@app.on_event("shutdown")
+async def close_async_db():
+    await database.dispose_async_engine()
+
 @app.get("/")
 def read_root():
     return {"message": "Model API service is running"}
@@ -0,0 +1,93 @@
+# modelworker/embedding_batcher.py
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+# 배치 설정 (환경변수로 조정 가능)
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+EMBED_BATCH_TIMEOUT_S = float(os.getenv("EMBED_BATCH_TIMEOUT_S", "30"))
+
+
+class EmbeddingBatcher:
+    """
+    동시에 들어온 임베딩 요청을 짧은 시간(window) 동안 모아 한 번의 배치 추론으로 처리합니다.
+    embed_fn은 문자열 리스트를 받아 같은 순서의 벡터 리스트를 반환해야 합니다.
+
+    Celery prefork 풀(프로세스당 태스크 1개)에서는 배치가 1개씩만 모이므로,
+    --pool threads 처럼 한 프로세스에서 여러 태스크가 동시에 돌 때 효과가 있습니다.
+    """
+
+    def __init__(self, embed_fn, window_ms: float = EMBED_BATCH_WINDOW_MS, max_batch_size: int = EMBED_MAX_BATCH_SIZE):
+        self.embed_fn = embed_fn
+        self.window_s = max(window_ms, 0.0) / 1000.0
+        self.max_batch_size = max(max_batch_size, 1)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Celery가 fork한 뒤에는 부모의 스레드가 없으므로 프로세스마다 새로 띄웁니다.
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """텍스트 1개를 큐에 넣고 결과 벡터를 받을 Future를 반환합니다."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str, timeout: float = EMBED_BATCH_TIMEOUT_S) -> list:
+        """텍스트 1개를 배치에 태워 임베딩하고 결과를 기다립니다."""
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect(self) -> list:
+        # 첫 요청이 올 때까지 대기한 뒤, window 동안 또는 max_batch_size까지 추가로 모읍니다.
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # 이미 취소된 요청은 제외 (set_running_or_notify_cancel 이후에는 취소되지 않음)
+            batch = [(text, future) for text, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                started = time.perf_counter()
+                vectors = list(self.embed_fn(texts))
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if len(vectors) != len(texts):
+                    raise ValueError(f"embed_fn 결과 개수 불일치 - 입력 {len(texts)}개, 결과 {len(vectors)}개")
+                logging.info(f"[EMBED] 배치 임베딩 완료 - batch_size: {len(texts)}, {elapsed_ms:.1f}ms")
+            except Exception as e:
+                logging.error(f"[EMBED] 배치 임베딩 실패 - batch_size: {len(texts)}: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
@@ -0,0 +1,124 @@
+# modelworker/embedding_cache.py
+
+import os
+import re
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+import redis
+
+# 캐시 설정 (환경변수로 조정 가능)
+EMBED_CACHE_LOCAL_SIZE = int(os.getenv("EMBED_CACHE_LOCAL_SIZE", "1024"))
+EMBED_CACHE_REDIS_URL = os.getenv("EMBED_CACHE_REDIS_URL", "redis://redis:6379/1")
+EMBED_CACHE_TTL_SECONDS = int(os.getenv("EMBED_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+EMBED_CACHE_KEY_PREFIX = "koclip:emb:"
+EMBED_CACHE_STATS_LOG_EVERY = 100
+
+
+def normalize_text(text: str) -> str:
+    # 한글 자모 조합형/완성형 차이와 공백 차이를 없애 같은 문장이 같은 키를 갖도록 함
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class EmbeddingCache:
+    """
+    텍스트 임베딩 2단 캐시.
+    1단: 프로세스 내 LRU (정규화된 텍스트 + 모델 id 기준)
+    2단: Redis (float16으로 압축한 벡터, TTL 적용) - 워커/프로세스 간 공유
+    Redis 장애 시에는 1단 캐시와 실제 임베딩으로만 동작합니다.
+    """
+
+    def __init__(self, model_id: str, local_size: int = EMBED_CACHE_LOCAL_SIZE,
+                 redis_url: str | None = EMBED_CACHE_REDIS_URL, ttl_seconds: int = EMBED_CACHE_TTL_SECONDS):
+        self.model_id = model_id
+        self.local_size = local_size
+        self.ttl_seconds = ttl_seconds
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.2, socket_connect_timeout=0.5)
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "redis_errors": 0}
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha1(f"{self.model_id}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+        return digest
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+            total = self.stats["local_hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        if name != "redis_errors" and total % EMBED_CACHE_STATS_LOG_EVERY == 0:
+            logging.info(f"[EMBED CACHE] {self.snapshot()}")
+
+    def snapshot(self) -> dict:
+        """hit/miss 카운터와 hit rate를 반환합니다."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["local_size"] = len(self._local)
+        total = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["local_hits"] + stats["redis_hits"]) / total, 4) if total else 0.0
+        return stats
+
+    def _local_get(self, key: str):
+        with self._lock:
+            vector = self._local.get(key)
+            if vector is not None:
+                self._local.move_to_end(key)
+            return vector
+
+    def _local_put(self, key: str, vector: list):
+        with self._lock:
+            self._local[key] = vector
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def _redis_get(self, key: str):
+        if self._redis is None:
+            return None
+        try:
+            packed = self._redis.get(EMBED_CACHE_KEY_PREFIX + key)
+        except redis.RedisError as e:
+            logging.info(f"[EMBED CACHE] Redis 조회 실패: {e}")
+            self._count("redis_errors")
+            return None
+        if packed is None:
+            return None
+        return np.frombuffer(packed, dtype=np.float16).astype(np.float32).tolist()
+
+    def _redis_put(self, key: str, vector: list):
+        if self._redis is None:
+            return
+        try:
+            packed = np.asarray(vector, dtype=np.float16).tobytes()
+            self._redis.set(EMBED_CACHE_KEY_PREFIX + key, packed, ex=self.ttl_seconds)
+        except redis.RedisError as e:
+            logging.info(f"[EMBED CACHE] Redis 저장 실패: {e}")
+            self._count("redis_errors")
+
+    def get_or_compute(self, text: str, compute_fn) -> list:
+        """캐시에 있으면 반환하고, 없으면 compute_fn(text)로 계산해 두 캐시에 저장합니다."""
+        key = self._key(text)
+
+        vector = self._local_get(key)
+        if vector is not None:
+            self._count("local_hits")
+            return vector
+
+        vector = self._redis_get(key)
+        if vector is not None:
+            self._count("redis_hits")
+            self._local_put(key, vector)
+            return vector
+
+        self._count("misses")
+        vector = compute_fn(text)
+        self._local_put(key, vector)
+        self._redis_put(key, vector)
+        return vector
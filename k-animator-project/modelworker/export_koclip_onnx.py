@@ -0,0 +1,104 @@
+# modelworker/export_koclip_onnx.py
+# KoCLIP 텍스트 타워만 ONNX 로 내보내고 int8 동적 양자화를 적용한 뒤,
+# PyTorch 벡터와의 코사인 유사도로 결과를 검증합니다. 기준 미달이면 종료 코드 1 로 끝납니다.
+#
+# 준비: pip install -r modelworker/requirements-tools.txt (onnx 는 런타임 이미지에 포함하지 않음)
+# 실행: PYTHONPATH=. python -m modelworker.export_koclip_onnx [--out modelworker/onnx/koclip_text_int8.onnx]
+# 이미지에 포함: docker build --build-arg KOCLIP_EXPORT_ONNX=1 -f modelworker/Dockerfile .
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+from modelworker import koclip
+
+# 검증용 문장 (실제 요청과 비슷한 태그/캡션 조합)
+PARITY_TEXTS = [
+    "한옥",
+    "기와집 지붕 위로 해가 지는 풍경",
+    "경복궁 앞에서 한복을 입은 소녀가 부채를 들고 웃고 있다",
+    "장독대가 있는 초가집 마당, 웹툰 스타일",
+    "돌담길을 따라 걷는 두 사람의 뒷모습",
+    "정자 아래에서 책을 읽는 선비",
+    "서당에서 공부하는 아이들, 연필 스케치",
+    "비 오는 밤 골목길의 포장마차",
+]
+
+
+class TextTower(torch.nn.Module):
+    """get_text_features 경로(텍스트 인코더 + projection)만 감싼 모듈. 이미지 타워는 그래프에 포함되지 않음"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+
+def export(model_id: str, fp32_path: str, opset: int):
+    model = AutoModel.from_pretrained(model_id).eval()
+    tokenizer_inputs = AutoTokenizer.from_pretrained(model_id)(PARITY_TEXTS[:2], return_tensors="pt", padding=True, truncation=True)
+    torch.onnx.export(
+        TextTower(model),
+        (tokenizer_inputs["input_ids"], tokenizer_inputs["attention_mask"]),
+        fp32_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["text_embeds"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "text_embeds": {0: "batch"},
+        },
+        opset_version=opset,
+        do_constant_folding=True,
+    )
+
+
+def quantize(fp32_path: str, int8_path: str):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+
+def cosine_parity(model_id: str, onnx_path: str) -> np.ndarray:
+    reference = np.asarray(koclip.load_torch_text_encoder(model_id)(PARITY_TEXTS), dtype=np.float32)
+    candidate = np.asarray(koclip.load_onnx_text_encoder(onnx_path, model_id)(PARITY_TEXTS), dtype=np.float32)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate /= np.linalg.norm(candidate, axis=1, keepdims=True)
+    return (reference * candidate).sum(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=koclip.KOCLIP_MODEL_ID)
+    parser.add_argument("--out", default=koclip.KOCLIP_ONNX_PATH)
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--no-quantize", action="store_true", help="fp32 ONNX 만 내보냄")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="문장별 최소 코사인 유사도")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    fp32_path = args.out if args.no_quantize else f"{os.path.splitext(args.out)[0]}.fp32.onnx"
+
+    print(f"[EXPORT] 텍스트 타워 ONNX 내보내기: {fp32_path}")
+    export(args.model, fp32_path, args.opset)
+    if not args.no_quantize:
+        print(f"[EXPORT] int8 동적 양자화: {args.out}")
+        quantize(fp32_path, args.out)
+
+    for path in ([fp32_path] if args.no_quantize else [fp32_path, args.out]):
+        cosines = cosine_parity(args.model, path)
+        print(f"[PARITY] {os.path.basename(path)} ({os.path.getsize(path) / 1024 / 1024:.1f} MB): "
+              f"min={cosines.min():.5f} mean={cosines.mean():.5f}")
+    if cosines.min() < args.min_cosine:
+        print(f"[PARITY] 실패: 최소 코사인 {cosines.min():.5f} < {args.min_cosine}")
+        sys.exit(1)
+    print("[PARITY] 통과")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# modelworker/koclip.py
+
+import os
+import hashlib
+import logging
+
+import numpy as np
+
+# KoCLIP 텍스트 임베딩 설정 (환경변수로 조정 가능)
+KOCLIP_MODEL_ID = "koclip/koclip-base-pt"
+KOCLIP_BACKEND = os.getenv("KOCLIP_BACKEND", "torch")  # torch | onnx
+# ONNX 모델 파일: 이미지 빌드 시 --build-arg KOCLIP_EXPORT_ONNX=1 로 만들어 넣거나(modelworker/Dockerfile),
+# 미리 내보낸 파일을 볼륨으로 마운트하고 KOCLIP_ONNX_PATH 로 지정
+KOCLIP_ONNX_PATH = os.getenv("KOCLIP_ONNX_PATH", os.path.join(os.path.dirname(__file__), "onnx", "koclip_text_int8.onnx"))
+KOCLIP_ONNX_THREADS = int(os.getenv("KOCLIP_ONNX_THREADS", "0"))  # 0 이면 onnxruntime 기본값
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _require_onnx_file(onnx_path: str):
+    if not os.path.isfile(onnx_path):
+        raise FileNotFoundError(
+            f"KOCLIP_BACKEND=onnx 인데 ONNX 모델 파일이 없습니다: {onnx_path}. "
+            "이미지를 --build-arg KOCLIP_EXPORT_ONNX=1 로 빌드하거나, "
+            "export_koclip_onnx.py 로 만든 파일을 마운트하고 KOCLIP_ONNX_PATH 로 지정하세요."
+        )
+
+
+def cache_namespace() -> str:
+    """
+    임베딩 캐시 키 구분용 (백엔드마다 벡터가 조금씩 다르므로 섞이지 않게 함)
+    ONNX 는 파일 내용의 해시를 넣어, 같은 파일 이름으로 다시 내보낸 모델이 이전 캐시 벡터를 쓰지 않게 합니다.
+    """
+    if KOCLIP_BACKEND == "onnx":
+        _require_onnx_file(KOCLIP_ONNX_PATH)
+        return f"{KOCLIP_MODEL_ID}:onnx:{_file_digest(KOCLIP_ONNX_PATH)}"
+    return KOCLIP_MODEL_ID
+
+
+def load_torch_text_encoder(model_id: str = KOCLIP_MODEL_ID):
+    """PyTorch 전체 모델(fp32)로 텍스트 임베딩 함수를 만듭니다. (기존 방식)"""
+    import torch
+    from transformers import AutoProcessor, AutoModel
+
+    processor = AutoProcessor.from_pretrained(model_id)
+    model = AutoModel.from_pretrained(model_id).eval().to("cuda" if torch.cuda.is_available() else "cpu")
+    device = next(model.parameters()).device
+
+    def embed_texts(texts):
+        # 길이가 다른 문장들은 padding으로 맞춰 한 번의 forward로 처리
+        inputs = processor(text=list(texts), return_tensors="pt", truncation=True, padding=True).to(device)
+        with torch.no_grad():
+            embeddings = model.get_text_features(**inputs)
+        return embeddings.cpu().numpy().tolist()
+
+    return embed_texts
+
+
+def load_onnx_text_encoder(onnx_path: str = KOCLIP_ONNX_PATH, model_id: str = KOCLIP_MODEL_ID):
+    """
+    내보낸 텍스트 인코더(ONNX, int8 동적 양자화)만 onnxruntime 으로 실행하는 임베딩 함수를 만듭니다.
+    이미지 타워와 torch 를 메모리에 올리지 않습니다. (modelworker/export_koclip_onnx.py 로 생성)
+    """
+    _require_onnx_file(onnx_path)
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if KOCLIP_ONNX_THREADS > 0:
+        options.intra_op_num_threads = KOCLIP_ONNX_THREADS
+    session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+    def embed_texts(texts):
+        # PyTorch 경로(processor)와 같은 토크나이저/절단 규칙을 사용
+        inputs = tokenizer(list(texts), return_tensors="np", truncation=True, padding=True)
+        feeds = {
+            "input_ids": inputs["input_ids"].astype(np.int64),
+            "attention_mask": inputs["attention_mask"].astype(np.int64),
+        }
+        (embeddings,) = session.run(["text_embeds"], feeds)
+        return embeddings.tolist()
+
+    return embed_texts
+
+
+def load_text_encoder():
+    """KOCLIP_BACKEND 에 맞는 텍스트 임베딩 함수(texts -> list[list[float]])를 반환합니다."""
+    if KOCLIP_BACKEND == "onnx":
+        logging.info(f"[KOCLIP] ONNX 텍스트 인코더 로딩: {KOCLIP_ONNX_PATH}")
+        return load_onnx_text_encoder()
+    logging.info(f"[KOCLIP] PyTorch 모델 로딩: {KOCLIP_MODEL_ID}")
+    return load_torch_text_encoder()
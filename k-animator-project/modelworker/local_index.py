@@ -0,0 +1,310 @@
+# modelworker/local_index.py
+
+import os
+import json
+import time
+import fcntl
+import shutil
+import logging
+import threading
+
+import numpy as np
+import psycopg
+from pgvector.psycopg import register_vector
+from celery.signals import worker_process_init, worker_ready
+
+from modelworker import reference_db
+
+# 로컬 인덱스 설정 (REFERENCE_LOCAL_INDEX=1 일 때만 사용)
+REFERENCE_LOCAL_INDEX = os.getenv("REFERENCE_LOCAL_INDEX", "0") == "1"
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "/tmp/k-animator-index")
+LOCAL_INDEX_SNAPSHOT_INTERVAL = int(os.getenv("LOCAL_INDEX_SNAPSHOT_INTERVAL", "3600"))
+LOCAL_INDEX_CHANGE_CHANNEL = os.getenv("LOCAL_INDEX_CHANGE_CHANNEL", "korea_image_data_changes")
+LOCAL_INDEX_POLL_SECONDS = 5
+
+SNAPSHOT_SQL = "SELECT file_name, tag, vec_caption FROM korea_image_data"
+ROW_SQL = "SELECT file_name, tag, vec_caption FROM korea_image_data WHERE file_name = %s"
+
+
+def _connect():
+    conn = psycopg.connect(
+        host=reference_db.PG_HOST, port=reference_db.PG_PORT, dbname=reference_db.PG_DBNAME,
+        user=reference_db.PG_USER, password=reference_db.PG_PASSWORD, autocommit=True,
+    )
+    register_vector(conn)
+    return conn
+
+
+class IndexSnapshot:
+    """
+    korea_image_data 스냅샷 1개.
+    벡터는 float16 memmap 행렬로 두고(프로세스 간 페이지 캐시 공유), 태그는 토큰 → 행 번호 역색인으로 둡니다.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.path = path
+        self.file_names = meta["file_names"]
+        self.tags = meta["tags"]
+        self.dim = meta["dim"]
+        self.built_at = meta["built_at"]
+        count = len(self.file_names)
+        if count:
+            self.vectors = np.memmap(os.path.join(path, "vectors.f16"), dtype=np.float16, mode="r", shape=(count, self.dim))
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float16)
+
+        # ||x||² 미리 계산 → 거리 = ||x||² - 2x·q + ||q||²
+        self.sq_norms = np.empty(count, dtype=np.float32)
+        for start in range(0, count, 4096):
+            block = self.vectors[start:start + 4096].astype(np.float32)
+            self.sq_norms[start:start + 4096] = np.einsum("ij,ij->i", block, block)
+
+        postings = {}
+        for row, tag in enumerate(self.tags):
+            for token in set((tag or "").lower().split()):
+                postings.setdefault(token, []).append(row)
+        self.postings = {token: np.asarray(rows, dtype=np.int64) for token, rows in postings.items()}
+
+        # 부분 문자열 검색용 n-gram(1~3글자) → 토큰 역색인. 전체 토큰을 훑지 않고 후보 토큰만 확인
+        self.grams = {}
+        for token in self.postings:
+            for gram in self._grams(token):
+                self.grams.setdefault(gram, set()).add(token)
+
+    @staticmethod
+    def _grams(text: str) -> set:
+        return {text[i:i + n] for n in range(1, 4) for i in range(len(text) - n + 1)}
+
+    def matching_tokens(self, word: str) -> set:
+        """word 를 부분 문자열로 포함하는 토큰 (ILIKE '%word%')"""
+        n = min(len(word), 3)
+        candidate_sets = sorted(
+            (self.grams.get(word[i:i + n], set()) for i in range(len(word) - n + 1)), key=len
+        )
+        if not candidate_sets or not candidate_sets[0]:
+            return set()
+        candidates = candidate_sets[0].intersection(*candidate_sets[1:])
+        return {token for token in candidates if word in token}
+
+    def candidate_rows(self, tag_words: list) -> np.ndarray:
+        # ILIKE '%word%' 와 같도록 단어를 포함하는 모든 토큰의 행을 합침 (공백 없는 단어는 토큰 하나 안에만 있을 수 있음)
+        matched = []
+        for word in tag_words:
+            word = word.strip().lower()
+            if not word:
+                continue
+            matched.extend(self.postings[token] for token in self.matching_tokens(word))
+        if not matched:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(matched))
+
+
+class LocalReferenceIndex:
+    """
+    reference_db.find_similar_file_names 의 로컬 버전.
+    주기적인 전체 스냅샷 + LISTEN/NOTIFY 변경 피드(델타)로 갱신되며, 검색은 NumPy 만 사용합니다.
+    """
+
+    def __init__(self, base_dir: str = LOCAL_INDEX_DIR):
+        self.base_dir = base_dir
+        self.snapshot = None
+        self._lock = threading.Lock()
+        # 마지막 스냅샷 이후 변경분: file_name -> (tag, vector, 수신 시각) / 삭제된 file_name -> 수신 시각
+        self._delta = {}
+        self._deleted = {}
+        self._started_pid = None
+
+    # ---------- 검색 ----------
+
+    def ready(self) -> bool:
+        return self.snapshot is not None
+
+    def search(self, tag_words: list, embedding_vector, limit: int = 1) -> list:
+        query = np.asarray(embedding_vector, dtype=np.float32)
+        with self._lock:
+            snapshot, delta, deleted = self.snapshot, dict(self._delta), set(self._deleted)
+
+        names, distances = [], []
+        rows = snapshot.candidate_rows(tag_words)
+        if len(rows):
+            block = snapshot.vectors[rows].astype(np.float32)
+            dist = snapshot.sq_norms[rows] - 2.0 * (block @ query) + float(query @ query)
+            for row, d in zip(rows, dist):
+                name = snapshot.file_names[row]
+                if name not in deleted and name not in delta:
+                    names.append(name)
+                    distances.append(d)
+
+        for name, (tag, vector, _) in delta.items():
+            if reference_db.tag_matches(tag, tag_words):
+                diff = vector - query
+                names.append(name)
+                distances.append(float(diff @ diff))
+
+        if not names:
+            return []
+        distances = np.asarray(distances, dtype=np.float32)
+        k = min(limit, len(names))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [names[i] for i in top]
+
+    # ---------- 스냅샷 ----------
+
+    def _current_path(self) -> str | None:
+        pointer = os.path.join(self.base_dir, "CURRENT")
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer, encoding="utf-8") as f:
+            return os.path.join(self.base_dir, f.read().strip())
+
+    def _snapshot_age(self) -> float | None:
+        # CURRENT 파일은 스냅샷 교체 시점에만 다시 쓰이므로 mtime 을 스냅샷 나이로 사용
+        pointer = os.path.join(self.base_dir, "CURRENT")
+        if not os.path.exists(pointer):
+            return None
+        return time.time() - os.path.getmtime(pointer)
+
+    def _snapshot_stale(self) -> bool:
+        age = self._snapshot_age()
+        return age is None or age > LOCAL_INDEX_SNAPSHOT_INTERVAL
+
+    def build_snapshot(self) -> str:
+        """DB 전체를 읽어 새 스냅샷 디렉터리를 만들고 CURRENT 를 원자적으로 교체합니다."""
+        started = time.perf_counter()
+        built_at = time.time()
+        name = f"snapshot-{int(built_at)}"
+        tmp_path = os.path.join(self.base_dir, f".{name}.tmp")
+        os.makedirs(tmp_path, exist_ok=True)
+
+        file_names, tags, dim = [], [], None
+        with _connect() as conn, open(os.path.join(tmp_path, "vectors.f16"), "wb") as out:
+            # 서버 측 커서로 나눠 읽어 메모리 사용을 일정하게 유지
+            with conn.transaction(), conn.cursor(name="local_index_snapshot") as cur:
+                cur.itersize = 2000
+                cur.execute(SNAPSHOT_SQL)
+                for file_name, tag, vector in cur:
+                    vector = np.asarray(vector, dtype=np.float16)
+                    dim = dim or vector.shape[0]
+                    out.write(vector.tobytes())
+                    file_names.append(file_name)
+                    tags.append(tag)
+
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"file_names": file_names, "tags": tags, "dim": dim or 512, "built_at": built_at}, f, ensure_ascii=False)
+
+        final_path = os.path.join(self.base_dir, name)
+        os.replace(tmp_path, final_path)
+        pointer_tmp = os.path.join(self.base_dir, "CURRENT.tmp")
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(pointer_tmp, os.path.join(self.base_dir, "CURRENT"))
+        logging.info(f"[LOCAL INDEX] 스냅샷 생성 완료 - {len(file_names)}건, {time.perf_counter() - started:.1f}s")
+        self._remove_old_snapshots(keep=name)
+        return final_path
+
+    def _remove_old_snapshots(self, keep: str):
+        # 직전 스냅샷 1개는 다른 프로세스가 아직 memmap 중일 수 있으므로 남겨 둠
+        snapshots = sorted(d for d in os.listdir(self.base_dir) if d.startswith("snapshot-") and d != keep)
+        for old in snapshots[:-1]:
+            shutil.rmtree(os.path.join(self.base_dir, old), ignore_errors=True)
+
+    def load_current(self) -> bool:
+        """CURRENT 가 가리키는 스냅샷이 바뀌었으면 다시 로드합니다."""
+        path = self._current_path()
+        if path is None or not os.path.isdir(path):
+            return False
+        if self.snapshot is not None and self.snapshot.path == path:
+            return False
+        snapshot = IndexSnapshot(path)
+        with self._lock:
+            self.snapshot = snapshot
+            # 스냅샷 빌드 시작 이후에 들어온 변경분만 유지 (이전 변경은 스냅샷에 반영됨)
+            self._delta = {k: v for k, v in self._delta.items() if v[2] >= snapshot.built_at}
+            self._deleted = {k: t for k, t in self._deleted.items() if t >= snapshot.built_at}
+        logging.info(f"[LOCAL INDEX] 스냅샷 로드 - {path}, {len(snapshot.file_names)}건")
+        return True
+
+    # ---------- 변경 피드 ----------
+
+    def apply_change(self, op: str, file_name: str, tag: str | None = None, vector=None):
+        received_at = time.time()
+        with self._lock:
+            if op == "delete":
+                self._delta.pop(file_name, None)
+                self._deleted[file_name] = received_at
+            else:
+                self._deleted.pop(file_name, None)
+                self._delta[file_name] = (tag, np.asarray(vector, dtype=np.float32), received_at)
+
+    def _listen_changes(self):
+        # 트리거가 보내는 NOTIFY payload: {"op": "upsert"|"delete", "file_name": "..."}
+        while True:
+            try:
+                with _connect() as conn:
+                    conn.execute(f"LISTEN {LOCAL_INDEX_CHANGE_CHANNEL}")
+                    logging.info(f"[LOCAL INDEX] 변경 피드 구독 - channel: {LOCAL_INDEX_CHANGE_CHANNEL}")
+                    with _connect() as lookup:
+                        for notify in conn.notifies():
+                            change = json.loads(notify.payload)
+                            if change["op"] == "delete":
+                                self.apply_change("delete", change["file_name"])
+                                continue
+                            row = lookup.execute(ROW_SQL, (change["file_name"],)).fetchone()
+                            if row is None:
+                                self.apply_change("delete", change["file_name"])
+                            else:
+                                self.apply_change("upsert", row[0], row[1], row[2])
+            except Exception as e:
+                logging.info(f"[LOCAL INDEX] 변경 피드 오류, 재연결 대기: {e}")
+                time.sleep(LOCAL_INDEX_POLL_SECONDS)
+
+    def _maintain_snapshots(self):
+        # 한 프로세스만 스냅샷을 빌드하고(flock), 나머지는 CURRENT 변경을 감지해 다시 로드
+        os.makedirs(self.base_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.base_dir, "build.lock"), "w")
+        while True:
+            try:
+                if self._snapshot_stale():
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        try:
+                            # 락을 기다리는 동안 다른 프로세스가 이미 빌드했을 수 있음
+                            if self._snapshot_stale():
+                                self.build_snapshot()
+                        finally:
+                            fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    except BlockingIOError:
+                        pass
+                self.load_current()
+            except Exception as e:
+                logging.info(f"[LOCAL INDEX] 스냅샷 갱신 실패: {e}")
+            time.sleep(LOCAL_INDEX_POLL_SECONDS)
+
+    def start(self):
+        """스냅샷 관리 / 변경 피드 스레드를 시작합니다. (프로세스당 1회)"""
+        if self._started_pid == os.getpid():
+            return
+        self._started_pid = os.getpid()
+        threading.Thread(target=self._maintain_snapshots, name="local-index-snapshot", daemon=True).start()
+        threading.Thread(target=self._listen_changes, name="local-index-changes", daemon=True).start()
+
+
+local_index = LocalReferenceIndex()
+
+
+@worker_process_init.connect
+def _start_local_index(**kwargs):
+    # prefork 자식 프로세스(실제로 태스크를 실행하는 프로세스)에서 시작
+    if REFERENCE_LOCAL_INDEX:
+        local_index.start()
+
+
+@worker_ready.connect
+def _start_local_index_in_pool_process(sender=None, **kwargs):
+    # threads / solo 풀은 메인 프로세스가 태스크를 실행하므로 여기서 시작 (prefork 부모는 태스크를 실행하지 않으므로 제외)
+    from celery.concurrency.prefork import TaskPool as PreforkPool
+    if REFERENCE_LOCAL_INDEX and not isinstance(getattr(sender, "pool", None), PreforkPool):
+        local_index.start()
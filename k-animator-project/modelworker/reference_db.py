@@ -0,0 +1,200 @@
+# modelworker/reference_db.py
+
+import os
+import time
+import logging
+import itertools
+import threading
+
+import numpy as np
+from psycopg import sql
+from psycopg_pool import ConnectionPool
+from pgvector.psycopg import register_vector
+from celery.signals import worker_process_init, worker_process_shutdown
+
+# korea_image_data 가 있는 PostgreSQL(pgvector) 접속 정보
+PG_HOST = os.getenv("PG_HOST")
+PG_PORT = os.getenv("PG_PORT")
+PG_DBNAME = os.getenv("PG_DBNAME")
+PG_USER = os.getenv("PG_USER")
+PG_PASSWORD = os.getenv("PG_PASSWORD")
+
+# 커넥션 풀 설정
+PG_POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", "1"))
+PG_POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", "8"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "10"))
+PG_POOL_STATS_LOG_EVERY = 50
+
+# 검색 모드: exact (태그 ILIKE 필터 + 정렬, 인덱스 사용 불가) / hybrid (벡터 인덱스 top-k → 태그 필터 → 재정렬)
+#           auto (기본값, 벡터 인덱스(sql/korea_image_data_vector_index.sql)가 있으면 hybrid, 없으면 exact)
+# 인덱스 없이 hybrid 를 쓰면 후보 조회가 전체 정렬이 되어 exact 보다 느려짐
+REFERENCE_RETRIEVAL_MODE = os.getenv("REFERENCE_RETRIEVAL_MODE", "auto")
+REFERENCE_ANN_CANDIDATES = int(os.getenv("REFERENCE_ANN_CANDIDATES", "200"))
+REFERENCE_HNSW_EF_SEARCH = int(os.getenv("REFERENCE_HNSW_EF_SEARCH", "200"))
+REFERENCE_IVFFLAT_PROBES = int(os.getenv("REFERENCE_IVFFLAT_PROBES", "10"))
+REFERENCE_TABLE = "korea_image_data"
+
+# 태그 필터 + 벡터 거리 정렬 (exact)
+EXACT_SEARCH_SQL = """
+    SELECT file_name FROM {table}
+    WHERE tag ILIKE ANY (%s)
+    ORDER BY vec_caption <-> %s
+    LIMIT %s
+"""
+
+# 필터 없는 벡터 top-k (HNSW/IVF 인덱스 사용 가능)
+ANN_CANDIDATES_SQL = """
+    SELECT file_name, tag, vec_caption FROM {table}
+    ORDER BY vec_caption <-> %s
+    LIMIT %s
+"""
+
+# korea_image_data 에 HNSW / IVFFlat 인덱스가 있는지 (auto 모드, 풀마다 한 번 확인)
+VECTOR_INDEX_SQL = """
+    SELECT EXISTS (
+        SELECT 1 FROM pg_indexes
+        WHERE tablename = %s AND (indexdef ILIKE '%% USING hnsw %%' OR indexdef ILIKE '%% USING ivfflat %%')
+    )
+"""
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_has_vector_index = None
+_query_count = itertools.count(1)  # threads 풀에서도 증가가 유실되지 않도록 (next() 는 GIL 아래 원자적)
+
+
+def _configure_connection(conn):
+    # numpy 배열을 pgvector 바이너리 포맷으로 전송하도록 등록
+    register_vector(conn)
+    # 인덱스 탐색 폭 (해당 인덱스가 없으면 무시됨)
+    conn.execute(f"SET hnsw.ef_search = {REFERENCE_HNSW_EF_SEARCH}")
+    conn.execute(f"SET ivfflat.probes = {REFERENCE_IVFFLAT_PROBES}")
+    conn.commit()
+
+
+def _open_pool() -> ConnectionPool:
+    conninfo = f"host={PG_HOST} port={PG_PORT} dbname={PG_DBNAME} user={PG_USER} password={PG_PASSWORD}"
+    pool = ConnectionPool(
+        conninfo,
+        min_size=PG_POOL_MIN_SIZE,
+        max_size=PG_POOL_MAX_SIZE,
+        timeout=PG_POOL_TIMEOUT,
+        configure=_configure_connection,
+        name="korea_image_data",
+        open=True,
+    )
+    logging.info(f"[DB POOL] 커넥션 풀 생성 - pid: {os.getpid()}, min: {PG_POOL_MIN_SIZE}, max: {PG_POOL_MAX_SIZE}")
+    return pool
+
+
+def get_pool() -> ConnectionPool:
+    """현재 프로세스의 커넥션 풀을 반환합니다. fork 이후 부모의 풀은 재사용하지 않습니다."""
+    global _pool, _pool_pid, _has_vector_index
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = _open_pool()
+            _pool_pid = os.getpid()
+            _has_vector_index = None
+        return _pool
+
+
+@worker_process_init.connect
+def _init_pool(**kwargs):
+    # prefork 자식 프로세스가 뜰 때 미리 연결을 만들어 둠 (threads 풀에서는 첫 사용 시 생성)
+    get_pool()
+
+
+@worker_process_shutdown.connect
+def _close_pool(**kwargs):
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
+
+
+def pool_stats() -> dict:
+    """풀 크기 / 대기 중 요청 / 누적 대기 시간 등 풀 메트릭을 반환합니다."""
+    if _pool is None or _pool_pid != os.getpid():
+        return {}
+    return _pool.get_stats()
+
+
+def _escape_like(word: str) -> str:
+    # ILIKE 의 기본 escape 문자(\)로 %, _ 를 일반 문자로 취급 (tag_matches 의 부분 문자열 검사와 같은 결과)
+    return word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def tag_patterns(tag_words: list) -> list:
+    """태그 단어를 ILIKE ANY 패턴으로 변환합니다. (단어 안의 %, _ 는 와일드카드가 아닌 문자로 검색)"""
+    return [f"%{_escape_like(word.strip())}%" for word in tag_words if word.strip()]
+
+
+def tag_matches(tag: str | None, tag_words: list) -> bool:
+    """ILIKE '%word%' ANY 와 같은 조건을 파이썬에서 검사합니다."""
+    tag = (tag or "").lower()
+    return any(word.strip().lower() in tag for word in tag_words if word.strip())
+
+
+def _exact_search(conn, table: str, tag_words: list, vector, limit: int) -> list:
+    query = sql.SQL(EXACT_SEARCH_SQL).format(table=sql.Identifier(table))
+    # prepare=True: 같은 연결에서는 서버 측 prepared statement 재사용, binary=True: 벡터를 바이너리로 전송
+    rows = conn.execute(query, (tag_patterns(tag_words), vector, limit), prepare=True, binary=True).fetchall()
+    return [row[0] for row in rows]
+
+
+def _hybrid_search(conn, table: str, tag_words: list, vector, limit: int,
+                   candidates: int = REFERENCE_ANN_CANDIDATES) -> list | None:
+    """
+    벡터 인덱스로 후보 top-k를 가져온 뒤 태그 필터와 정확한 L2 거리 재정렬을 파이썬에서 수행합니다.
+    필터를 통과한 후보가 limit 보다 적으면 None을 반환합니다. (호출 측에서 exact 로 fallback)
+    """
+    query = sql.SQL(ANN_CANDIDATES_SQL).format(table=sql.Identifier(table))
+    rows = conn.execute(query, (vector, max(candidates, limit)), prepare=True, binary=True).fetchall()
+
+    survivors = [(file_name, vec) for file_name, tag, vec in rows if tag_matches(tag, tag_words)]
+    if len(survivors) < limit:
+        return None
+
+    matrix = np.asarray([vec for _, vec in survivors], dtype=np.float32)
+    distances = np.linalg.norm(matrix - vector, axis=1)
+    order = np.argsort(distances, kind="stable")[:limit]
+    return [survivors[i][0] for i in order]
+
+
+def _resolve_mode(conn) -> str:
+    """auto 모드를 hybrid / exact 중 하나로 정합니다. 인덱스 유무는 풀마다 한 번만 조회합니다."""
+    global _has_vector_index
+    if REFERENCE_RETRIEVAL_MODE != "auto":
+        return REFERENCE_RETRIEVAL_MODE
+    if _has_vector_index is None:
+        _has_vector_index = bool(conn.execute(VECTOR_INDEX_SQL, (REFERENCE_TABLE,)).fetchone()[0])
+        logging.info(f"[DB POOL] 벡터 인덱스 {'있음 → hybrid' if _has_vector_index else '없음 → exact'} 검색 사용")
+    return "hybrid" if _has_vector_index else "exact"
+
+
+def find_similar_file_names(tag_words: list, embedding_vector, limit: int = 1) -> list:
+    """태그 단어와 임베딩 벡터로 korea_image_data 에서 유사 이미지 file_name 을 찾습니다."""
+    if not tag_patterns(tag_words):
+        return []  # 태그 조건이 없으면 어떤 행도 통과하지 못함 (DB 조회 생략)
+    vector = np.asarray(embedding_vector, dtype=np.float32)
+    pool = get_pool()
+
+    wait_started = time.perf_counter()
+    with pool.connection() as conn:
+        wait_ms = (time.perf_counter() - wait_started) * 1000
+        mode = _resolve_mode(conn)
+        results = None
+        if mode == "hybrid":
+            results = _hybrid_search(conn, REFERENCE_TABLE, tag_words, vector, limit)
+            if results is None:
+                mode = "exact(fallback)"
+        if results is None:
+            results = _exact_search(conn, REFERENCE_TABLE, tag_words, vector, limit)
+
+    query_count = next(_query_count)
+    logging.info(f"[DB POOL] 연결 대기 {wait_ms:.1f}ms, 검색 모드 {mode}, 결과 {len(results)}건")
+    if query_count % PG_POOL_STATS_LOG_EVERY == 0:
+        logging.info(f"[DB POOL] 풀 통계: {pool_stats()}")
+    return results
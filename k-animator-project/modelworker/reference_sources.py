@@ -0,0 +1,138 @@
+# modelworker/reference_sources.py
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from shared import blob_storage
+from modelworker import reference_db
+from modelworker import local_index
+from modelworker.wikipedia import get_wikipedia_main_image
+
+# 소스별 마감 시간(초). 마감이 지나면 해당 소스는 결과 없이 건너뜀
+REFERENCE_DB_DEADLINE_S = float(os.getenv("REFERENCE_DB_DEADLINE_S", "3.0"))
+REFERENCE_WIKI_DEADLINE_S = float(os.getenv("REFERENCE_WIKI_DEADLINE_S", "2.0"))
+REFERENCE_FANOUT_WORKERS = int(os.getenv("REFERENCE_FANOUT_WORKERS", "16"))
+MAX_REFERENCE_IMAGES = 2
+
+_executor = ThreadPoolExecutor(max_workers=REFERENCE_FANOUT_WORKERS, thread_name_prefix="reference-source")
+
+
+def image_content(url: str) -> dict:
+    return {"type": "image_url", "image_url": {"url": url}}
+
+
+def fetch_db_images(tag: str, embedding_vector, cancel_event: threading.Event, limit: int = 1) -> list:
+    """태그 + 임베딩으로 유사 이미지를 찾아 Blob 에서 base64 로 불러옵니다."""
+    keywords = tag.split()
+    logging.info(f"[STEP 3] 태그 키워드 변환: {reference_db.tag_patterns(keywords)}")
+
+    if local_index.REFERENCE_LOCAL_INDEX and local_index.local_index.ready():
+        # 로컬 memmap 인덱스 사용 (DB 왕복 없음)
+        results = local_index.local_index.search(keywords, embedding_vector, limit=limit)
+    else:
+        results = reference_db.find_similar_file_names(keywords, embedding_vector, limit=limit)
+    logging.info(f"[STEP 3] DB 검색 결과 file_name 리스트: {results}")
+
+    contents = []
+    for file_name in results:
+        if cancel_event.is_set():
+            break
+        logging.info(f"[STEP 3] Blob에서 이미지 로딩 시도: {file_name}")
+        image_b64 = blob_storage.get_reference_image_base64(file_name)
+        if image_b64:
+            logging.info(f"[STEP 3] base64 변환 성공: {file_name}")
+            contents.append(image_content(f"data:image/png;base64,{image_b64}"))
+    return contents
+
+
+def fetch_wikipedia_images(tag: str, cancel_event: threading.Event) -> list:
+    wiki_image_url = get_wikipedia_main_image(tag)
+    if wiki_image_url:
+        logging.info(f"[STEP 4] Wikipedia 이미지 추가: {wiki_image_url}")
+        return [image_content(wiki_image_url)]
+    logging.info(f"[STEP 4] Wikipedia 이미지 없음")
+    return []
+
+
+def _select(results: dict, order: list, needed: int) -> tuple[list, bool]:
+    # 우선순위 순서대로 채우되, 앞 순위 소스가 끝나지 않았으면 그 뒤는 아직 확정할 수 없음
+    selected = []
+    for name in order:
+        if name not in results:
+            return selected, False
+        selected.extend(results[name])
+        if len(selected) >= needed:
+            return selected[:needed], True
+    return selected, True
+
+
+def gather_reference_images(tag: str, embedding_vector, image_url: str | None, timings: dict) -> list:
+    """
+    참조 이미지 소스(DB 유사 이미지 → Wikipedia)를 동시에 조회합니다.
+    우선순위(사용자 업로드 > DB > Wikipedia)는 유지하고, 이미지 2장이 확정되면 남은 소스는 취소합니다.
+    timings 에 소스별 소요 시간과 순차 실행 대비 절약된 시간을 기록합니다.
+    """
+    images_content = []
+    if image_url:
+        logging.info(f"[STEP 2] 사용자 업로드 이미지 추가: {image_url}")
+        images_content.append(image_content(image_url))
+    needed = MAX_REFERENCE_IMAGES - len(images_content)
+
+    cancel_event = threading.Event()
+    started = time.perf_counter()
+    sources = {
+        "db": (_executor.submit(fetch_db_images, tag, embedding_vector, cancel_event), REFERENCE_DB_DEADLINE_S),
+        "wikipedia": (_executor.submit(fetch_wikipedia_images, tag, cancel_event), REFERENCE_WIKI_DEADLINE_S),
+    }
+    order = list(sources)
+    pending = {future: name for name, (future, _) in sources.items()}
+    results = {}
+
+    def _finish(name, contents, status):
+        results[name] = contents
+        timings[f"ref_{name}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        if status != "ok":
+            timings[f"ref_{name}_status"] = status
+
+    while pending:
+        selected, done = _select(results, order, needed)
+        if done:
+            break
+
+        now = time.perf_counter() - started
+        next_deadline = min(sources[name][1] for name in pending.values())
+        finished, _ = wait(list(pending), timeout=max(next_deadline - now, 0), return_when=FIRST_COMPLETED)
+
+        for future in finished:
+            name = pending.pop(future)
+            try:
+                _finish(name, future.result(), "ok")
+            except Exception as e:
+                logging.info(f"[ERROR] 참조 이미지 소스 실패 - {name}: {e}")
+                _finish(name, [], "error")
+
+        now = time.perf_counter() - started
+        for future, name in list(pending.items()):
+            if now >= sources[name][1]:
+                logging.info(f"[TIMING] 참조 이미지 소스 마감 초과 - {name}")
+                pending.pop(future)
+                future.cancel()
+                _finish(name, [], "timeout")
+
+    # 필요한 이미지가 모두 모였으면 남은 소스는 결과를 기다리지 않음
+    cancel_event.set()
+    for future, name in pending.items():
+        future.cancel()
+        timings[f"ref_{name}_status"] = "cancelled"
+
+    selected, _ = _select(results, order, needed)
+    images_content.extend(selected)
+
+    wall_ms = round((time.perf_counter() - started) * 1000, 1)
+    sequential_ms = sum(timings.get(f"ref_{name}_ms", 0) for name in order)
+    timings["references_ms"] = wall_ms
+    timings["references_saved_ms"] = round(max(sequential_ms - wall_ms, 0), 1)
+    return images_content
@@ -0,0 +1,22 @@
+-- korea_image_data 변경 피드 (REFERENCE_LOCAL_INDEX=1 에서 사용)
+-- 행이 바뀌면 korea_image_data_changes 채널로 {"op": ..., "file_name": ...} 를 NOTIFY 합니다.
+-- 워커는 LISTEN 으로 받아 로컬 인덱스 델타에 반영하고, 주기적 스냅샷에서 합칩니다.
+
+CREATE OR REPLACE FUNCTION notify_korea_image_data_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('korea_image_data_changes', json_build_object('op', 'delete', 'file_name', OLD.file_name)::text);
+        RETURN OLD;
+    END IF;
+    IF TG_OP = 'UPDATE' AND OLD.file_name IS DISTINCT FROM NEW.file_name THEN
+        PERFORM pg_notify('korea_image_data_changes', json_build_object('op', 'delete', 'file_name', OLD.file_name)::text);
+    END IF;
+    PERFORM pg_notify('korea_image_data_changes', json_build_object('op', 'upsert', 'file_name', NEW.file_name)::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS korea_image_data_change_feed ON korea_image_data;
+CREATE TRIGGER korea_image_data_change_feed
+    AFTER INSERT OR UPDATE OR DELETE ON korea_image_data
+    FOR EACH ROW EXECUTE FUNCTION notify_korea_image_data_change();
@@ -0,0 +1,13 @@
+-- korea_image_data 벡터 인덱스 (REFERENCE_RETRIEVAL_MODE=hybrid 에서 사용)
+-- 임베딩 거리 연산자 <-> (L2) 와 같은 opclass 를 사용해야 인덱스가 선택됩니다.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS korea_image_data_vec_caption_hnsw
+    ON korea_image_data USING hnsw (vec_caption vector_l2_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- 메모리가 부족하거나 빌드 시간을 줄여야 하면 HNSW 대신 IVFFlat 사용 (lists ≈ rows / 1000)
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS korea_image_data_vec_caption_ivfflat
+--     ON korea_image_data USING ivfflat (vec_caption vector_l2_ops)
+--     WITH (lists = 100);
+
+ANALYZE korea_image_data;
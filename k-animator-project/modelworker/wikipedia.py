@@ -0,0 +1,138 @@
+# modelworker/wikipedia.py
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future
+
+import redis
+import requests
+from requests.adapters import HTTPAdapter
+
+# Wikipedia 썸네일 조회 설정 (환경변수로 조정 가능)
+WIKI_API_URL = "https://en.wikipedia.org/w/api.php"
+WIKI_CONNECT_TIMEOUT_S = float(os.getenv("WIKI_CONNECT_TIMEOUT_S", "0.5"))
+WIKI_READ_TIMEOUT_S = float(os.getenv("WIKI_READ_TIMEOUT_S", "1.5"))
+WIKI_CACHE_REDIS_URL = os.getenv("WIKI_CACHE_REDIS_URL", "redis://redis:6379/1")
+WIKI_CACHE_TTL_SECONDS = int(os.getenv("WIKI_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+WIKI_NEGATIVE_TTL_SECONDS = int(os.getenv("WIKI_NEGATIVE_TTL_SECONDS", str(60 * 60)))
+WIKI_CACHE_KEY_PREFIX = "wiki:thumb:"
+WIKI_LOCK_KEY_PREFIX = "wiki:lock:"
+WIKI_LOCK_WAIT_S = WIKI_CONNECT_TIMEOUT_S + WIKI_READ_TIMEOUT_S
+WIKI_LOCAL_CACHE_SIZE = 4096
+
+# "이미지 없음"도 캐시하기 위한 값
+NO_IMAGE = ""
+
+# keep-alive 커넥션을 재사용하는 세션 (스레드 간 공유)
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+_session.headers.update({"User-Agent": "k-animator/1.0 (reference image lookup)"})
+
+_redis = redis.Redis.from_url(WIKI_CACHE_REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.5, decode_responses=True)
+
+# 같은 프로세스 안에서 같은 태그의 동시 조회를 하나로 합치기 위한 진행 중 요청
+_inflight = {}
+_inflight_lock = threading.Lock()
+_local = {}
+
+
+def _fetch_thumbnail(tag: str) -> str:
+    response = _session.get(
+        WIKI_API_URL,
+        params={"action": "query", "titles": tag, "prop": "pageimages", "format": "json", "pithumbsize": 500},
+        timeout=(WIKI_CONNECT_TIMEOUT_S, WIKI_READ_TIMEOUT_S),
+    )
+    response.raise_for_status()
+    pages = response.json().get("query", {}).get("pages", {})
+    for page in pages.values():
+        thumbnail = page.get("thumbnail", {})
+        if "source" in thumbnail:
+            return thumbnail["source"]
+    return NO_IMAGE
+
+
+def _cache_get(tag: str) -> str | None:
+    entry = _local.get(tag)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    try:
+        return _redis.get(WIKI_CACHE_KEY_PREFIX + tag)
+    except redis.RedisError as e:
+        logging.info(f"[WIKI CACHE] Redis 조회 실패: {e}")
+        return None
+
+
+def _cache_put(tag: str, value: str):
+    ttl = WIKI_CACHE_TTL_SECONDS if value else WIKI_NEGATIVE_TTL_SECONDS
+    if len(_local) >= WIKI_LOCAL_CACHE_SIZE:
+        _local.clear()
+    _local[tag] = (value, time.monotonic() + ttl)
+    try:
+        _redis.set(WIKI_CACHE_KEY_PREFIX + tag, value, ex=ttl)
+    except redis.RedisError as e:
+        logging.info(f"[WIKI CACHE] Redis 저장 실패: {e}")
+
+
+def _lookup(tag: str) -> str | None:
+    # 다른 워커 프로세스가 같은 태그를 조회 중이면 그 결과가 캐시에 들어올 때까지 잠시 기다림
+    lock_key = WIKI_LOCK_KEY_PREFIX + tag
+    try:
+        acquired = _redis.set(lock_key, "1", nx=True, ex=max(int(WIKI_LOCK_WAIT_S) + 1, 1))
+    except redis.RedisError:
+        acquired = True
+    if not acquired:
+        deadline = time.monotonic() + WIKI_LOCK_WAIT_S
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            cached = _cache_get(tag)
+            if cached is not None:
+                return cached
+
+    try:
+        value = _fetch_thumbnail(tag)
+    except Exception as e:
+        # 타임아웃/네트워크 오류는 캐시하지 않음 (다음 요청에서 다시 시도)
+        logging.info(f"[ERROR] Wikipedia 이미지 검색 실패: {e}")
+        return None
+    finally:
+        if acquired:
+            try:
+                _redis.delete(lock_key)
+            except redis.RedisError:
+                pass
+    _cache_put(tag, value)
+    return value
+
+
+def get_wikipedia_main_image(tag: str) -> str | None:
+    """태그의 Wikipedia 대표 썸네일 URL 을 반환합니다. 없으면 None. (양/음 결과 모두 TTL 캐시)"""
+    tag = (tag or "").strip()
+    if not tag:
+        return None
+
+    cached = _cache_get(tag)
+    if cached is not None:
+        return cached or None
+
+    with _inflight_lock:
+        future = _inflight.get(tag)
+        owner = future is None
+        if owner:
+            future = Future()
+            _inflight[tag] = future
+
+    if not owner:
+        return future.result() or None
+
+    try:
+        value = _lookup(tag)
+        future.set_result(value)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(tag, None)
+    return value or None
@@ -1,17 +1,12 @@
 from dotenv import load_dotenv
 from celery import Celery
 from celery.signals import after_setup_logger
-from io import BytesIO
-from PIL import Image
-import requests
 import os
-import subprocess
-import psycopg2
-import base64
-import torch
+import json
+import time
 import base64
+import threading
 from datetime import datetime, timedelta
-from transformers import AutoProcessor, AutoModel
 from openai import AzureOpenAI
 from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
 import logging
@@ -19,6 +14,16 @@ import logging
 from shared.db.database import SessionLocal
 from shared.db import models
 from shared import blob_storage
+from shared import psd_writer
+from shared import image_bytes
+from shared import artifact_publisher
+from shared import image_pipeline
+from shared import task_events
+from modelworker import koclip
+from modelworker.embedding_batcher import EmbeddingBatcher
+from modelworker.embedding_cache import EmbeddingCache
+from modelworker import reference_db
+from modelworker import reference_sources
 
 # 환경변수 로딩,
 load_dotenv()
@@ -26,22 +31,27 @@ AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_VERSION = "2024-05-01-preview"
 
-PG_HOST = os.getenv("PG_HOST")
-PG_PORT = os.getenv("PG_PORT")
-PG_DBNAME = os.getenv("PG_DBNAME")
-PG_USER = os.getenv("PG_USER")
-PG_PASSWORD = os.getenv("PG_PASSWORD")
+# KoCLIP 텍스트 인코더 로딩 (KOCLIP_BACKEND=torch | onnx)
+# 임베딩 단계를 처리하지 않는 워커(io_queue / publish_queue)는 KOCLIP_PRELOAD=0 으로 두면 모델을 메모리에 올리지 않음
+KOCLIP_PRELOAD = os.getenv("KOCLIP_PRELOAD", "1") == "1"
+_text_encoder = koclip.load_text_encoder() if KOCLIP_PRELOAD else None
+_text_encoder_lock = threading.Lock()
 
-# KoCLIP 모델 로딩
-processor = AutoProcessor.from_pretrained("koclip/koclip-base-pt")
-model = AutoModel.from_pretrained("koclip/koclip-base-pt").eval().to("cuda" if torch.cuda.is_available() else "cpu")
-device = next(model.parameters()).device
+def embed_texts_koclip(texts):
+    global _text_encoder
+    if _text_encoder is None:
+        with _text_encoder_lock:
+            if _text_encoder is None:
+                _text_encoder = koclip.load_text_encoder()
+    return _text_encoder(texts)
 
 # 클라이언트 초기화
 client = AzureOpenAI(api_key=AZURE_OPENAI_KEY, azure_endpoint=AZURE_OPENAI_ENDPOINT, api_version=AZURE_OPENAI_VERSION)
 
 # Celery 설정 -> 읽기
 celery_app = Celery('worker', broker='redis://redis:6379/0', backend='redis://redis:6379/0')    # 배포 전 수정
+celery_app.conf.task_routes = image_pipeline.TASK_ROUTES  # generate_image.* 단계별 큐
+task_events.install_publisher(celery_app)  # 태스크 상태를 Redis pub/sub 으로 발행 (API 의 SSE / long-poll 용)
 
 @after_setup_logger.connect
 def setup_loggers(logger, *args, **kwargs):
@@ -52,12 +62,14 @@ def setup_loggers(logger, *args, **kwargs):
     logger.addHandler(handler)
     logger.setLevel(logging.INFO)
 
-# 유틸 함수
+# 동시 요청을 모아 배치로 임베딩 (EMBED_BATCH_WINDOW_MS, EMBED_MAX_BATCH_SIZE)
+embedding_batcher = EmbeddingBatcher(embed_texts_koclip)
+
+# 같은 캡션/태그 템플릿의 반복 임베딩 방지 (프로세스 LRU + Redis float16)
+embedding_cache = EmbeddingCache(koclip.cache_namespace())
+
 def embed_text_koclip(text):
-    inputs = processor(text=[text], return_tensors="pt", truncation=True, padding=True).to(device)
-    with torch.no_grad():
-        embedding = model.get_text_features(**inputs)
-    return embedding[0].cpu().numpy().tolist()
+    return embedding_cache.get_or_compute(text, embedding_batcher.embed)
 
 layer_descriptions = {
     "콘티": "A rough, gray pencil storyboard-style sketch focusing on layout and composition. "
@@ -77,96 +89,19 @@ layer_descriptions = {
            "The composition feels complete, as if prepared for publication or final output."
 }
 
-def get_wikipedia_main_image(tag):
-    try:
-        search_url = f"https://en.wikipedia.org/w/api.php?action=query&titles={tag}&prop=pageimages&format=json&pithumbsize=500"
-        response = requests.get(search_url)
-        data = response.json()
-        pages = data.get("query", {}).get("pages", {})
-        for page in pages.values():
-            thumbnail = page.get("thumbnail", {})
-            if "source" in thumbnail:
-                return thumbnail["source"]
-    except Exception as e:
-        logging.info(f"[ERROR] Wikipedia 이미지 검색 실패: {e}")
-    return None
+# 임베딩 캐시 hit/miss 카운터 조회용 (celery call embedding_cache_stats)
+@celery_app.task(name="embedding_cache_stats")
+def embedding_cache_stats() -> dict:
+    return embedding_cache.snapshot()
 
+# pgvector 커넥션 풀 메트릭 조회용 (celery call reference_db_pool_stats)
+@celery_app.task(name="reference_db_pool_stats")
+def reference_db_pool_stats() -> dict:
+    return reference_db.pool_stats()
 
-@celery_app.task(name="generate_image", bind=True)
-def generate_image(self, user_id: int, username: str, category: str, layer: str, tag: str, caption_input: str | None = None, image_url: str | None = None) -> dict:
-    try:
-        
-        task_id = self.request.id
-        logging.info(f"[TASK] generate_image 시작 - task_id: {task_id}")
-        logging.info(f"[INPUT] username: {username}, category: {category}, layer: {layer}, tag: {tag}, caption_input: {caption_input}, image_url: {image_url}")
-        
-        # 1. KoCLIP 임베딩
-        text_to_embed = caption_input if caption_input else f"{tag}가 포함된 한국 웹툰 이미지를 그려주세요."
-        logging.info(f"[STEP 1] 임베딩 대상 텍스트: {text_to_embed}")
-        embedding_vector = embed_text_koclip(text_to_embed)
-        vector_str = "[" + ",".join([str(x) for x in embedding_vector]) + "]"
-        logging.info(f"[STEP 1] 생성된 임베딩 벡터 길이: {len(embedding_vector)}")
-
-        images_content = []
-
-        # 2. 사용자 업로드 이미지 (최우선, 1장)
-        if image_url:
-            logging.info(f"[STEP 2] 사용자 업로드 이미지 추가: {image_url}")
-            images_content.append({
-                "type": "image_url",
-                "image_url": {"url": image_url}
-            })
-
-        # 3. DB 유사 이미지 최대 1장 추가
-        if len(images_content) < 2:
-            conn = psycopg2.connect(host=PG_HOST, port=PG_PORT, dbname=PG_DBNAME, user=PG_USER, password=PG_PASSWORD)
-            cursor = conn.cursor()
-            keywords = [f"%{word.strip()}%" for word in tag.split()]
-            logging.info(f"[STEP 3] 태그 키워드 변환: {keywords}")
-
-            sql = """
-                SELECT file_name FROM korea_image_data
-                WHERE tag ILIKE ANY (%s)
-                ORDER BY vec_caption <-> %s::vector
-                LIMIT 1;
-            """
-            cursor.execute(sql, (keywords, vector_str))
-            results = cursor.fetchall()
-            logging.info(f"[STEP 3] DB 검색 결과 file_name 리스트: {results}")
-            cursor.close()
-            conn.close()
-
-            for row in results:
-                file_name = row[0]
-                logging.info(f"[STEP 3] Blob에서 이미지 로딩 시도: {file_name}")
-                image_b64 = blob_storage.get_blob_base64_image("img", file_name)
-                if image_b64:
-                    logging.info(f"[STEP 3] base64 변환 성공: {file_name}")
-                    images_content.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{image_b64}"
-                        }
-                    })
-
-        # 4. Wikipedia 이미지 1장 (없을 경우만)
-        if len(images_content) < 2:
-            wiki_image_url = get_wikipedia_main_image(tag)
-            if wiki_image_url:
-                logging.info(f"[STEP 4] Wikipedia 이미지 추가: {wiki_image_url}")
-                images_content.append({
-                    "type": "image_url",
-                    "image_url": {"url": wiki_image_url}
-                })
-            else:
-                logging.info(f"[STEP 4] Wikipedia 이미지 없음")
-
-        # 5. 이미지가 없어도 텍스트만으로 생성 가능
-        if not images_content:
-            logging.info(f"[STEP 5] 이미지 없이 텍스트만으로 프롬프트 생성됨")
-
-        # 6. gpt 프롬프트 생성
-        prompt_text = (
+
+def build_prompt_text(layer: str, caption_input: str | None) -> str:
+    return (
             "Analyze the provided images and generate a Korean-style webtoon background scene suitable for a DALL·E 3 prompt.\n"
             "The scene should reflect a natural and culturally authentic Korean setting that fits the input concept.\n"
             "Include Korean cultural elements in a visually balanced and respectful manner.\n"
@@ -182,80 +117,205 @@ def generate_image(self, user_id: int, username: str, category: str, layer: str,
             f"Original description from the user: \"{caption_input}\""
 )
 
-        logging.info(f"[STEP 6] 생성된 프롬프트:\n{prompt_text}") 
-
-        messages = [{
-            "role": "user",
-            "content": [{"type": "text", "text": prompt_text}] + images_content
-        }]
-        response = client.chat.completions.create(model="gpt-4o", messages=messages, max_tokens=800, temperature=0.7)
-        dalle_prompt = response.choices[0].message.content.strip()
-        logging.info(f"[STEP 6] GPT 생성 결과:\n{dalle_prompt}")
-
-        # 영구적으로 사용한 blob 파일 경로
-        user_folder = f"user_{user_id}" 
-        filename_png = f"{user_folder}/generated/png/{task_id}.png"
-        filename_psd = f"{user_folder}/generated/psd/{task_id}.psd"
-
-        logging.info(f"[TASK] generate_final_image 시작 - task_id: {task_id}")
-        logging.info(f"[INPUT] DALL·E 프롬프트: {dalle_prompt}")
-
-        # 8. DALL·E 3 이미지 생성
-        dalle_response = client.images.generate(
-            model="gpt-image-1", 
-            prompt=dalle_prompt, 
-            size="1024x1024", 
-            n=1,
-            quality="high"
-        )
-        image_url = dalle_response.data[0].b64_json
-        logging.info(f"[STEP 8] DALL·E 이미지 URL: {len(image_url)}")
-        dalle_image_data = base64.b64decode(image_url)
-        dalle_img = Image.open(BytesIO(dalle_image_data))
-
-        # 9. Blob 저장: png/ 하위에 저장
-        png_buffer = BytesIO()
-        dalle_img.save(png_buffer, format="PNG")
-        png_buffer.seek(0)
-        
-        blob_storage.upload_blob(blob_name=filename_png, data=png_buffer, overwrite=True)
-        logging.info(f"[STEP 9] PNG Blob 저장 완료: {filename_png}")
-        png_buffer.close()
-
-        # 10. PSD 변환 후 psd/ 하위에 저장
-        temp_png_path = f"/tmp/{task_id}.png"
-        temp_psd_path = f"/tmp/{task_id}.psd"
-        dalle_img.save(temp_png_path, format="PNG")
-        subprocess.run(["convert", temp_png_path, temp_psd_path], check=True)
-        with open(temp_psd_path, "rb") as f:
-            blob_storage.upload_blob(blob_name=filename_psd, data=f, overwrite=True)
-        logging.info(f"[STEP 10] PSD 업로드 완료: {filename_psd}")
-        
-        # --- DB 저장 로직 추가 ---
-        db = SessionLocal()
-        try:
-            new_image = models.Image(
+
+# --- 단계 함수: 단일 태스크(generate_image)와 단계 체인(generate_image.*)이 함께 사용 ---
+# ctx 는 shared.image_pipeline.new_context() 형식의 dict 이며, 각 단계는 결과를 ctx 에 더해 반환합니다.
+
+def stage_embed(ctx: dict) -> dict:
+    # 1. KoCLIP 임베딩
+    step_started = time.perf_counter()
+    text_to_embed = ctx["caption_input"] if ctx["caption_input"] else f"{ctx['tag']}가 포함된 한국 웹툰 이미지를 그려주세요."
+    logging.info(f"[STEP 1] 임베딩 대상 텍스트: {text_to_embed}")
+    embedding_vector = embed_text_koclip(text_to_embed)
+    logging.info(f"[STEP 1] 생성된 임베딩 벡터 길이: {len(embedding_vector)}")
+    logging.info(f"[STEP 1] 임베딩 캐시 통계: {embedding_cache.snapshot()}")
+    ctx["embedding_vector"] = list(embedding_vector)
+    ctx["timings"]["embed_ms"] = round((time.perf_counter() - step_started) * 1000, 1)
+    return ctx
+
+
+def stage_retrieve(ctx: dict) -> list:
+    # 2~4. 참조 이미지 (사용자 업로드 > DB 유사 이미지 > Wikipedia) 동시 조회, 최대 2장
+    images_content = reference_sources.gather_reference_images(ctx["tag"], ctx["embedding_vector"], ctx["image_url"], ctx["timings"])
+    logging.info(f"[STEP 4] 참조 이미지 {len(images_content)}장 수집 완료")
+
+    # 5. 이미지가 없어도 텍스트만으로 생성 가능
+    if not images_content:
+        logging.info(f"[STEP 5] 이미지 없이 텍스트만으로 프롬프트 생성됨")
+    return images_content
+
+
+def stage_prompt(ctx: dict, images_content: list) -> dict:
+    # 6. gpt 프롬프트 생성
+    prompt_text = build_prompt_text(ctx["layer"], ctx["caption_input"])
+    logging.info(f"[STEP 6] 생성된 프롬프트:\n{prompt_text}") 
+
+    messages = [{
+        "role": "user",
+        "content": [{"type": "text", "text": prompt_text}] + images_content
+    }]
+    step_started = time.perf_counter()
+    response = client.chat.completions.create(model="gpt-4o", messages=messages, max_tokens=800, temperature=0.7)
+    ctx["timings"]["prompt_ms"] = round((time.perf_counter() - step_started) * 1000, 1)
+    ctx["dalle_prompt"] = response.choices[0].message.content.strip()
+    logging.info(f"[STEP 6] GPT 생성 결과:\n{ctx['dalle_prompt']}")
+    return ctx
+
+
+def stage_render(ctx: dict) -> bytes:
+    logging.info(f"[INPUT] DALL·E 프롬프트: {ctx['dalle_prompt']}")
+
+    # 8. DALL·E 3 이미지 생성
+    step_started = time.perf_counter()
+    dalle_response = client.images.generate(
+        model="gpt-image-1", 
+        prompt=ctx["dalle_prompt"], 
+        size="1024x1024", 
+        n=1,
+        quality="high"
+    )
+    image_url = dalle_response.data[0].b64_json
+    ctx["timings"]["image_ms"] = round((time.perf_counter() - step_started) * 1000, 1)
+    logging.info(f"[STEP 8] DALL·E 이미지 URL: {len(image_url)}")
+    return base64.b64decode(image_url)
+
+
+def stage_publish(ctx: dict, png_data: bytes) -> dict:
+    task_id = ctx["tracking_id"]
+    user_id = ctx["user_id"]
+
+    # gpt-image-1 은 이미 PNG 를 돌려주므로 디코딩/재인코딩 없이 원본 바이트를 그대로 업로드 (헤더만 확인)
+    dalle_image = image_bytes.LazyImage(png_data)
+    logging.info(f"[STEP 8] PNG 헤더 확인: {dalle_image.size}")
+
+    # 영구적으로 사용한 blob 파일 경로
+    user_folder = f"user_{user_id}" 
+    filename_png = f"{user_folder}/generated/png/{task_id}.png"
+    filename_psd = f"{user_folder}/generated/psd/{task_id}.psd"
+
+    # 9~10. PNG 업로드 / PSD 변환+업로드 / DB 저장을 동시에 실행
+    #       (PSD 는 메모리에서 RLE 인코딩, 큰 PSD 는 블록 병렬 업로드)
+    db = SessionLocal()
+    try:
+        def stage_image_row():
+            # INSERT 는 업로드와 함께 보내 두고, 커밋은 업로드가 모두 성공한 뒤에 함
+            db.add(models.Image(
                 task_id=task_id,
                 png_url=filename_png,
                 psd_url=filename_psd,
                 user_id=user_id
-            )
-            db.add(new_image)
-            db.commit()
-            logging.info(f"[DB] 이미지 정보 저장 완료 - user_id: {user_id}")
-        finally:
-            db.close()
-        # --- DB 저장 로직 끝 ---
+            ))
+            db.flush()
+
+        artifact_publisher.publish(
+            [
+                artifact_publisher.Artifact(filename_png, dalle_image.data, content_type="image/png"),
+                artifact_publisher.Artifact(filename_psd, lambda: psd_writer.encode_psd(dalle_image.image)),  # 픽셀은 PSD 만들 때만 디코딩
+            ],
+            side_tasks={"db": stage_image_row},
+            timings=ctx["timings"],
+        )
+        db.commit()
+        logging.info(f"[STEP 9] PNG/PSD 업로드 완료: {filename_png}, {filename_psd}")
+        logging.info(f"[DB] 이미지 정보 저장 완료 - user_id: {user_id}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    ctx["timings"]["total_ms"] = round((time.time() - ctx["created_at"]) * 1000, 1)
+    logging.info(f"[TIMING] 단계별 소요 시간: {ctx['timings']}")
 
+    png_url = blob_storage.generate_sas_url(filename_png)
+    psd_url = blob_storage.generate_sas_url(filename_psd)
+    return {"status": "SUCCESS", "png_url": png_url, "psd_url": psd_url}
 
-        # 임시 파일 삭제
-        os.remove(temp_png_path)
-        os.remove(temp_psd_path)
 
-        png_url = blob_storage.generate_sas_url(filename_png)
-        psd_url = blob_storage.generate_sas_url(filename_psd)
-        return {"status": "SUCCESS", "png_url": png_url, "psd_url": psd_url}
+@celery_app.task(name="generate_image", bind=True)
+def generate_image(self, user_id: int, username: str, category: str, layer: str, tag: str, caption_input: str | None = None, image_url: str | None = None) -> dict:
+    """전체 단계를 한 태스크에서 순서대로 실행합니다. (단계 체인을 쓰지 않는 기존 호출용)"""
+    try:
+        ctx = image_pipeline.new_context(user_id, username, category, layer, tag, caption_input, image_url)
+        ctx["tracking_id"] = self.request.id
+        logging.info(f"[TASK] generate_image 시작 - task_id: {ctx['tracking_id']}")
+        logging.info(f"[INPUT] username: {username}, category: {category}, layer: {layer}, tag: {tag}, caption_input: {caption_input}, image_url: {image_url}")
+
+        ctx = stage_embed(ctx)
+        images_content = stage_retrieve(ctx)
+        ctx = stage_prompt(ctx, images_content)
+        png_data = stage_render(ctx)
+        return stage_publish(ctx, png_data)
 
     except Exception as e:
         logging.info(f"[ERROR] 전체 프로세스 실패: {e}")
-        return {"status": "FAILURE", "error": str(e)}
\ No newline at end of file
+        return {"status": "FAILURE", "error": str(e)}
+
+
+# --- 단계 체인 태스크 (큐 라우팅은 shared/image_pipeline.py 의 STAGES 참고) ---
+# 모델을 들고 있는 임베딩 워커가 OpenAI 응답을 기다리며 묶여 있지 않도록 단계별로 다른 워커 풀에서 실행합니다.
+
+def _begin_stage(ctx: dict, stage: str):
+    # 이전 단계가 끝난 뒤 이 단계가 시작되기까지 큐에서 기다린 시간
+    handoff_at = ctx.get("handoff_at", ctx["created_at"])
+    ctx["timings"][f"{stage}_queue_ms"] = round(max(time.time() - handoff_at, 0) * 1000, 1)
+    logging.info(f"[PIPELINE] {stage} 시작 - tracking_id: {ctx['tracking_id']}")
+
+
+def _end_stage(ctx: dict) -> dict:
+    ctx["handoff_at"] = time.time()
+    return ctx
+
+
+@celery_app.task(name="generate_image.embed")
+def generate_image_embed(ctx: dict) -> dict:
+    _begin_stage(ctx, "embed")
+    logging.info(f"[INPUT] username: {ctx['username']}, category: {ctx['category']}, layer: {ctx['layer']}, tag: {ctx['tag']}, caption_input: {ctx['caption_input']}, image_url: {ctx['image_url']}")
+    return _end_stage(stage_embed(ctx))
+
+
+@celery_app.task(name="generate_image.retrieve")
+def generate_image_retrieve(ctx: dict) -> dict:
+    _begin_stage(ctx, "retrieve")
+    images_content = stage_retrieve(ctx)
+    # 참조 이미지(base64)는 크기가 커서 브로커 대신 Redis 에 보관
+    ctx["images_key"] = image_pipeline.stash(ctx["tracking_id"], "images", json.dumps(images_content).encode("utf-8"))
+    ctx.pop("embedding_vector", None)  # 이후 단계에서는 필요 없음
+    return _end_stage(ctx)
+
+
+@celery_app.task(name="generate_image.prompt")
+def generate_image_prompt(ctx: dict) -> dict:
+    _begin_stage(ctx, "prompt")
+    images_content = json.loads(image_pipeline.unstash(ctx["images_key"]))
+    ctx = stage_prompt(ctx, images_content)
+    image_pipeline.discard(ctx.pop("images_key"))
+    return _end_stage(ctx)
+
+
+@celery_app.task(name="generate_image.render")
+def generate_image_render(ctx: dict) -> dict:
+    _begin_stage(ctx, "render")
+    png_data = stage_render(ctx)
+    ctx["png_key"] = image_pipeline.stash(ctx["tracking_id"], "png", png_data)
+    return _end_stage(ctx)
+
+
+@celery_app.task(name="generate_image.publish")
+def generate_image_publish(ctx: dict) -> dict:
+    _begin_stage(ctx, "publish")
+    result = stage_publish(ctx, image_pipeline.unstash(ctx["png_key"]))
+    image_pipeline.discard(ctx["png_key"])
+    logging.info(f"[PIPELINE] 완료 - tracking_id: {ctx['tracking_id']}")
+    return result
+
+
+@celery_app.task(name=image_pipeline.FAILED_TASK)
+def generate_image_failed(request, exc, traceback, tracking_id: str):
+    """
+    체인의 어느 단계든 실패하면 로그를 남기고 Redis 에 보관해 둔 중간 데이터를 지웁니다.
+    tracking_id(마지막 태스크 id)의 FAILURE 는 Celery 가 실패한 단계의 예외/traceback 으로 남은 체인 태스크에 이미 기록하므로
+    여기서 다시 기록하지 않습니다. (덮어쓰면 원래 traceback 대신 errback 의 것이 남음)
+    """
+    logging.info(f"[ERROR] 파이프라인 단계 실패 - tracking_id: {tracking_id}, task: {request.task}, error: {exc}")
+    image_pipeline.discard(f"{image_pipeline.STASH_KEY_PREFIX}{tracking_id}:images", f"{image_pipeline.STASH_KEY_PREFIX}{tracking_id}:png")
@@ -0,0 +1,146 @@
+# shared/admission.py
+# GPU 작업 / 유료 이미지 API 호출 요청을 Celery 에 넣기 전에 Redis 토큰 버킷으로 걸러냅니다.
+# 정책마다 사용자별 버킷과 전체(글로벌) 버킷을 함께 확인하고, 둘 다 여유가 있을 때만 토큰을 차감합니다.
+# 거절된 요청은 브로커에 쌓이지 않고 바로 429 + Retry-After 로 응답합니다.
+
+import os
+import math
+import logging
+
+import redis
+from fastapi import HTTPException, Header, Request, status
+
+ADMISSION_REDIS_URL = os.getenv("ADMISSION_REDIS_URL", "redis://redis:6379/4")
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_KEY_PREFIX = "admission:"
+
+
+def _limit(name: str, scope: str, per_min: float, burst: int) -> tuple[float, int]:
+    prefix = f"ADMISSION_{name.upper()}_{scope.upper()}"
+    return float(os.getenv(f"{prefix}_PER_MIN", per_min)), int(os.getenv(f"{prefix}_BURST", burst))
+
+
+# 정책별 (분당 토큰 수, 최대 버스트). 환경변수 ADMISSION_<정책>_<USER|GLOBAL>_<PER_MIN|BURST> 로 조정
+POLICIES = {
+    "generate_image": {
+        "user": _limit("generate_image", "user", 6, 3),
+        "global": _limit("generate_image", "global", 120, 20),
+    },
+    "object_separation": {
+        "user": _limit("object_separation", "user", 4, 2),
+        "global": _limit("object_separation", "global", 30, 5),
+    },
+    "gpt_image": {
+        "user": _limit("gpt_image", "user", 6, 3),
+        "global": _limit("gpt_image", "global", 60, 10),
+    },
+    "separate_layers": {
+        "user": _limit("separate_layers", "user", 10, 5),
+        "global": _limit("separate_layers", "global", 60, 10),
+    },
+    # 공개 API (로그인 전): 회원가입 화면의 아이디 / 이메일 실시간 확인. 사용자 = 클라이언트 IP
+    "availability": {
+        "user": _limit("availability", "user", 30, 10),
+        "global": _limit("availability", "global", 600, 100),
+    },
+}
+
+# KEYS: 버킷 키들, ARGV: 버킷마다 (ms 당 토큰 수, 버스트)
+# 모든 버킷에 토큰이 1개 이상 있을 때만 전부 차감. 반환: {허용 여부, 다시 시도까지 ms}
+TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tokens = {}
+local wait = 0
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local current = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    current = math.min(burst, current + math.max(now - ts, 0) * rate)
+    tokens[i] = current
+    if current < 1 then
+        wait = math.max(wait, math.ceil((1 - current) / rate))
+    end
+end
+if wait > 0 then
+    return {0, wait}
+end
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens[i] - 1), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(burst / rate) + 1000)
+end
+return {1, 0}
+"""
+
+_redis = None
+_script = None
+
+
+def _get_script():
+    global _redis, _script
+    if _script is None:
+        import redis.asyncio as aioredis
+        _redis = aioredis.Redis.from_url(ADMISSION_REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.5)
+        _script = _redis.register_script(TOKEN_BUCKET_LUA)
+    return _script
+
+
+async def admit(policy: str, identity: str) -> tuple[bool, float]:
+    """(허용 여부, 다시 시도까지 남은 초) 를 반환합니다. Redis 장애 시에는 요청을 막지 않습니다."""
+    limits = POLICIES[policy]
+    keys, args = [], []
+    for scope, bucket in (("user", identity), ("global", "all")):
+        per_min, burst = limits[scope]
+        keys.append(f"{ADMISSION_KEY_PREFIX}{policy}:{scope}:{bucket}")
+        args.extend([per_min / 60000.0, burst])
+    try:
+        allowed, wait_ms = await _get_script()(keys=keys, args=args)
+    except redis.RedisError as e:
+        logging.info(f"[ADMISSION] Redis 오류로 통과 처리 - {policy}: {e}")
+        return True, 0.0
+    return bool(allowed), int(wait_ms) / 1000.0
+
+
+async def enforce(policy: str, identity: str):
+    """
+    토큰을 1개 차감하고, 여유가 없으면 429 + Retry-After 를 발생시킵니다.
+    중복 제출 확인(shared/idempotency)을 쓰는 엔드포인트는 새 작업을 실제로 제출할 때만 호출합니다.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"알 수 없는 admission 정책: {policy}")
+    if not ADMISSION_ENABLED:
+        return
+    allowed, retry_after = await admit(policy, identity)
+    if not allowed:
+        logging.info(f"[ADMISSION] 요청 거절 - policy: {policy}, identity: {identity}, retry_after: {retry_after:.1f}s")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="요청이 너무 많습니다. 잠시 후 다시 시도해 주세요.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+def client_ip_identity(request: Request) -> str:
+    """클라이언트 IP 기준 사용자 식별자. 인증 없는 API 에서는 X-User-ID 를 클라이언트가 마음대로 보낼 수 있으므로 이 값을 사용"""
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def limit(policy: str, by_ip: bool = False):
+    """
+    라우트에 붙이는 FastAPI 의존성을 만듭니다. 사용자는 X-User-ID(게이트웨이) 기준, 없으면 클라이언트 IP 기준입니다.
+    공개 API 는 by_ip=True 로 항상 IP 기준 (X-User-ID 를 바꿔 가며 보내 사용자별 제한을 피하지 못하도록)
+    예: @router.post("/object-separation-inpainting", dependencies=[Depends(admission.limit("object_separation"))])
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"알 수 없는 admission 정책: {policy}")
+
+    async def dependency(request: Request, x_user_id: str | None = Header(None, alias="X-User-ID")):
+        client_ip = client_ip_identity(request)
+        identity = client_ip if by_ip else (x_user_id or client_ip)
+        await enforce(policy, identity)
+
+    return dependency
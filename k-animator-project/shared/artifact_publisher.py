@@ -0,0 +1,79 @@
+# shared/artifact_publisher.py
+
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from shared import blob_storage
+
+ARTIFACT_PUBLISH_WORKERS = int(os.getenv("ARTIFACT_PUBLISH_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=ARTIFACT_PUBLISH_WORKERS, thread_name_prefix="artifact-publish")
+
+
+class Artifact:
+    """
+    업로드할 결과물 1개.
+    data 는 bytes 이거나, bytes 를 만들어 반환하는 함수입니다. (PSD 인코딩처럼 오래 걸리는 변환을
+    다른 업로드와 겹쳐서 실행하기 위해 함수로 넘길 수 있습니다)
+    """
+
+    def __init__(self, blob_name: str, data: bytes | Callable[[], bytes], content_type: str | None = None):
+        self.blob_name = blob_name
+        self.data = data
+        self.content_type = content_type
+
+
+def _upload(artifact: Artifact) -> dict:
+    started = time.perf_counter()
+    data = artifact.data() if callable(artifact.data) else artifact.data
+    encoded = time.perf_counter()
+    # 블록 업로드 임계값보다 큰 Blob(PSD 등)은 블록을 병렬로 올림
+    concurrency = blob_storage.BLOB_UPLOAD_CONCURRENCY if len(data) > blob_storage.BLOB_MAX_SINGLE_PUT_MB * 1024 * 1024 else 1
+    blob_storage.upload_blob(blob_name=artifact.blob_name, data=data, overwrite=True,
+                             content_type=artifact.content_type, max_concurrency=concurrency)
+    return {
+        "encode_ms": round((encoded - started) * 1000, 1),
+        "upload_ms": round((time.perf_counter() - encoded) * 1000, 1),
+        "bytes": len(data),
+    }
+
+
+def _timed(fn: Callable) -> dict:
+    started = time.perf_counter()
+    fn()
+    return {"upload_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+def publish(artifacts: list[Artifact], side_tasks: dict[str, Callable] | None = None, timings: dict | None = None):
+    """
+    결과물들을 동시에 업로드하고, side_tasks(DB 저장 등)도 업로드와 함께 실행합니다.
+    모든 작업이 끝날 때까지 기다린 뒤, 하나라도 실패하면 그 예외를 그대로 다시 발생시킵니다.
+    timings 에 작업별 소요 시간, 전체 소요 시간(publish_ms), 순차 실행 대비 절약된 시간(publish_saved_ms)을 기록합니다.
+    """
+    started = time.perf_counter()
+    futures = {artifact.blob_name: _executor.submit(_upload, artifact) for artifact in artifacts}
+    for name, task in (side_tasks or {}).items():
+        futures[name] = _executor.submit(_timed, task)
+
+    error = None
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            logging.info(f"[PUBLISH] 실패 - {name}: {e}")
+            error = error or e
+
+    wall_ms = round((time.perf_counter() - started) * 1000, 1)
+    sequential_ms = sum(r.get("encode_ms", 0) + r["upload_ms"] for r in results.values())
+    logging.info(f"[PUBLISH] 작업별 결과: {results}")
+    if timings is not None:
+        timings["publish_ms"] = wall_ms
+        timings["publish_sequential_ms"] = round(sequential_ms, 1)
+        timings["publish_saved_ms"] = round(max(sequential_ms - wall_ms, 0), 1)
+    if error:
+        raise error
+    return results
@@ -1,20 +1,47 @@
 # shared/blob_storage.py
 
 import os
+import base64
+from io import BytesIO
 from datetime import datetime, timedelta
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions, ContentSettings
+from PIL import Image
 import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+from shared.disk_cache import DiskLRUCache
 
 # 1. 모든 환경 변수를 이 파일에서 중앙 관리합니다.
 AZURE_STORAGE_ACCOUNT_NAME = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
 AZURE_STORAGE_ACCOUNT_KEY = os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
 AZURE_CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME") # 기본 컨테이너 이름
 
+# 업로드 HTTP 커넥션 풀 / 블록 업로드 설정 (환경변수로 조정 가능)
+BLOB_HTTP_POOL_SIZE = int(os.getenv("BLOB_HTTP_POOL_SIZE", "32"))
+BLOB_MAX_SINGLE_PUT_MB = int(os.getenv("BLOB_MAX_SINGLE_PUT_MB", "2"))  # 이보다 큰 데이터는 블록으로 나눠 업로드
+BLOB_MAX_BLOCK_MB = int(os.getenv("BLOB_MAX_BLOCK_MB", "1"))
+BLOB_UPLOAD_CONCURRENCY = int(os.getenv("BLOB_UPLOAD_CONCURRENCY", "4"))  # 큰 Blob 의 블록 병렬 업로드 수
+
+def _pooled_transport() -> RequestsTransport:
+    """스레드 간 keep-alive 커넥션을 공유하는 HTTP 전송 계층 (동시 업로드 시 커넥션 재사용)"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BLOB_HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return RequestsTransport(session=session, session_owner=False, connection_timeout=5, read_timeout=60)
+
 # 2. Blob Service 클라이언트를 한 번만 초기화하여 재사용합니다.
 blob_service_client = None
 if AZURE_STORAGE_ACCOUNT_NAME and AZURE_STORAGE_ACCOUNT_KEY:
     connection_string = f"DefaultEndpointsProtocol=https;AccountName={AZURE_STORAGE_ACCOUNT_NAME};AccountKey={AZURE_STORAGE_ACCOUNT_KEY};EndpointSuffix=core.windows.net"
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    blob_service_client = BlobServiceClient.from_connection_string(
+        connection_string,
+        transport=_pooled_transport(),
+        max_single_put_size=BLOB_MAX_SINGLE_PUT_MB * 1024 * 1024,
+        max_block_size=BLOB_MAX_BLOCK_MB * 1024 * 1024,
+    )
 else:
     logging.warning("Azure Storage credentials not found. Blob storage functions will not work.")
 
@@ -35,13 +62,15 @@ def generate_sas_url(blob_name: str, container_name: str = AZURE_CONTAINER_NAME,
     return f"https://{AZURE_STORAGE_ACCOUNT_NAME}.blob.core.windows.net/{container_name}/{blob_name}?{sas_token}"
 
 # 4. Blob에 데이터를 업로드하는 공용 함수를 만듭니다.
-def upload_blob(blob_name: str, data: bytes, container_name: str = AZURE_CONTAINER_NAME, overwrite: bool = True):
-    """주어진 데이터를 Blob에 업로드합니다."""
+def upload_blob(blob_name: str, data: bytes, container_name: str = AZURE_CONTAINER_NAME, overwrite: bool = True,
+                content_type: str | None = None, max_concurrency: int = 1):
+    """주어진 데이터를 Blob에 업로드합니다. 큰 데이터는 블록 단위로 나눠 max_concurrency 만큼 병렬 업로드합니다."""
     if not blob_service_client:
         raise ConnectionError("Blob service client is not initialized.")
     
     blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
-    blob_client.upload_blob(data, overwrite=overwrite)
+    content_settings = ContentSettings(content_type=content_type) if content_type else None
+    blob_client.upload_blob(data, overwrite=overwrite, content_settings=content_settings, max_concurrency=max_concurrency)
     logging.info(f"Blob uploaded successfully: {container_name}/{blob_name}")
 
 # 5. Blob 데이터를 다운로드하는 공용 함수를 만듭니다. (modelworker에서 사용)
@@ -54,19 +83,76 @@ def get_blob_bytes(blob_name: str, container_name: str) -> bytes:
     stream = blob_client.download_blob()
     return stream.readall()
 
-def get_blob_base64_image(blob_dir, file_name):
-    try:
-        blob_path = f"{blob_dir}/{file_name}.png"
-        blob_client = container_client.get_blob_client(blob=blob_path)
+# 6. 참조 이미지를 GPT vision 입력용 base64 로 준비합니다. (modelworker에서 사용)
+REFERENCE_IMAGE_DIR = "img"
+REFERENCE_IMAGE_MAX_EDGE = int(os.getenv("REFERENCE_IMAGE_MAX_EDGE", "0"))  # 0 이면 원본 크기 유지
+REFERENCE_IMAGE_CACHE_DIR = os.getenv("REFERENCE_IMAGE_CACHE_DIR", "/tmp/k-animator-ref-cache")
+REFERENCE_IMAGE_CACHE_MAX_MB = int(os.getenv("REFERENCE_IMAGE_CACHE_MAX_MB", "256"))
+
+_reference_cache = None
+
+def _get_reference_cache():
+    global _reference_cache
+    if _reference_cache is None and REFERENCE_IMAGE_CACHE_MAX_MB > 0:
+        _reference_cache = DiskLRUCache(REFERENCE_IMAGE_CACHE_DIR, REFERENCE_IMAGE_CACHE_MAX_MB * 1024 * 1024)
+    return _reference_cache
 
+def _stream_base64(chunks) -> bytes:
+    """다운로드 청크를 3바이트 경계에 맞춰 이어서 base64 인코딩합니다. (전체 원본을 한 번 더 복사하지 않음)"""
+    encoded = []
+    remainder = b""
+    for chunk in chunks:
+        chunk = remainder + chunk
+        cut = len(chunk) - len(chunk) % 3
+        encoded.append(base64.b64encode(chunk[:cut]))
+        remainder = chunk[cut:]
+    encoded.append(base64.b64encode(remainder))
+    return b"".join(encoded)
+
+def _downscale_png(img_bytes: bytes, max_long_edge: int) -> bytes | None:
+    """긴 변이 max_long_edge 보다 크면 축소한 PNG 를 반환하고, 아니면 None 을 반환합니다."""
+    image = Image.open(BytesIO(img_bytes))  # 헤더만 읽음 (픽셀 디코딩은 필요할 때만)
+    if max(image.size) <= max_long_edge:
+        return None
+    image.thumbnail((max_long_edge, max_long_edge), Image.LANCZOS)
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+def get_reference_image_base64(file_name: str, blob_dir: str = REFERENCE_IMAGE_DIR,
+                               max_long_edge: int = REFERENCE_IMAGE_MAX_EDGE,
+                               container_name: str = AZURE_CONTAINER_NAME) -> str | None:
+    """
+    참조 이미지(PNG)를 base64 문자열로 반환합니다.
+    저장된 바이트를 PIL 재인코딩 없이 그대로 base64 로 스트리밍하고, max_long_edge 가 있으면 그보다 클 때만 축소합니다.
+    결과는 file_name 별로 디스크 LRU 캐시에 보관합니다.
+    """
+    cache = _get_reference_cache()
+    cache_key = f"{container_name}/{blob_dir}/{file_name}:{max_long_edge}"
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached.decode("ascii")
+
+    try:
+        if not blob_service_client:
+            raise ConnectionError("Blob service client is not initialized.")
+        blob_client = blob_service_client.get_blob_client(container=container_name, blob=f"{blob_dir}/{file_name}.png")
         stream = blob_client.download_blob()
-        img_bytes = stream.readall()
 
-        image = Image.open(BytesIO(img_bytes))
-        buffered = BytesIO()
-        image.save(buffered, format="PNG")
-        
-        return base64.b64encode(buffered.getvalue()).decode("utf-8")
+        if max_long_edge > 0:
+            img_bytes = stream.readall()
+            resized = _downscale_png(img_bytes, max_long_edge)
+            encoded = base64.b64encode(resized if resized is not None else img_bytes)
+        else:
+            encoded = _stream_base64(stream.chunks())
     except Exception as e:
         logging.info(f"[ERROR] Blob 이미지 로딩 실패 - {file_name}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+    if cache:
+        cache.put(cache_key, encoded)
+    return encoded.decode("ascii")
+
+def get_blob_base64_image(blob_dir, file_name):
+    return get_reference_image_base64(file_name, blob_dir=blob_dir)
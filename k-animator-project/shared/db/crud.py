@@ -1,4 +1,6 @@
+from sqlalchemy import select, or_
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models
 
 # username으로 사용자 조회
@@ -9,6 +11,21 @@ def get_email(db: Session, email: str):
     return db.query(models.User).filter(
     models.User.email == email).first()
 
+# 회원가입 중복 확인: username / email 을 한 번의 쿼리로 확인 → (username 사용 중, email 사용 중)
+def find_user_conflicts(db: Session, username: str | None, email: str | None) -> tuple[bool, bool]:
+    conditions = []
+    if username:
+        conditions.append(models.User.username == username)
+    if email:
+        conditions.append(models.User.email == email)
+    if not conditions:
+        return False, False
+    rows = db.execute(
+        select(models.User.username, models.User.email).where(or_(*conditions)).limit(2)
+    ).all()
+    return (any(row.username == username for row in rows if username),
+            any(row.email == email for row in rows if email))
+
 def get_id(db: Session, user_id: str):
     return db.query(models.User).filter(
     models.User.id == user_id).first()
@@ -17,3 +34,9 @@ def get_id(db: Session, user_id: str):
 def get_images_by_user(db: Session, user_id: str):
     return db.query(models.Image).filter(
     models.Image.user_id == user_id).order_by(models.Image.created_at.desc()).all()
+
+
+# --- 비동기 조회 (database.get_async_db 세션용) ---
+async def get_id_async(db: AsyncSession, user_id: str):
+    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    return result.scalars().first()
@@ -1,61 +1,111 @@
 from dotenv import load_dotenv
 import os
 import logging
+import threading
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from azure.keyvault.secrets import SecretClient
-from azure.identity import DefaultAzureCredential
 
+from shared import keyvault
 from shared.db.models import Base
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 load_dotenv()
-SQLALCHEMY_DATABASE_URL = None # DB 연결 문자열 초기화
-try:
-    logger.info("DB 연결을 위해 key vault에서 시크릿 조회 시작")
-    # Azure Key Vault에서 DB 비밀번호 및 호스트 이름 검색
-    key_vault_name = os.getenv("KEY_VAULT_NAME")
-    db_password_secret_name = os.getenv("DB_PASSWORD_SECRET_NAME")
-    db_host_secret_name = os.getenv("DB_HOST_SECRET_NAME")
-
-    if not all([key_vault_name, db_password_secret_name, db_host_secret_name]):
-        raise ValueError("KEY_VAULT_NAME, DB_PASSWORD_SECRET_NAME, DB_HOST_SECRET_NAME 환경 변수가 설정되지 않았음.")
 
-    kv_uri = f"https://{key_vault_name}.vault.azure.net"
+# DB 접속 정보와 엔진은 import 시점이 아니라 처음 사용할 때 만듭니다. (시크릿은 shared/keyvault 에서 한 번에 조회)
+SQLALCHEMY_DATABASE_URL = None # DB 연결 문자열 초기화
+_engine = None
+_SessionLocal = None
+_engine_lock = threading.Lock()
 
-    # workload identity를 사용하여 Azure Key Vault에 인증
-    credential = DefaultAzureCredential()
-    client = SecretClient(vault_url=kv_uri, credential=credential)
+def get_database_url() -> str:
+    global SQLALCHEMY_DATABASE_URL
+    if SQLALCHEMY_DATABASE_URL is None:
+        try:
+            db_host = keyvault.get("DB_HOST_SECRET_NAME")
+            db_password = keyvault.get("DB_PASSWORD_SECRET_NAME")
+        except keyvault.SecretUnavailable as e:
+            logger.error(f"Azure Key Vault 연동 또는 DB 연결 문자열 생성 중 오류 발생: {e}")
+            raise Exception("데이터베이스 URL이 설정되지 않았습니다. 서버 로그를 확인.")
 
-    # Key Vault에서 DB 접속 정보 가져오기
-    logger.info(f"'{db_host_secret_name}' 시크릿 조회 중")
-    db_host = client.get_secret(db_host_secret_name).value
+        db_user ="psqladmin"
+        db_name = "authdb"
 
-    logger.info(f"'{db_password_secret_name}' 시크릿 조회 중")
-    db_password = client.get_secret(db_password_secret_name).value
+        # SQLAlchemy 연결 문자열 생성 -> DB를 찾아가기 위해 필요한 정보 담아 문자열로 생성
+        SQLALCHEMY_DATABASE_URL = f"postgresql://{db_user}:{db_password}@{db_host}/{db_name}"
+        logger.info("DB 연결 문자열 생성 완료")
+    return SQLALCHEMY_DATABASE_URL
 
-    db_user ="psqladmin"
-    db_name = "authdb"
+# DB 엔진 및 세션 생성
+def get_engine():
+    global _engine, _SessionLocal
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(get_database_url())
+                _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+    return _engine
 
-    # SQLAlchemy 연결 문자열 생성 -> DB를 찾아가기 위해 필요한 정보 담아 문자열로 생성
-    SQLALCHEMY_DATABASE_URL = f"postgresql://{db_user}:{db_password}@{db_host}/{db_name}"
-    logger.info("DB 연결 문자열 생성 완료")
-    logger.info("Azure Key Vault에서 DB 접속 정보 검색 완료")
+def SessionLocal():
+    """기존 sessionmaker 와 같은 사용법 (SessionLocal() 로 세션 생성)"""
+    get_engine()
+    return _SessionLocal()
 
-except Exception as e:
-    logger.error(f"Azure Key Vault 연동 또는 DB 연결 문자열 생성 중 오류 발생: {e}")
-    
-# DB 엔진 및 세션 생성
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def __getattr__(name):
+    # database.engine 으로 접근하던 코드 호환
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(name)
 
 def get_db():
-    if SQLALCHEMY_DATABASE_URL is None:
-        raise Exception("데이터베이스 URL이 설정되지 않았습니다. 서버 로그를 확인.")
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+
+
+# --- 비동기 DB (async FastAPI 엔드포인트용) ---
+# 이벤트 루프를 막지 않도록 asyncpg 드라이버 + 커넥션 풀을 사용합니다. 처음 사용할 때 엔진을 만듭니다.
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "10"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+ASYNC_DB_POOL_TIMEOUT = float(os.getenv("ASYNC_DB_POOL_TIMEOUT", "5"))
+ASYNC_DB_POOL_RECYCLE = int(os.getenv("ASYNC_DB_POOL_RECYCLE", "1800"))
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+                async_url = get_database_url().replace("postgresql://", "postgresql+asyncpg://", 1)
+                engine = create_async_engine(
+                    async_url,
+                    pool_size=ASYNC_DB_POOL_SIZE,
+                    max_overflow=ASYNC_DB_MAX_OVERFLOW,
+                    pool_timeout=ASYNC_DB_POOL_TIMEOUT,
+                    pool_recycle=ASYNC_DB_POOL_RECYCLE,
+                    pool_pre_ping=True,
+                )
+                _AsyncSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+                _async_engine = engine
+    return _async_engine
+
+async def get_async_db():
+    if _async_engine is None:
+        # 처음 한 번은 Key Vault 시크릿 조회(동기)가 필요할 수 있으므로 이벤트 루프를 막지 않도록 스레드풀에서 실행
+        from starlette.concurrency import run_in_threadpool
+
+        await run_in_threadpool(get_async_engine)
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+async def dispose_async_engine():
+    """서버 종료 시 비동기 커넥션 풀 정리"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
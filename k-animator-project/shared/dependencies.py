@@ -1,12 +1,41 @@
+import os
+
 from fastapi import HTTPException, status, Header
 
+from shared import jwt_verifier
+
+# 사용자 확인 방식: gateway(게이트웨이가 검증 후 넘겨주는 X-User-ID 사용, 기본) | local(Access Token 을 이 서비스에서 직접 검증)
+# local 은 ES256 토큰만 검증하므로 auth 서비스를 ACCESS_TOKEN_ALGORITHM=ES256 으로 전환한 뒤에 사용 (auth/core/security.py 참고)
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "gateway")
+
 # API 게이트웨이가 알려주는 사용자 ID를 가져오는 함수
 async def get_user_id_from_gateway(
     x_user_id: str | None = Header(None, alias="X-User-ID"),
+    authorization: str | None = Header(None),
 ) -> str:
+    if AUTH_VERIFY_MODE == "local":
+        return await get_user_id_from_token(authorization)
+
     if x_user_id is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="정상적인 접근 경로가 아닙니다."
         )
-    return x_user_id
\ No newline at end of file
+    return x_user_id
+
+# Authorization: Bearer <Access Token> 을 JWKS 공개키로 직접 검증해 사용자 ID(sub)를 가져오는 함수
+async def get_user_id_from_token(authorization: str | None) -> str:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="자격증을 확인할 수 없습니다.",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if not authorization or not authorization.startswith("Bearer "):
+        raise credentials_exception
+    try:
+        claims = await jwt_verifier.verify_access_token_async(authorization.split(" ", 1)[1])
+    except jwt_verifier.InvalidToken:
+        raise credentials_exception
+    except jwt_verifier.KeysUnavailable:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="토큰 검증 키를 가져올 수 없습니다.")
+    return claims["sub"]
@@ -0,0 +1,126 @@
+# shared/fair_queue.py
+# GPU 작업(SAM2 / 인페인팅 / 레이어 분리)을 사용자별 가상 큐에 넣어 두고, dispatcher 서비스가
+# 사용자 간 가중 라운드로빈으로 Celery 큐에 내보내도록 하는 공용 모듈입니다.
+# (한 사용자가 작업을 많이 넣어도 다른 사용자의 작업이 그 뒤에 줄 서지 않게 함)
+#
+# Redis 키 구조 (lane 별)
+#   fairq:<lane>:user:<identity>  사용자별 대기 작업 리스트 (JSON)
+#   fairq:<lane>:active           대기 작업이 있는 사용자 집합
+#   fairq:<lane>:ring             라운드로빈 순서 (active 사용자가 정확히 한 번씩 들어 있음)
+#   fairq:weights                 사용자별 가중치 (HSET fairq:weights <identity> 2, 기본 1)
+
+import os
+import json
+import time
+import uuid
+import logging
+
+import redis
+
+FAIR_QUEUE_REDIS_URL = os.getenv("FAIR_QUEUE_REDIS_URL", "redis://redis:6379/5")
+FAIR_QUEUE_ENABLED = os.getenv("FAIR_QUEUE_ENABLED", "1") == "1"
+FAIR_QUEUE_PREFIX = "fairq:"
+FAIR_QUEUE_WEIGHTS_KEY = f"{FAIR_QUEUE_PREFIX}weights"
+
+# lane → 작업의 첫 태스크가 들어가는 Celery 큐 (dispatcher 가 이 큐에 쌓인 수로 여유를 판단)
+# lane 마다 전용 큐를 써야 다른 작업(예: celery 큐의 generate_image)이 여유 계산에 섞이지 않음
+LANES = {
+    "gpu": os.getenv("FAIR_QUEUE_GPU_CELERY_QUEUE", "sam2_queue"),      # sam2.segment(sam2_queue) → inpainting.inpaint(inpainting_queue)
+    "layer": os.getenv("FAIR_QUEUE_LAYER_CELERY_QUEUE", "layer_queue"),  # separate_layers_task
+}
+
+# KEYS: 사용자 리스트, active 집합, ring / ARGV: 작업 JSON, identity → 사용자 대기 작업 수
+ENQUEUE_LUA = """
+redis.call('RPUSH', KEYS[1], ARGV[1])
+if redis.call('SADD', KEYS[2], ARGV[2]) == 1 then
+    redis.call('RPUSH', KEYS[3], ARGV[2])
+end
+return redis.call('LLEN', KEYS[1])
+"""
+
+# KEYS: 사용자 리스트, active 집합, ring / ARGV: identity → {작업 JSON 또는 '', 비었는지 여부}
+# 마지막 작업을 꺼내면 active / ring 에서 함께 빼서, 동시에 들어온 enqueue 가 사용자를 다시 등록하도록 함
+POP_LUA = """
+local job = redis.call('LPOP', KEYS[1])
+local drained = 0
+if redis.call('LLEN', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[2], ARGV[1])
+    redis.call('LREM', KEYS[3], 0, ARGV[1])
+    drained = 1
+end
+if not job then
+    return {'', drained}
+end
+return {job, drained}
+"""
+
+# KEYS: 사용자 리스트, active 집합, ring / ARGV: 작업 JSON, identity
+# Celery 전송에 실패한 작업을 사용자 큐 맨 앞에 되돌림 (사용자가 빠져 있었다면 ring 맨 앞에 다시 등록)
+REQUEUE_LUA = """
+redis.call('LPUSH', KEYS[1], ARGV[1])
+if redis.call('SADD', KEYS[2], ARGV[2]) == 1 then
+    redis.call('LPUSH', KEYS[3], ARGV[2])
+end
+return redis.call('LLEN', KEYS[1])
+"""
+
+
+def user_key(lane: str, identity: str) -> str:
+    return f"{FAIR_QUEUE_PREFIX}{lane}:user:{identity}"
+
+
+def active_key(lane: str) -> str:
+    return f"{FAIR_QUEUE_PREFIX}{lane}:active"
+
+
+def ring_key(lane: str) -> str:
+    return f"{FAIR_QUEUE_PREFIX}{lane}:ring"
+
+
+_redis = None
+_enqueue_script = None
+
+
+def _get_enqueue_script():
+    global _redis, _enqueue_script
+    if _enqueue_script is None:
+        import redis.asyncio as aioredis
+        _redis = aioredis.Redis.from_url(FAIR_QUEUE_REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+        _enqueue_script = _redis.register_script(ENQUEUE_LUA)
+    return _enqueue_script
+
+
+async def submit(lane: str, identity: str, signature, task_id: str | None = None) -> tuple[str, int]:
+    """
+    Celery 시그니처(단일 태스크 또는 체인)를 사용자 가상 큐에 넣고 (task_id, 이 사용자의 대기 작업 수) 를 반환합니다.
+    대기 작업 수는 이 사용자 큐의 길이(방금 넣은 작업 포함)이며, 전체 처리 순서에서의 위치는 아닙니다.
+    task_id 는 미리 정해 두므로 dispatcher 가 실제로 내보내기 전에도 /result/{task_id} 로 조회할 수 있습니다(PENDING).
+    체인이면 마지막 태스크의 id 가 task_id 가 됩니다. (task_id 를 넘기면 그 값을 사용)
+    """
+    if lane not in LANES:
+        raise ValueError(f"알 수 없는 lane: {lane}")
+    task_id = task_id or str(uuid.uuid4())
+    tasks = signature.tasks if hasattr(signature, "tasks") else [signature]
+    tasks[-1].set(task_id=task_id)
+
+    if not FAIR_QUEUE_ENABLED:
+        signature.apply_async()
+        return task_id, 0
+
+    job = json.dumps({
+        "task_id": task_id,
+        "identity": identity,
+        "signature": dict(signature),
+        "enqueued_at": time.time(),
+    })
+    try:
+        pending_for_user = await _get_enqueue_script()(
+            keys=[user_key(lane, identity), active_key(lane), ring_key(lane)],
+            args=[job, identity],
+        )
+    except redis.RedisError as e:
+        # 공정 큐를 쓸 수 없으면 기존처럼 바로 Celery 로 보냄
+        logging.info(f"[FAIR QUEUE] Redis 오류로 바로 전송 - {lane}/{identity}: {e}")
+        signature.apply_async()
+        return task_id, 0
+    return task_id, int(pending_for_user)
@@ -0,0 +1,100 @@
+# shared/idempotency.py
+# 작업 제출 API(/generate-prompt, /generate-image, /separate-layers)의 중복 요청을 막습니다.
+# 더블클릭 / 클라이언트 재시도로 같은 요청이 두 번 들어와도 Celery 작업은 한 번만 만들고, 두 번째 요청에는 기존 task_id 를 돌려줍니다.
+#
+# - Idempotency-Key 헤더가 있으면 그 키 기준 (IDEMPOTENCY_KEY_TTL_S 동안 유지)
+# - 없으면 사용자 + 요청 본문 해시 기준 (IDEMPOTENCY_WINDOW_S 짧은 구간만, 의도적인 재생성은 구간이 지나면 허용)
+# task_id 를 먼저 만들어 SET NX 로 선점하므로, 동시에 들어온 같은 요청도 하나만 제출됩니다.
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+
+import redis
+from fastapi import HTTPException, status
+
+IDEMPOTENCY_REDIS_URL = os.getenv("IDEMPOTENCY_REDIS_URL", "redis://redis:6379/4")
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "1") == "1"
+IDEMPOTENCY_WINDOW_S = int(os.getenv("IDEMPOTENCY_WINDOW_S", "10"))
+IDEMPOTENCY_KEY_TTL_S = int(os.getenv("IDEMPOTENCY_KEY_TTL_S", "86400"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_KEY_PREFIX = "idem:"
+
+# 제출에 실패하면 내가 선점한 키만 지워 재시도가 가능하게 함
+RELEASE_LUA = """
+local current = redis.call('GET', KEYS[1])
+if current and cjson.decode(current)['task_id'] == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_redis = None
+_release_script = None
+
+
+def _get_redis():
+    global _redis, _release_script
+    if _redis is None:
+        import redis.asyncio as aioredis
+        _redis = aioredis.Redis.from_url(IDEMPOTENCY_REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.5)
+        _release_script = _redis.register_script(RELEASE_LUA)
+    return _redis
+
+
+def fingerprint(payload: dict) -> str:
+    """요청 본문의 해시 (키 순서와 무관)"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+async def submit_once(scope: str, identity: str, payload: dict, idempotency_key: str | None, submit) -> dict:
+    """
+    같은 요청이 이미 제출되었으면 {"task_id": 기존 id, "deduplicated": True} 를, 아니면 submit(task_id) 의 응답을 반환합니다.
+    submit 은 미리 정한 task_id 로 작업을 제출하고 응답 dict 를 돌려주는 async 함수입니다.
+    같은 Idempotency-Key 를 다른 본문으로 다시 쓰면 422 를 반환합니다. Redis 장애 시에는 중복 확인 없이 제출합니다.
+    """
+    task_id = str(uuid.uuid4())
+    if not IDEMPOTENCY_ENABLED:
+        return await submit(task_id)
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Idempotency-Key 는 1~{IDEMPOTENCY_KEY_MAX_LENGTH}자여야 합니다.")
+
+    body_hash = fingerprint(payload)
+    if idempotency_key:
+        key = f"{IDEMPOTENCY_KEY_PREFIX}{scope}:{identity}:key:{idempotency_key}"
+        ttl = IDEMPOTENCY_KEY_TTL_S
+    else:
+        key = f"{IDEMPOTENCY_KEY_PREFIX}{scope}:{identity}:body:{body_hash}"
+        ttl = IDEMPOTENCY_WINDOW_S
+
+    claimed = False
+    try:
+        r = _get_redis()
+        claimed = await r.set(key, json.dumps({"task_id": task_id, "fingerprint": body_hash}), nx=True, ex=ttl)
+        if not claimed:
+            existing = await r.get(key)
+            if existing:
+                existing = json.loads(existing)
+                if existing["fingerprint"] != body_hash:
+                    raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                        detail="같은 Idempotency-Key 로 다른 요청을 보낼 수 없습니다.")
+                logging.info(f"[IDEMPOTENCY] 중복 요청 - {scope}/{identity}, 기존 task_id: {existing['task_id']}")
+                return {"task_id": existing["task_id"], "deduplicated": True}
+            # 그 사이 만료된 경우에는 새 요청으로 처리
+    except redis.RedisError as e:
+        logging.info(f"[IDEMPOTENCY] Redis 오류로 중복 확인 생략 - {scope}/{identity}: {e}")
+        claimed = False
+
+    try:
+        return await submit(task_id)
+    except Exception:
+        if claimed:
+            try:
+                await _release_script(keys=[key], args=[task_id])
+            except redis.RedisError as e:
+                logging.info(f"[IDEMPOTENCY] 선점 키 삭제 실패 - {key}: {e}")
+        raise
@@ -0,0 +1,40 @@
+# shared/image_bytes.py
+
+import struct
+from io import BytesIO
+
+from PIL import Image
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def sniff_png(data: bytes) -> tuple[int, int]:
+    """
+    PNG 시그니처와 IHDR 청크만 확인해 (width, height)를 반환합니다. 픽셀은 디코딩하지 않습니다.
+    PNG 가 아니면 ValueError 를 발생시킵니다.
+    """
+    if len(data) < 33 or not data.startswith(PNG_SIGNATURE):
+        raise ValueError("PNG 데이터가 아닙니다.")
+    length, chunk_type, width, height = struct.unpack(">I4sII", data[8:24])
+    if chunk_type != b"IHDR" or length != 13 or width == 0 or height == 0:
+        raise ValueError("PNG IHDR 헤더가 올바르지 않습니다.")
+    return width, height
+
+
+class LazyImage:
+    """
+    인코딩된 이미지 바이트를 그대로 들고 있다가, 픽셀이 필요할 때(.image) 한 번만 PIL 로 디코딩합니다.
+    원본 업로드처럼 바이트만 필요한 경로에서는 디코딩/재인코딩 비용이 들지 않습니다.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.size = sniff_png(data)
+        self._image = None
+
+    @property
+    def image(self) -> Image.Image:
+        if self._image is None:
+            self._image = Image.open(BytesIO(self.data))
+            self._image.load()
+        return self._image
@@ -0,0 +1,97 @@
+# shared/image_pipeline.py
+# generate_image 를 단계별 태스크 체인(embed → retrieve → prompt → render → publish)으로 나눠 실행할 때
+# modelapi(체인 생성)와 modelworker(단계 실행)가 함께 쓰는 큐/태스크 이름과 중간 결과 보관소입니다.
+
+import os
+import time
+import uuid
+
+import redis
+
+# 단계별 큐: CPU 임베딩은 작은 prefork 풀, OpenAI 호출/검색은 동시성 높은 스레드 풀, 업로드는 별도 풀
+EMBED_QUEUE = os.getenv("PIPELINE_EMBED_QUEUE", "embed_queue")
+IO_QUEUE = os.getenv("PIPELINE_IO_QUEUE", "io_queue")
+PUBLISH_QUEUE = os.getenv("PIPELINE_PUBLISH_QUEUE", "publish_queue")
+
+STAGES = [
+    ("generate_image.embed", EMBED_QUEUE),
+    ("generate_image.retrieve", IO_QUEUE),
+    ("generate_image.prompt", IO_QUEUE),
+    ("generate_image.render", IO_QUEUE),
+    ("generate_image.publish", PUBLISH_QUEUE),
+]
+FAILED_TASK = "generate_image.failed"
+TASK_ROUTES = {name: {"queue": queue} for name, queue in STAGES}
+
+# 단계 사이에 넘기기엔 큰 데이터(참조 이미지 base64, 생성 PNG)는 브로커 대신 Redis 에 잠시 보관하고 키만 넘김
+PIPELINE_REDIS_URL = os.getenv("PIPELINE_REDIS_URL", "redis://redis:6379/2")
+PIPELINE_STASH_TTL_SECONDS = int(os.getenv("PIPELINE_STASH_TTL_SECONDS", "3600"))
+STASH_KEY_PREFIX = "pipeline:"
+
+_redis = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(PIPELINE_REDIS_URL, socket_timeout=5, socket_connect_timeout=2)
+    return _redis
+
+
+def new_context(user_id: int, username: str, category: str, layer: str, tag: str,
+                caption_input: str | None = None, image_url: str | None = None,
+                tracking_id: str | None = None) -> dict:
+    """체인 전체를 따라 전달되는 작업 정보. tracking_id 는 마지막(publish) 태스크의 id 와 같습니다."""
+    return {
+        "tracking_id": tracking_id or str(uuid.uuid4()),
+        "user_id": user_id,
+        "username": username,
+        "category": category,
+        "layer": layer,
+        "tag": tag,
+        "caption_input": caption_input,
+        "image_url": image_url,
+        "created_at": time.time(),
+        "timings": {},
+    }
+
+
+def build_chain(celery_app, ctx: dict):
+    """
+    ctx 로 시작하는 단계 체인을 만듭니다. 마지막 태스크 id 를 tracking_id 로 고정해
+    /result/{task_id} 가 체인 전체의 결과를 그대로 조회할 수 있게 합니다.
+    어느 단계에서든 실패하면 Celery 가 남은 단계(tracking_id 포함)를 실패로 기록하고, FAILED_TASK 가 보관 데이터를 정리합니다.
+    """
+    errback = celery_app.signature(FAILED_TASK, args=[ctx["tracking_id"]])
+    signatures = []
+    for index, (name, queue) in enumerate(STAGES):
+        sig = celery_app.signature(name, args=[ctx] if index == 0 else [], queue=queue)
+        sig.link_error(errback)
+        signatures.append(sig)
+    signatures[-1].set(task_id=ctx["tracking_id"])
+    workflow = signatures[0]
+    for sig in signatures[1:]:
+        workflow = workflow | sig
+    return workflow
+
+
+def stash(tracking_id: str, name: str, data: bytes) -> str:
+    key = f"{STASH_KEY_PREFIX}{tracking_id}:{name}"
+    _get_redis().set(key, data, ex=PIPELINE_STASH_TTL_SECONDS)
+    return key
+
+
+def unstash(key: str) -> bytes:
+    data = _get_redis().get(key)
+    if data is None:
+        raise LookupError(f"파이프라인 중간 결과가 만료되었거나 없습니다: {key}")
+    return data
+
+
+def discard(*keys: str):
+    keys = [key for key in keys if key]
+    if keys:
+        try:
+            _get_redis().delete(*keys)
+        except redis.RedisError:
+            pass  # TTL 로 자동 삭제됨
@@ -0,0 +1,151 @@
+# shared/jwt_verifier.py
+# auth 서비스가 ES256 으로 서명한 Access Token 을 각 서비스에서 직접 검증합니다. (auth 서비스 호출 없음)
+# - 공개키: auth 서비스의 JWKS(JWKS_URL)를 받아 kid 별로 파싱해 두고 JWKS_TTL_S 마다 갱신
+#           처음 보는 kid 가 오면(키 교체 직후) 바로 다시 받되, JWKS_MIN_REFRESH_INTERVAL_S 보다 자주 받지는 않음
+# - 검증 결과: 토큰 문자열 → claims 를 LRU 로 캐시해, 같은 토큰의 반복 요청은 서명 검증 없이 만료 시간만 확인
+
+import os
+import json
+import time
+import logging
+import threading
+import urllib.request
+from collections import OrderedDict
+
+import jwt
+from starlette.concurrency import run_in_threadpool
+
+JWKS_URL = os.getenv("JWKS_URL", "http://auth-service/api/auth/.well-known/jwks.json")
+JWKS_TTL_S = float(os.getenv("JWKS_TTL_S", "600"))
+JWKS_MIN_REFRESH_INTERVAL_S = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL_S", "30"))
+JWT_TOKEN_CACHE_SIZE = int(os.getenv("JWT_TOKEN_CACHE_SIZE", "10000"))
+JWT_ISSUER = "k-animator-auth-service"
+JWT_AUDIENCE = "k-animator-api"
+JWT_ALGORITHMS = ["ES256", "EdDSA"]  # 비대칭 알고리즘만 허용 (HS256 / none 거부)
+JWT_LEEWAY_S = 5
+
+
+class InvalidToken(Exception):
+    """서명 / 만료 / 발급자 / 대상 / 종류 중 하나라도 맞지 않는 토큰"""
+
+
+class KeysUnavailable(Exception):
+    """JWKS 를 한 번도 받지 못해 검증할 수 없는 상태 (auth 서비스 장애 등)"""
+
+
+def _fetch_jwks() -> dict:
+    with urllib.request.urlopen(JWKS_URL, timeout=2) as response:
+        return json.loads(response.read())
+
+
+_loader = _fetch_jwks
+_keys = {}
+_keys_loaded_at = 0.0
+_last_fetch_at = 0.0
+_keys_lock = threading.Lock()
+
+_tokens = OrderedDict()
+_tokens_lock = threading.Lock()
+
+
+def configure(loader) -> None:
+    """JWKS 를 가져오는 함수를 바꿉니다. (auth 서비스는 HTTP 대신 자기 키 목록을 바로 넘김)"""
+    global _loader, _keys, _keys_loaded_at, _last_fetch_at
+    with _keys_lock:
+        _loader = loader
+        _keys, _keys_loaded_at, _last_fetch_at = {}, 0.0, 0.0
+    with _tokens_lock:
+        _tokens.clear()
+
+
+def _keys_fresh() -> bool:
+    return bool(_keys) and time.monotonic() - _keys_loaded_at < JWKS_TTL_S
+
+
+def _refresh_keys(force: bool) -> None:
+    global _keys, _keys_loaded_at, _last_fetch_at
+    with _keys_lock:
+        now = time.monotonic()
+        if not force and _keys_fresh():
+            return
+        if _keys and now - _last_fetch_at < JWKS_MIN_REFRESH_INTERVAL_S:
+            return
+        _last_fetch_at = now
+        try:
+            jwks = _loader()
+            _keys = {entry["kid"]: jwt.PyJWK(entry) for entry in jwks["keys"]}
+            _keys_loaded_at = now
+            logging.info(f"[JWT] JWKS 갱신 - kid: {list(_keys)}")
+        except Exception as e:
+            # 이미 받아 둔 키가 있으면 계속 사용
+            logging.error(f"[JWT] JWKS 갱신 실패: {e}")
+            if not _keys:
+                raise KeysUnavailable(str(e))
+
+
+def _get_key(kid: str | None) -> jwt.PyJWK:
+    _refresh_keys(force=False)
+    key = _keys.get(kid)
+    if key is None:
+        _refresh_keys(force=True)  # 키 교체 직후일 수 있음
+        key = _keys.get(kid)
+    if key is None:
+        raise InvalidToken(f"알 수 없는 kid: {kid}")
+    return key
+
+
+def _cached(token: str) -> dict | None:
+    entry = _tokens.get(token)
+    if entry is None:
+        return None
+    claims, expires_at = entry
+    if expires_at <= time.time():
+        return None
+    with _tokens_lock:
+        if token in _tokens:
+            _tokens.move_to_end(token)
+    return claims
+
+
+def verify_access_token(token: str) -> dict:
+    """Access Token 을 검증하고 claims 를 반환합니다. 잘못된 토큰은 InvalidToken, 키를 받을 수 없으면 KeysUnavailable."""
+    claims = _cached(token)
+    if claims is not None:
+        return claims
+
+    try:
+        header = jwt.get_unverified_header(token)
+        key = _get_key(header.get("kid"))
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=[key.algorithm_name] if key.algorithm_name in JWT_ALGORITHMS else [],
+            audience=JWT_AUDIENCE,
+            issuer=JWT_ISSUER,
+            leeway=JWT_LEEWAY_S,
+            options={"require": ["exp", "sub", "iss", "aud"]},
+        )
+    except jwt.PyJWTError as e:
+        raise InvalidToken(str(e))
+    if claims.get("type") != "access":
+        raise InvalidToken("Access Token 이 아닙니다.")
+
+    with _tokens_lock:
+        _tokens[token] = (claims, claims["exp"])
+        if len(_tokens) > JWT_TOKEN_CACHE_SIZE:
+            _tokens.popitem(last=False)
+    return claims
+
+
+async def verify_access_token_async(token: str) -> dict:
+    """async 엔드포인트용. 캐시 적중이나 키가 준비된 경우는 바로 검증하고, JWKS 를 받아야 할 때만 스레드풀에서 실행합니다."""
+    claims = _cached(token)
+    if claims is not None:
+        return claims
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+    except jwt.PyJWTError as e:
+        raise InvalidToken(str(e))
+    if _keys_fresh() and kid in _keys:
+        return verify_access_token(token)
+    return await run_in_threadpool(verify_access_token, token)
@@ -0,0 +1,156 @@
+# shared/keyvault.py
+# Azure Key Vault 시크릿을 서비스 전체에서 한 번에 가져와 캐시하는 공용 모듈입니다.
+# (DB / Redis / JWT 모듈이 각자 import 시점에 Credential 을 만들고 시크릿을 하나씩 조회하던 것을 대체)
+#
+# - 처음 필요할 때 설정된 시크릿(SECRET_NAME_ENVS)을 동시에 모두 가져오고, SECRETS_CACHE_TTL_S 동안 메모리에 보관
+# - SECRETS_CACHE_PATH 를 설정하면 파일에도 저장해, 컨테이너가 재시작되어도 TTL 안에서는 Key Vault 를 다시 조회하지 않음
+#   (Pod 의 emptyDir(medium: Memory) 경로 권장, 권한 0600)
+# - Key Vault 조회가 실패하면 만료된 캐시라도 있으면 그 값을 사용 (Key Vault 지연으로 인한 crash loop 방지)
+
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+KEY_VAULT_NAME = os.getenv("KEY_VAULT_NAME")
+SECRETS_CACHE_TTL_S = float(os.getenv("SECRETS_CACHE_TTL_S", "3600"))
+SECRETS_CACHE_PATH = os.getenv("SECRETS_CACHE_PATH")
+SECRETS_FETCH_TIMEOUT_S = float(os.getenv("SECRETS_FETCH_TIMEOUT_S", "10"))
+SECRETS_RETRY_INTERVAL_S = 5
+
+# 시크릿 이름을 담은 환경변수 목록. 설정된 것만 한 번에 가져옴
+SECRET_NAME_ENVS = (
+    "DB_HOST_SECRET_NAME",
+    "DB_PASSWORD_SECRET_NAME",
+    "REDIS_HOST_SECRET_NAME",
+    "REDIS_PASSWORD_SECRET_NAME",
+    "JWT_SECRET_NAME",
+    "JWT_SIGNING_KEYS_SECRET_NAME",
+)
+
+
+class SecretUnavailable(Exception):
+    """환경 변수가 없거나 Key Vault / 캐시 어디에서도 시크릿을 가져오지 못한 경우"""
+
+
+_values = {}          # 시크릿 이름 → 값
+_loaded_at = 0.0      # 모든 시크릿을 가져온 시각 (time.time)
+_last_attempt = 0.0
+_lock = threading.Lock()
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        from azure.keyvault.secrets import SecretClient
+        from azure.identity import DefaultAzureCredential
+
+        # workload identity를 사용하여 Azure Key Vault에 인증 (프로세스당 한 번)
+        _client = SecretClient(vault_url=f"https://{KEY_VAULT_NAME}.vault.azure.net", credential=DefaultAzureCredential())
+    return _client
+
+
+def _configured_names() -> list:
+    return sorted({os.getenv(env) for env in SECRET_NAME_ENVS if os.getenv(env)})
+
+
+def _read_file_cache() -> tuple[dict, float]:
+    if not SECRETS_CACHE_PATH:
+        return {}, 0.0
+    try:
+        with open(SECRETS_CACHE_PATH, encoding="utf-8") as f:
+            cached = json.load(f)
+        return cached["values"], float(cached["fetched_at"])
+    except FileNotFoundError:
+        return {}, 0.0
+    except Exception as e:
+        logger.warning(f"시크릿 캐시 파일을 읽지 못함: {e}")
+        return {}, 0.0
+
+
+def _write_file_cache(values: dict, fetched_at: float):
+    if not SECRETS_CACHE_PATH:
+        return
+    tmp_path = f"{SECRETS_CACHE_PATH}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": fetched_at, "values": values}, f)
+        os.replace(tmp_path, SECRETS_CACHE_PATH)
+    except Exception as e:
+        logger.warning(f"시크릿 캐시 파일을 저장하지 못함: {e}")
+
+
+def _fetch(names: list) -> dict:
+    """Key Vault 에서 시크릿들을 동시에 가져옵니다. 실패한 시크릿은 결과에서 빠집니다."""
+    client = _get_client()
+    fetched = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, len(names)), thread_name_prefix="keyvault")
+    futures = {executor.submit(client.get_secret, name): name for name in names}
+    done, not_done = wait(futures, timeout=SECRETS_FETCH_TIMEOUT_S)
+    for future in done:
+        name = futures[future]
+        try:
+            fetched[name] = future.result().value
+        except Exception as e:
+            logger.error(f"'{name}' 시크릿 조회 실패: {e}")
+    for future in not_done:
+        logger.error(f"'{futures[future]}' 시크릿 조회 시간 초과 ({SECRETS_FETCH_TIMEOUT_S}s)")
+    executor.shutdown(wait=False, cancel_futures=True)
+    return fetched
+
+
+def load(force: bool = False) -> None:
+    """설정된 시크릿을 모두 (메모리 캐시 → 파일 캐시 → Key Vault 순서로) 불러옵니다."""
+    global _values, _loaded_at, _last_attempt
+    names = _configured_names()
+    with _lock:
+        now = time.time()
+        if not force and _values and now - _loaded_at < SECRETS_CACHE_TTL_S:
+            return
+        if not force:
+            cached, fetched_at = _read_file_cache()
+            if cached and now - fetched_at < SECRETS_CACHE_TTL_S and all(name in cached for name in names):
+                _values, _loaded_at = cached, fetched_at
+                logger.info(f"시크릿 캐시 파일 사용 - {len(cached)}개")
+                return
+        if now - _last_attempt < SECRETS_RETRY_INTERVAL_S and not force:
+            return
+        _last_attempt = now
+        if not KEY_VAULT_NAME:
+            logger.warning("KEY_VAULT_NAME 환경 변수가 설정되지 않았음.")
+            return
+
+        started = time.perf_counter()
+        fetched = _fetch(names)
+        logger.info(f"Azure Key Vault 에서 시크릿 {len(fetched)}/{len(names)}개 조회 완료 ({(time.perf_counter() - started) * 1000:.0f}ms)")
+        if len(fetched) == len(names):
+            _values, _loaded_at = fetched, now
+            _write_file_cache(fetched, now)
+            return
+
+        # 일부 실패: 가져온 값은 반영하고, 나머지는 만료된 캐시라도 사용 (다음 조회 때 다시 시도)
+        stale, _ = _read_file_cache()
+        _values = {**stale, **_values, **fetched}
+
+
+def get(secret_name_env: str) -> str:
+    """시크릿 이름을 담은 환경변수(예: "DB_PASSWORD_SECRET_NAME")로 시크릿 값을 가져옵니다."""
+    name = os.getenv(secret_name_env)
+    if not name:
+        raise SecretUnavailable(f"{secret_name_env} 환경 변수가 설정되지 않았음.")
+    load()
+    value = _values.get(name)
+    if value is None:
+        raise SecretUnavailable(f"'{name}' 시크릿을 가져오지 못했음.")
+    return value
+
+
+def prefetch_in_background() -> None:
+    """서버 시작 시 호출해, 첫 요청 전에 시크릿을 미리 받아 둡니다. (시작 자체는 기다리지 않음)"""
+    threading.Thread(target=load, daemon=True, name="keyvault-prefetch").start()
@@ -0,0 +1,170 @@
+# shared/psd_writer.py
+
+import struct
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+# PSD 색상 모드 / 압축 방식 상수
+PSD_COLOR_MODE_GRAYSCALE = 1
+PSD_COLOR_MODE_RGB = 3
+PSD_COMPRESSION_RLE = 1
+PACKBITS_BLOCK_ROWS = 64
+
+
+def packbits_rows(plane: np.ndarray) -> tuple[bytes, np.ndarray]:
+    """
+    2차원 uint8 채널의 각 행을 PackBits(RLE)로 압축합니다.
+    반환값은 (모든 행의 압축 데이터를 이어 붙인 바이트, 행별 압축 길이) 입니다.
+    파이썬 루프 없이 NumPy 로 run 을 찾고 출력 버퍼를 채우며, 메모리를 줄이기 위해 행 블록 단위로 처리합니다.
+    """
+    height, width = plane.shape
+    encoded = []
+    row_counts = np.zeros(height, dtype=np.int64)
+    for top in range(0, height, PACKBITS_BLOCK_ROWS):
+        block = np.ascontiguousarray(plane[top:top + PACKBITS_BLOCK_ROWS])
+        data, counts = _packbits_block(block)
+        encoded.append(data)
+        row_counts[top:top + len(block)] = counts
+    return b"".join(encoded), row_counts
+
+
+def _packbits_block(block: np.ndarray) -> tuple[bytes, np.ndarray]:
+    rows, width = block.shape
+    flat = block.reshape(-1)
+    n = flat.size
+    if n == 0:
+        return b"", np.zeros(rows, dtype=np.int64)
+
+    # 1) 같은 값이 이어지는 run 찾기 (행 시작은 항상 새 run)
+    boundary = np.empty(n, dtype=bool)
+    boundary[0] = True
+    boundary[1:] = flat[1:] != flat[:-1]
+    boundary[::width] = True
+    run_starts = np.flatnonzero(boundary).astype(np.int32)
+    run_lengths = np.diff(np.append(run_starts, n)).astype(np.int32)
+    is_repeat = run_lengths >= 3
+
+    # 2) 반복 run 은 그대로, 이어지는 짧은 run 들은 하나의 리터럴 구간으로 합침
+    prev_repeat = np.concatenate(([True], is_repeat[:-1]))
+    span_idx = np.flatnonzero(is_repeat | prev_repeat | (run_starts % width == 0))
+    span_starts = run_starts[span_idx]
+    span_lengths = np.diff(np.append(span_starts, n)).astype(np.int32)
+    span_repeat = is_repeat[span_idx]
+
+    # 3) 구간을 최대 128바이트 조각으로 나눔
+    n_chunks = (span_lengths + 127) // 128
+    chunk_span = np.repeat(np.arange(len(span_starts), dtype=np.int32), n_chunks)
+    k = np.arange(int(n_chunks.sum()), dtype=np.int32) - np.repeat(np.cumsum(n_chunks) - n_chunks, n_chunks)
+    chunk_starts = span_starts[chunk_span] + k * 128
+    chunk_lengths = np.minimum(span_lengths[chunk_span] - k * 128, 128)
+    chunk_repeat = span_repeat[chunk_span]
+
+    # 4) 출력: 반복 조각은 [헤더, 값] 2바이트, 리터럴 조각은 [헤더, 데이터...]
+    out_sizes = np.where(chunk_repeat, 2, chunk_lengths + 1)
+    out_pos = np.cumsum(out_sizes) - out_sizes
+    out = np.empty(int(out_sizes.sum()), dtype=np.uint8)
+    # 반복 헤더 257-len = -(len-1), 남은 1바이트 반복은 길이 1 리터럴(헤더 0)과 같음
+    headers = np.where(chunk_repeat, np.where(chunk_lengths == 1, 0, 257 - chunk_lengths), chunk_lengths - 1)
+    out[out_pos] = headers.astype(np.uint8)
+
+    repeat_idx = np.flatnonzero(chunk_repeat)
+    out[out_pos[repeat_idx] + 1] = flat[chunk_starts[repeat_idx]]
+
+    literal_idx = np.flatnonzero(~chunk_repeat)
+    literal_lengths = chunk_lengths[literal_idx]
+    offsets = np.arange(int(literal_lengths.sum()), dtype=np.int32) - np.repeat(np.cumsum(literal_lengths) - literal_lengths, literal_lengths)
+    out[np.repeat(out_pos[literal_idx] + 1, literal_lengths) + offsets] = flat[np.repeat(chunk_starts[literal_idx], literal_lengths) + offsets]
+
+    row_counts = np.bincount(chunk_starts // width, weights=out_sizes, minlength=rows).astype(np.int64)
+    return out.tobytes(), row_counts
+
+
+def _channels(image: Image.Image) -> tuple[np.ndarray, int]:
+    if image.mode in ("L", "1"):
+        pixels = np.asarray(image.convert("L"))
+        return pixels[np.newaxis, :, :], PSD_COLOR_MODE_GRAYSCALE
+    if image.mode == "LA":
+        image = image.convert("RGBA")
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    pixels = np.asarray(image)
+    return np.ascontiguousarray(pixels.transpose(2, 0, 1)), PSD_COLOR_MODE_RGB
+
+
+def _matte_white(planes: np.ndarray) -> np.ndarray:
+    """합쳐진 이미지용: RGB 를 알파로 흰 배경에 합성합니다. (Photoshop 이 투명 문서의 합쳐진 이미지를 저장하는 방식)"""
+    alpha = planes[3].astype(np.uint32)
+    matted = (planes[:3].astype(np.uint32) * alpha + 255 * (255 - alpha) + 127) // 255
+    return np.concatenate([matted.astype(np.uint8), planes[3:4]])
+
+
+def _layer_info(planes: np.ndarray, name: bytes = b"Layer 1") -> bytes:
+    """RGBA 를 투명도 채널(-1)이 있는 레이어 1개로 기록한 레이어 정보 블록을 만듭니다."""
+    _, height, width = planes.shape
+    channel_ids = (-1, 0, 1, 2)
+    channel_data = []
+    for plane in (planes[3], planes[0], planes[1], planes[2]):
+        data, counts = packbits_rows(plane)
+        channel_data.append(struct.pack(">H", PSD_COMPRESSION_RLE) + counts.astype(">u2").tobytes() + data)
+
+    record = BytesIO()
+    record.write(struct.pack(">iiiiH", 0, 0, height, width, len(channel_ids)))
+    for channel_id, data in zip(channel_ids, channel_data):
+        record.write(struct.pack(">hI", channel_id, len(data)))
+    # 블렌드 모드 normal, 불투명도 255, clipping 0, flags 0, filler
+    record.write(struct.pack(">4s4sBBBx", b"8BIM", b"norm", 255, 0, 0))
+    # 추가 데이터: 레이어 마스크 없음, 블렌딩 범위 없음, 레이어 이름 (Pascal 문자열, 4바이트 단위 패딩)
+    pascal_name = bytes([len(name)]) + name
+    pascal_name += b"\x00" * (-len(pascal_name) % 4)
+    extra = struct.pack(">II", 0, 0) + pascal_name
+    record.write(struct.pack(">I", len(extra)) + extra)
+
+    # 레이어 수가 음수면 합쳐진 이미지의 첫 번째 추가 채널이 투명도임을 뜻함
+    info = struct.pack(">h", -1) + record.getvalue() + b"".join(channel_data)
+    info += b"\x00" * (len(info) % 2)
+    return struct.pack(">I", len(info)) + info
+
+
+def encode_psd(image: Image.Image) -> bytes:
+    """
+    PIL 이미지를 PSD 로 인코딩합니다.
+    채널 데이터는 Photoshop 과 같은 행 단위 PackBits(RLE)로 압축하고, 임시 파일 없이 메모리에서 처리합니다.
+    불투명 이미지는 레이어 없이 합쳐진 이미지(Background)만 저장하고,
+    RGBA 이미지는 투명도가 있는 레이어 1개와 흰 배경에 합성한 합쳐진 이미지(+투명도 채널)를 저장합니다.
+    """
+    planes, color_mode = _channels(image)
+    channels, height, width = planes.shape
+    if width > 30000 or height > 30000:
+        raise ValueError("PSD(버전 1)는 가로/세로 30000px 이하만 지원합니다.")
+
+    layer_and_mask = b""
+    if channels == 4:
+        layer_and_mask = _layer_info(planes) + struct.pack(">I", 0)  # 레이어 정보 + 전역 레이어 마스크 없음
+        planes = _matte_white(planes)
+
+    encoded = []
+    row_counts = []
+    for plane in planes:
+        data, counts = packbits_rows(plane)
+        encoded.append(data)
+        row_counts.append(counts)
+
+    buffer = BytesIO()
+    # 헤더: 시그니처, 버전 1, 예약 6바이트, 채널 수, 높이, 너비, 비트 깊이, 색상 모드
+    buffer.write(struct.pack(">4sH6xHIIHH", b"8BPS", 1, channels, height, width, 8, color_mode))
+    buffer.write(struct.pack(">I", 0))  # 색상 모드 데이터
+    buffer.write(struct.pack(">I", 0))  # 이미지 리소스
+    # 레이어/마스크 정보 (없으면 합쳐진 이미지가 Background 레이어가 됨)
+    buffer.write(struct.pack(">I", len(layer_and_mask)) + layer_and_mask)
+    buffer.write(struct.pack(">H", PSD_COMPRESSION_RLE))
+    buffer.write(np.concatenate(row_counts).astype(">u2").tobytes())
+    for data in encoded:
+        buffer.write(data)
+    return buffer.getvalue()
+
+
+def write_psd(image: Image.Image, fp):
+    """encode_psd 결과를 파일 객체에 씁니다."""
+    fp.write(encode_psd(image))
@@ -0,0 +1,172 @@
+# shared/task_events.py
+# 워커의 태스크 상태 변화(STARTED / SUCCESS / FAILURE)를 Redis pub/sub 으로 발행하고,
+# API 서버가 이를 구독해 SSE / long-poll 로 클라이언트에 바로 전달하기 위한 모듈입니다.
+# (클라이언트가 /result/{task_id} 를 반복 호출할 때마다 생기던 AsyncResult 조회를 줄임)
+
+import os
+import json
+import time
+import asyncio
+import logging
+
+import redis
+
+TASK_EVENTS_REDIS_URL = os.getenv("TASK_EVENTS_REDIS_URL", "redis://redis:6379/0")
+TASK_EVENTS_CHANNEL_PREFIX = "task-events:"
+TASK_EVENTS_HEARTBEAT_S = float(os.getenv("TASK_EVENTS_HEARTBEAT_S", "15"))
+TERMINAL_STATES = {"SUCCESS", "FAILURE", "REVOKED"}
+
+
+def channel(task_id: str) -> str:
+    return f"{TASK_EVENTS_CHANNEL_PREFIX}{task_id}"
+
+
+# --- 워커: 상태 발행 ---
+
+_publisher = None
+
+
+def _get_publisher():
+    global _publisher
+    if _publisher is None:
+        _publisher = redis.Redis.from_url(TASK_EVENTS_REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+    return _publisher
+
+
+def publish_event(task_id: str, status: str, **fields):
+    event = {"task_id": task_id, "status": status, "ts": time.time(), **fields}
+    try:
+        _get_publisher().publish(channel(task_id), json.dumps(event, default=str))
+    except redis.RedisError as e:
+        # 이벤트 발행 실패는 태스크 결과에 영향을 주지 않음 (클라이언트는 상태 재확인으로 복구)
+        logging.info(f"[TASK EVENTS] 발행 실패 - {task_id}: {e}")
+
+
+def _tracking(task, args) -> tuple[str, str | None]:
+    # 단계 체인(shared.image_pipeline)의 중간 단계는 tracking_id 채널로 진행 상황을 알림
+    request_id = task.request.id
+    ctx = args[0] if args and isinstance(args[0], dict) else None
+    if ctx and ctx.get("tracking_id") and ctx["tracking_id"] != request_id:
+        return ctx["tracking_id"], task.name
+    return request_id, None
+
+
+def install_publisher(celery_app):
+    """celery_app 의 태스크 시작/성공/실패 시그널을 Redis pub/sub 이벤트로 발행합니다."""
+    from celery.signals import task_prerun, task_success, task_failure
+
+    @task_prerun.connect(weak=False)
+    def _on_prerun(sender=None, task_id=None, task=None, args=None, **kwargs):
+        if task is None or task.app is not celery_app:
+            return
+        target, stage = _tracking(task, args)
+        publish_event(target, "STARTED", stage=stage)
+
+    @task_success.connect(weak=False)
+    def _on_success(sender=None, result=None, **kwargs):
+        if sender is None or sender.app is not celery_app:
+            return
+        target, stage = _tracking(sender, sender.request.args)
+        if stage:
+            publish_event(target, "PROGRESS", stage=stage)  # 중간 단계 완료
+        else:
+            publish_event(target, "SUCCESS", result=result)
+
+    @task_failure.connect(weak=False)
+    def _on_failure(sender=None, task_id=None, exception=None, args=None, **kwargs):
+        if sender is None or sender.app is not celery_app:
+            return
+        target, stage = _tracking(sender, args)
+        publish_event(target, "FAILURE", stage=stage, error=str(exception))
+
+
+# --- API 서버: 상태 구독 ---
+
+class TaskEventHub:
+    """
+    프로세스당 Redis 커넥션 1개로 task-events:* 패턴을 구독하고, task_id 별 asyncio.Queue 로 나눠 줍니다.
+    열린 탭(SSE 연결)이 많아도 Redis 커넥션 수는 늘어나지 않습니다.
+    """
+
+    def __init__(self, redis_url: str = TASK_EVENTS_REDIS_URL):
+        self.redis_url = redis_url
+        self._queues = {}
+        self._listener = None
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.Redis.from_url(self.redis_url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{TASK_EVENTS_CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    task_id = message["channel"].decode("utf-8")[len(TASK_EVENTS_CHANNEL_PREFIX):]
+                    for queue in self._queues.get(task_id, ()):
+                        queue.put_nowait(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 끊긴 동안의 이벤트는 구독자가 heartbeat 때 상태를 다시 확인해 복구함
+                logging.info(f"[TASK EVENTS] 구독 연결 끊김, 재연결: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.reset()
+                    await client.close()
+                except Exception:
+                    pass
+
+    async def events(self, task_id: str, current_event, timeout_s: float):
+        """
+        task_id 의 상태 이벤트를 순서대로 내보냅니다. 종료 상태가 되거나 timeout_s 가 지나면 끝납니다.
+        current_event 는 현재 상태를 이벤트 dict 로 돌려주는 async 함수이며, 구독 직후와 heartbeat 마다 호출해
+        구독 전에 끝났거나 연결이 끊긴 동안 놓친 상태를 보완합니다. heartbeat 시점에는 None 도 내보냅니다.
+        """
+        self._ensure_listener()
+        queue = asyncio.Queue()
+        self._queues.setdefault(task_id, set()).add(queue)
+        try:
+            last_status = None
+            event = await current_event()
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout_s
+            while True:
+                if event is not None and (event["status"] != last_status or event.get("stage")):
+                    last_status = event["status"]
+                    yield event
+                    if last_status in TERMINAL_STATES:
+                        return
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=min(remaining, TASK_EVENTS_HEARTBEAT_S))
+                except asyncio.TimeoutError:
+                    yield None
+                    event = await current_event()
+                    if event["status"] == "PENDING":
+                        event = None  # 아직 결과 없음 (워커가 보낸 STARTED 를 PENDING 으로 덮지 않음)
+        finally:
+            queues = self._queues.get(task_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    self._queues.pop(task_id, None)
+
+
+hub = TaskEventHub()
+
+
+def sse_message(event: dict | None) -> str:
+    """이벤트 dict 를 SSE 형식 문자열로 변환합니다. (None 이면 연결 유지용 주석)"""
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"event: {event['status'].lower()}\ndata: {json.dumps(event, default=str)}\n\n"
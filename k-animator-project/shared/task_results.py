@@ -0,0 +1,27 @@
+# shared/task_results.py
+
+import os
+
+# POST /results 한 번에 조회할 수 있는 최대 task id 수
+RESULTS_MAX_TASK_IDS = int(os.getenv("RESULTS_MAX_TASK_IDS", "200"))
+
+
+def fetch_task_metas(celery_app, task_ids: list[str]) -> dict[str, dict]:
+    """
+    여러 task 의 결과 메타(celery-task-meta-*)를 Redis MGET 한 번으로 읽어 {task_id: meta} 로 반환합니다.
+    결과 키가 아직 없으면 AsyncResult 와 같게 PENDING 으로 봅니다.
+    """
+    backend = celery_app.backend
+    unique_ids = list(dict.fromkeys(task_ids))
+    if not unique_ids:
+        return {}
+    keys = [backend.get_key_for_task(task_id) for task_id in unique_ids]
+    payloads = backend.client.mget(keys)
+
+    metas = {}
+    for task_id, payload in zip(unique_ids, payloads):
+        if payload is None:
+            metas[task_id] = {"status": "PENDING", "result": None}
+        else:
+            metas[task_id] = backend.decode_result(payload)
+    return metas
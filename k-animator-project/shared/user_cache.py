@@ -0,0 +1,120 @@
+# shared/user_cache.py
+# 게이트웨이가 넘겨준 X-User-ID 로 사용자를 확인할 때 매번 Postgres 를 조회하지 않도록
+# 기본 프로필(id, username, email, full_name)을 짧은 TTL 로 캐시합니다.
+# 프로세스 메모리(몇 초) → Redis(1분) → DB 순서로 조회하며, 회원 정보 수정/비밀번호 변경/탈퇴 시 invalidate 합니다.
+# 비밀번호 해시는 캐시하지 않습니다. (비밀번호 확인/수정 경로는 계속 DB 를 조회)
+
+import os
+import json
+import time
+import logging
+import threading
+from types import SimpleNamespace
+
+import redis
+
+USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL", "redis://redis:6379/3")
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_LOCAL_TTL_SECONDS = float(os.getenv("USER_CACHE_LOCAL_TTL_SECONDS", "5"))
+USER_CACHE_LOCAL_SIZE = 10000
+USER_CACHE_KEY_PREFIX = "user:profile:"
+USER_CACHE_FIELDS = ("id", "username", "email", "full_name")
+
+_local = {}
+_local_lock = threading.Lock()
+_redis = None
+_async_redis = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(USER_CACHE_REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.5)
+    return _redis
+
+
+def _get_async_redis():
+    global _async_redis
+    if _async_redis is None:
+        import redis.asyncio as aioredis
+        _async_redis = aioredis.Redis.from_url(USER_CACHE_REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.5)
+    return _async_redis
+
+
+def _key(user_id: str) -> str:
+    return f"{USER_CACHE_KEY_PREFIX}{user_id}"
+
+
+def _local_get(user_id: str):
+    entry = _local.get(user_id)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    return None
+
+
+def _local_put(user_id: str, profile: dict):
+    with _local_lock:
+        if len(_local) >= USER_CACHE_LOCAL_SIZE:
+            _local.clear()
+        _local[user_id] = (profile, time.monotonic() + USER_CACHE_LOCAL_TTL_SECONDS)
+
+
+def _to_profile(user) -> dict:
+    return {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+
+
+def get_user(user_id: str, load_user) -> SimpleNamespace | None:
+    """
+    user_id 의 프로필을 반환합니다. 캐시에 없으면 load_user()(DB 조회, ORM 객체 또는 None)를 호출해 채웁니다.
+    반환값은 id/username/email/full_name 속성을 가진 객체입니다. 없는 사용자는 None (캐시하지 않음).
+    """
+    profile = _local_get(user_id)
+    if profile is None:
+        try:
+            cached = _get_redis().get(_key(user_id))
+            profile = json.loads(cached) if cached else None
+        except redis.RedisError as e:
+            logging.info(f"[USER CACHE] Redis 조회 실패: {e}")
+        if profile is None:
+            user = load_user()
+            if user is None:
+                return None
+            profile = _to_profile(user)
+            try:
+                _get_redis().set(_key(user_id), json.dumps(profile), ex=USER_CACHE_TTL_SECONDS)
+            except redis.RedisError as e:
+                logging.info(f"[USER CACHE] Redis 저장 실패: {e}")
+        _local_put(user_id, profile)
+    return SimpleNamespace(**profile)
+
+
+async def get_user_async(user_id: str, load_user) -> SimpleNamespace | None:
+    """get_user 의 async 버전. load_user 는 awaitable 을 반환하는 함수입니다."""
+    profile = _local_get(user_id)
+    if profile is None:
+        try:
+            cached = await _get_async_redis().get(_key(user_id))
+            profile = json.loads(cached) if cached else None
+        except redis.RedisError as e:
+            logging.info(f"[USER CACHE] Redis 조회 실패: {e}")
+        if profile is None:
+            user = await load_user()
+            if user is None:
+                return None
+            profile = _to_profile(user)
+            try:
+                await _get_async_redis().set(_key(user_id), json.dumps(profile), ex=USER_CACHE_TTL_SECONDS)
+            except redis.RedisError as e:
+                logging.info(f"[USER CACHE] Redis 저장 실패: {e}")
+        _local_put(user_id, profile)
+    return SimpleNamespace(**profile)
+
+
+def invalidate(user_id: str):
+    """사용자 정보가 바뀌거나 삭제되었을 때 호출합니다. (다른 프로세스의 메모리 캐시는 최대 USER_CACHE_LOCAL_TTL_SECONDS 동안 남음)"""
+    with _local_lock:
+        _local.pop(user_id, None)
+    try:
+        _get_redis().delete(_key(user_id))
+    except redis.RedisError as e:
+        logging.info(f"[USER CACHE] Redis 삭제 실패 - {user_id}: {e}")
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 from utils.web import router as utils_api_router
+from shared import keyvault
 
 app = FastAPI(title="Utility Service")
 
@@ -27,6 +28,11 @@ def health_check():
 
 app.include_router(utils_api_router, prefix="/api/utils")
 
+@app.on_event("startup")
+def prefetch_secrets():
+    # 시크릿을 백그라운드에서 미리 받아 둠 (서버 시작은 기다리지 않고, DB / Redis 는 처음 사용할 때 연결)
+    keyvault.prefetch_in_background()
+
 @app.get("/")
 def read_root():
     return {"message": "Utility service is running"}
\ No newline at end of file
@@ -17,6 +17,17 @@ resource "azurerm_key_vault_secret" "jwt_secret" {
   }
 }
 
+# Access Token(ES256) 서명 키 목록 (JSON, 형식은 auth/core/signing_keys.py 참고)
+resource "azurerm_key_vault_secret" "jwt_signing_keys" {
+  name                = "jwt-signing-keys"
+  key_vault_id        = var.key_vault_id
+  value               = "[]"    # 실제 키 목록은 배포 후 수동으로 새 버전 추가 (키 교체도 새 버전으로)
+
+  lifecycle {
+    ignore_changes = [value,]  # 시크릿 값 변경 무시
+  }
+}
+
 resource "azurerm_role_assignment" "auth_identity_kv_reader" {
   scope                = var.key_vault_id
   role_definition_name = "Key Vault Secrets User"